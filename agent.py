@@ -16,6 +16,14 @@ from ..bridge.auth_manager import AngelAuthManager
 from ..bridge.market_feed import MarketFeedListener
 from ..bridge.order_executor import OrderExecutor
 from ..bridge.position_manager import PositionManager
+from ..bridge.journal import Journal
+from ..bridge.paper_engine import PaperMatchingEngine
+from ..bridge.token_mapper import TokenMapper
+from ..bridge.kill_switch import KillSwitch
+from ..bridge.telegram_notifier import TelegramNotifier
+from ..bridge.risk_gate import RiskGate
+from ..bridge.reconciler import BrokerReconciler
+from ..bridge.async_broker import AsyncBrokerClient
 
 load_dotenv()
 
@@ -38,8 +46,41 @@ class DevilTradingAgent:
         # Initialize components
         self.auth = AngelAuthManager()
         self.feed = MarketFeedListener()
-        self.executor = OrderExecutor(mode=self.mode)
-        self.position_manager = PositionManager(mode=self.mode)
+        self.token_mapper = TokenMapper()
+        journal = os.getenv('JOURNAL', 'true').lower() == 'true'
+        
+        # Paper orders fill against the live feed instead of instantly
+        self.paper_engine = None
+        if self.mode == 'PAPER':
+            # Raw SmartWebSocketV2 ticks are in paise
+            self.paper_engine = PaperMatchingEngine(price_divisor=100)
+            self.feed.add_tick_listener(self.paper_engine.process_tick)
+        
+        # One pre-trade gate for every order path. MAX_DAILY_LOSS is a percent
+        # of capital here, which is the gate's drawdown limit
+        self.risk_gate = RiskGate.from_env(
+            max_daily_loss=float('inf'),
+            max_drawdown_percent=self.max_daily_loss,
+            initial_capital=float(os.getenv('INITIAL_CAPITAL', 100000)),
+            max_positions=int(os.getenv('MAX_POSITIONS', 2))
+        )
+        
+        self.executor = OrderExecutor(mode=self.mode,
+                                      journal=Journal('orders') if journal else None,
+                                      token_mapper=self.token_mapper,
+                                      risk_gate=self.risk_gate,
+                                      paper_engine=self.paper_engine)
+        self.position_manager = PositionManager(mode=self.mode,
+                                                journal=Journal('positions') if journal else None,
+                                                risk_gate=self.risk_gate)
+        
+        # Emergency flatten-all (kill -USR1 <pid>, /kill on Telegram, or a
+        # risk gate halt)
+        self.notifier = TelegramNotifier()
+        self.kill_switch = KillSwitch(self.executor, self.position_manager,
+                                      risk_gate=self.risk_gate,
+                                      notifier=self.notifier)
+        self.reconciler = None  # LIVE only, built once the session exists
         
         # Market state
         self.market_regime = "UNKNOWN"
@@ -56,6 +97,10 @@ class DevilTradingAgent:
         self.trading_enabled = True
         self.paper_mode = self.mode == 'PAPER'
         
+        # (signal key, client order id) of the trade not yet confirmed -
+        # retries of the same signal reuse the id so they cannot double-submit
+        self._pending_order = None
+        
         logger.info(f"🔥 DEVIL TRADING AGENT INITIALIZED in {self.mode} mode")
     
     def initialize(self):
@@ -73,6 +118,11 @@ class DevilTradingAgent:
                 logger.error("❌ Order Executor initialization failed")
                 return False
             
+            # Fills (not order acceptance) open and close positions
+            if not self.executor.start_order_updates(self.position_manager):
+                logger.error("❌ Order updates could not be started")
+                return False
+            
             # Connect market feed (will connect when started)
             logger.info("✅ All components initialized successfully")
             return True
@@ -221,7 +271,11 @@ class DevilTradingAgent:
                 logger.error("❌ Invalid position size - trade cancelled")
                 return False
             
-            # Execute order
+            # Execute order (same client order id until this signal's trade is done)
+            key = (signal['strategy'], signal['symbol'], signal['action'])
+            if self._pending_order is None or self._pending_order[0] != key:
+                self._pending_order = (key, self.executor.new_client_order_id())
+            
             order_id = self.executor.place_order(
                 symbol=signal['symbol'],
                 exchange=signal['exchange'],
@@ -230,24 +284,15 @@ class DevilTradingAgent:
                 order_type='MARKET',
                 price=entry_price,
                 stop_loss=stop_loss,
-                target=entry_price * 1.04  # 4% target
+                target=entry_price * 1.04,  # 4% target
+                strategy=signal['strategy'],
+                client_order_id=self._pending_order[1]
             )
             
             if order_id:
-                # Add to position manager
-                self.position_manager.add_position(
-                    symbol=signal['symbol'],
-                    quantity=quantity,
-                    entry_price=entry_price,
-                    order_type=signal['action'],
-                    stop_loss=stop_loss,
-                    target=entry_price * 1.04,
-                    metadata={
-                        'signal_confidence': signal['confidence'],
-                        'strategy': signal['strategy'],
-                        'reason': signal['reason']
-                    }
-                )
+                # The position opens on the fill (PositionManager.on_fill),
+                # with the SL and target of the order
+                self._pending_order = None
                 
                 logger.info(f"✅ Trade executed successfully - Order ID: {order_id}")
                 return True
@@ -267,12 +312,15 @@ class DevilTradingAgent:
             # Get current positions
             positions = self.position_manager.get_all_positions()
             
+            prices = {}
             for symbol, position in positions.items():
-                # Update price (get from market feed)
+                # Latest price from market feed
                 latest_candle = self.feed.get_latest_candle(symbol)
                 if latest_candle:
-                    current_price = latest_candle.get('close', position['current_price'])
-                    self.position_manager.update_price(symbol, current_price)
+                    prices[symbol] = latest_candle.get('close', position['current_price'])
+            
+            # One batch mark - SL/target exits are handled inside
+            self.position_manager.update_prices(prices)
             
             return True
             
@@ -290,6 +338,17 @@ class DevilTradingAgent:
                 return False
             
             self.is_running = True
+            self.kill_switch.install_signal_handlers()
+            self.kill_switch.start_telegram_commands()
+            
+            # Diff broker books against local state in the background
+            if not self.paper_mode:
+                client = AsyncBrokerClient.from_auth(self.executor.auth, 'trading')
+                if client:
+                    self.reconciler = BrokerReconciler(
+                        client, self.position_manager, self.executor,
+                        interval=float(os.getenv('RECONCILE_INTERVAL', 5)))
+                    self.reconciler.start()
             
             # Start market feed (subscribe to NIFTY)
             test_tokens = [{
@@ -350,6 +409,10 @@ class DevilTradingAgent:
             
             self.is_running = False
             
+            if self.reconciler is not None:
+                self.reconciler.stop()
+            self.notifier.stop_command_listener()
+            
             # Close all positions if needed
             if not self.paper_mode:
                 self.position_manager.close_all_positions('SYSTEM_SHUTDOWN')
@@ -0,0 +1,196 @@
+"""
+Database Backup Module
+Consistent online snapshots of the trades database with rotation
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PAGES = 256          # pages copied per step
+DEFAULT_SLEEP = 0.01         # seconds between steps, so the writer gets the database
+DEFAULT_KEEP = 14            # snapshots kept (plain + compressed)
+DEFAULT_KEEP_PLAIN = 1       # newest snapshots left uncompressed
+MAX_RESTARTS = 3             # stepped restarts before copying in a single step
+
+SNAPSHOT_GLOB = 'trades_*.db*'
+SIDECARS = ('-wal', '-shm', '-journal')   # files SQLite keeps next to an open database
+
+
+class _Restarted(Exception):
+    """Source kept changing under a stepped backup"""
+
+
+def _snapshots(backup_dir: Path) -> List[Path]:
+    """Finished snapshots, oldest first (names sort by timestamp)"""
+    return sorted(p for p in backup_dir.glob(SNAPSHOT_GLOB)
+                  if p.suffix in ('.db', '.gz'))
+
+
+def _remove(path: Path):
+    """Delete a snapshot and any SQLite sidecar files left from opening it"""
+    path.unlink(missing_ok=True)
+    for suffix in SIDECARS:
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def _copy(source: sqlite3.Connection, target_path: Path, pages: int, sleep: float):
+    """
+    Online backup of source into target_path
+
+    Copies pages pages per step. A write by another connection restarts
+    the copy at the next step; if that keeps happening the copy is redone
+    in one step, which in WAL mode is a single read transaction and does
+    not block the writer either. The copy inherits the source's WAL mode,
+    so it is switched back to a rollback journal: opening a snapshot then
+    leaves no -wal/-shm files behind.
+    """
+    remaining = [None]
+    restarts = [0]
+
+    def progress(status, left, total):
+        if remaining[0] is not None and left > remaining[0]:
+            restarts[0] += 1
+            if restarts[0] > MAX_RESTARTS:
+                raise _Restarted()
+        remaining[0] = left
+
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _Restarted:
+            logger.warning(f"⚠️  Backup restarted {restarts[0]} times - copying in one step")
+            source.backup(target, pages=-1)
+
+        if target.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+            raise sqlite3.DatabaseError(f"snapshot {target_path} failed quick_check")
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+
+
+def compress(path: Path) -> Path:
+    """gzip a snapshot in place (path.gz), removing the original"""
+    gz_path = path.with_name(path.name + '.gz')
+    with open(path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    _remove(path)
+    return gz_path
+
+
+def rotate(backup_dir: Path, keep: int = DEFAULT_KEEP, keep_plain: int = DEFAULT_KEEP_PLAIN) -> List[Path]:
+    """
+    Compress all but the newest keep_plain snapshots and delete all but the newest keep
+
+    Returns:
+        Snapshots removed
+    """
+    snapshots = _snapshots(backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        _remove(path)
+
+    kept = snapshots[len(removed):]
+    for path in kept[:len(kept) - keep_plain]:
+        if path.suffix == '.db':
+            compress(path)
+
+    return removed
+
+
+def backup_database(db_path: str = 'data/trades.db', backup_dir: str = 'backups',
+                    pages: int = DEFAULT_PAGES, sleep: float = DEFAULT_SLEEP,
+                    keep: int = DEFAULT_KEEP, keep_plain: int = DEFAULT_KEEP_PLAIN) -> Optional[Path]:
+    """
+    Take a consistent snapshot of a live SQLite database
+
+    Uses SQLite's online backup API instead of copying the file, so the
+    snapshot is a transaction-consistent database (the WAL included) even
+    while the agent is writing, and the writer is only held off for one
+    step at a time. The copy goes to a .partial file and is renamed once
+    it passes quick_check, so backups/ only ever holds complete snapshots.
+    Older snapshots are then gzipped and the oldest beyond keep deleted.
+
+    Args:
+        db_path: Database to back up
+        backup_dir: Directory for trades_YYYYmmdd_HHMMSS.db snapshots
+        pages: Pages per step (-1 copies everything in one step)
+        sleep: Seconds to pause between steps
+        keep: Snapshots to keep (0 keeps all)
+        keep_plain: Newest snapshots left uncompressed
+
+    Returns:
+        Path of the new snapshot, or None on failure
+    """
+    db_path = Path(db_path)
+    backup_dir = Path(backup_dir)
+    if not db_path.exists():
+        logger.error(f"❌ Database not found: {db_path}")
+        return None
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    path = backup_dir / f"trades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    partial = path.with_name(path.name + '.partial')
+    start = time.perf_counter()
+
+    source = sqlite3.connect(db_path)
+    try:
+        _copy(source, partial, pages, sleep)
+        os.replace(partial, path)
+    except sqlite3.Error as e:
+        logger.error(f"❌ Backup failed: {e}")
+        _remove(partial)
+        return None
+    finally:
+        source.close()
+
+    logger.info(f"✅ Backup created: {path} ({path.stat().st_size / 1024:.0f} KB, "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    for old in rotate(backup_dir, keep, keep_plain):
+        logger.info(f"🗑️  Removed old backup {old.name}")
+    return path
+
+
+def restore_snapshot(snapshot: str, db_path: str):
+    """
+    Write a snapshot (plain or .gz) out as a database file
+
+    Args:
+        snapshot: Snapshot path
+        db_path: Destination (must not be open by the agent)
+    """
+    opener = gzip.open if snapshot.endswith('.gz') else open
+    with opener(snapshot, 'rb') as src, open(db_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def main():
+    """Command line entry point (used by backup.sh)"""
+    parser = argparse.ArgumentParser(description='Online backup of the trades database')
+    parser.add_argument('--db', default='data/trades.db', help='Database to back up')
+    parser.add_argument('--dir', default='backups', help='Backup directory')
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help='Pages per step')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='Snapshots to keep (0 = all)')
+    parser.add_argument('--keep-plain', type=int, default=DEFAULT_KEEP_PLAIN,
+                        help='Newest snapshots left uncompressed')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    path = backup_database(args.db, args.dir, pages=args.pages, keep=args.keep, keep_plain=args.keep_plain)
+    return 0 if path else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -32,37 +32,13 @@ class PerformanceTracker:
         self.metrics['losing_trades'] = len(self.df[self.df['pnl'] < 0])
         self.metrics['breakeven_trades'] = len(self.df[self.df['pnl'] == 0])
         
-        self.metrics['win_rate'] = (
-            (self.metrics['winning_trades'] / self.metrics['total_trades']) * 100
-            if self.metrics['total_trades'] > 0 else 0
-        )
-        
         # P&L metrics
         self.metrics['total_profit'] = self.df[self.df['pnl'] > 0]['pnl'].sum()
         self.metrics['total_loss'] = self.df[self.df['pnl'] < 0]['pnl'].sum()
         self.metrics['net_pnl'] = self.df['pnl'].sum()
         
         # Advanced metrics
-        self.metrics['profit_factor'] = (
-            self.metrics['total_profit'] / abs(self.metrics['total_loss'])
-            if self.metrics['total_loss'] != 0 else 0
-        )
-        
-        self.metrics['avg_win'] = (
-            self.metrics['total_profit'] / self.metrics['winning_trades']
-            if self.metrics['winning_trades'] > 0 else 0
-        )
-        
-        self.metrics['avg_loss'] = (
-            abs(self.metrics['total_loss'] / self.metrics['losing_trades'])
-            if self.metrics['losing_trades'] > 0 else 0
-        )
-        
-        self.metrics['expectancy'] = (
-            (self.metrics['win_rate'] / 100 * self.metrics['avg_win']) -
-            ((1 - self.metrics['win_rate'] / 100) * self.metrics['avg_loss'])
-            if self.metrics['total_trades'] > 0 else 0
-        )
+        self.add_ratios(self.metrics)
         
         # Best/Worst
         self.metrics['best_trade'] = self.df['pnl'].max()
@@ -74,6 +50,44 @@ class PerformanceTracker:
         
         return self.metrics
     
+    @staticmethod
+    def add_ratios(metrics: dict) -> dict:
+        """
+        Add win rate, profit factor, average win/loss and expectancy
+        
+        Args:
+            metrics: Dict with total_trades, winning_trades, losing_trades,
+                     total_profit and total_loss (also used by
+                     TradeDatabase.get_metrics)
+        """
+        metrics['win_rate'] = (
+            (metrics['winning_trades'] / metrics['total_trades']) * 100
+            if metrics['total_trades'] > 0 else 0
+        )
+        
+        metrics['profit_factor'] = (
+            metrics['total_profit'] / abs(metrics['total_loss'])
+            if metrics['total_loss'] != 0 else 0
+        )
+        
+        metrics['avg_win'] = (
+            metrics['total_profit'] / metrics['winning_trades']
+            if metrics['winning_trades'] > 0 else 0
+        )
+        
+        metrics['avg_loss'] = (
+            abs(metrics['total_loss'] / metrics['losing_trades'])
+            if metrics['losing_trades'] > 0 else 0
+        )
+        
+        metrics['expectancy'] = (
+            (metrics['win_rate'] / 100 * metrics['avg_win']) -
+            ((1 - metrics['win_rate'] / 100) * metrics['avg_loss'])
+            if metrics['total_trades'] > 0 else 0
+        )
+        
+        return metrics
+    
     def _calculate_max_drawdown(self, initial_capital: float = 100000.0) -> (float, float):
         """Calculate max drawdown in absolute and percentage terms"""
         if self.df.empty:
@@ -3,12 +3,17 @@ Trade Database Module
 Manages all trade logs in a SQLite database
 """
 
+import atexit
 import sqlite3
+import threading
 import pandas as pd
-from datetime import datetime
+from collections import deque
+from datetime import date, datetime, timedelta
 from pathlib import Path
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+from analytics.performance_tracker import PerformanceTracker
 
 # Configure logging
 logging.basicConfig(
@@ -17,77 +22,279 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+INSERT_TRADE = """
+    INSERT INTO trades (
+        symbol, strategy, entry_time, exit_time, action, 
+        quantity, entry_price, exit_price, pnl, pnl_percent, 
+        status, exit_reason
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Schema versions (PRAGMA user_version); each step runs once, in order
+MIGRATIONS = [
+    # 1: trades table
+    ["""
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            strategy TEXT,
+            entry_time TIMESTAMP NOT NULL,
+            exit_time TIMESTAMP NOT NULL,
+            action TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            entry_price REAL NOT NULL,
+            exit_price REAL NOT NULL,
+            pnl REAL NOT NULL,
+            pnl_percent REAL,
+            status TEXT NOT NULL,
+            exit_reason TEXT
+        )
+    """],
+    # 2: indexes for time-range, symbol and strategy queries
+    ["CREATE INDEX IF NOT EXISTS idx_trades_entry_time ON trades (entry_time)",
+     "CREATE INDEX IF NOT EXISTS idx_trades_exit_time ON trades (exit_time)",
+     "CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades (symbol, entry_time)",
+     "CREATE INDEX IF NOT EXISTS idx_trades_strategy ON trades (strategy, entry_time)"],
+    # 3: running totals per day / strategy / symbol, backfilled from existing trades
+    ["""
+        CREATE TABLE IF NOT EXISTS trade_summary (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            trades INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            losses INTEGER NOT NULL,
+            gross_pnl REAL NOT NULL,
+            gross_profit REAL NOT NULL,
+            gross_loss REAL NOT NULL,
+            pnl_sq REAL NOT NULL,
+            best_pnl REAL NOT NULL,
+            worst_pnl REAL NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    """] + [f"""
+        INSERT OR REPLACE INTO trade_summary
+        SELECT '{dimension}', {key}, COUNT(*), SUM(pnl > 0), SUM(pnl < 0), SUM(pnl),
+               SUM(MAX(pnl, 0)), SUM(MIN(pnl, 0)), SUM(pnl * pnl), MAX(pnl), MIN(pnl)
+        FROM trades GROUP BY 2
+    """ for dimension, key in (('all', "''"), ('day', 'substr(exit_time, 1, 10)'),
+                               ('strategy', "COALESCE(strategy, '')"), ('symbol', 'symbol'))]
+]
+
+# PerformanceTracker metrics over one slice of trades. Only the final
+# aggregates leave SQLite: the equity curve, its running peak and the
+# return deviations are window functions over the slice.
+METRICS_QUERY = """
+    WITH slice AS (
+        SELECT pnl, pnl_percent / 100.0 AS ret,
+               ROW_NUMBER() OVER curve AS n,
+               SUM(pnl) OVER curve AS equity
+        FROM trades {where}
+        WINDOW curve AS (ORDER BY {time_column}, id ROWS UNBOUNDED PRECEDING)
+    ), drawdowns AS (
+        SELECT pnl, ret, n, equity,
+               MAX(equity) OVER (ORDER BY n ROWS UNBOUNDED PRECEDING) AS peak,
+               AVG(pnl) OVER () AS mean_pnl,
+               AVG(ret) OVER () AS mean_ret
+        FROM slice
+    ), deepest AS (
+        SELECT equity - peak AS drawdown, peak FROM drawdowns
+        ORDER BY equity - peak, n LIMIT 1
+    )
+    SELECT COUNT(*) AS total_trades,
+           SUM(pnl > 0) AS winning_trades,
+           SUM(pnl < 0) AS losing_trades,
+           SUM(pnl = 0) AS breakeven_trades,
+           TOTAL(MAX(pnl, 0)) AS total_profit,
+           TOTAL(MIN(pnl, 0)) AS total_loss,
+           TOTAL(pnl) AS net_pnl,
+           MAX(pnl) AS best_trade,
+           MIN(pnl) AS worst_trade,
+           TOTAL((pnl - mean_pnl) * (pnl - mean_pnl)) AS pnl_ss,
+           COUNT(ret) AS returns,
+           AVG(ret) AS mean_ret,
+           TOTAL((ret - mean_ret) * (ret - mean_ret)) AS ret_ss,
+           (SELECT drawdown FROM deepest) AS drawdown,
+           (SELECT peak FROM deepest) AS drawdown_peak
+    FROM drawdowns
+"""
+
+# Summary dimensions: all-time total, day of exit, strategy, symbol
+SUMMARY_DIMENSIONS = ('all', 'day', 'strategy', 'symbol')
+
+SUMMARY_FIELDS = ('trades', 'wins', 'losses', 'gross_pnl', 'gross_profit', 'gross_loss',
+                  'pnl_sq', 'best_pnl', 'worst_pnl')
+
+UPSERT_SUMMARY = """
+    INSERT INTO trade_summary (dimension, key, trades, wins, losses, gross_pnl,
+                               gross_profit, gross_loss, pnl_sq, best_pnl, worst_pnl)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dimension, key) DO UPDATE SET
+        trades = trades + excluded.trades,
+        wins = wins + excluded.wins,
+        losses = losses + excluded.losses,
+        gross_pnl = gross_pnl + excluded.gross_pnl,
+        gross_profit = gross_profit + excluded.gross_profit,
+        gross_loss = gross_loss + excluded.gross_loss,
+        pnl_sq = pnl_sq + excluded.pnl_sq,
+        best_pnl = MAX(best_pnl, excluded.best_pnl),
+        worst_pnl = MIN(worst_pnl, excluded.worst_pnl)
+"""
+
+# Columns get_trades() can filter by time
+TIME_COLUMNS = ('entry_time', 'exit_time')
+
+DEFAULT_FLUSH_INTERVAL = 0.05     # seconds between group commits
+DEFAULT_BATCH_SIZE = 500          # max trades per transaction
+
+# Types sqlite3 binds without an adapter (date/datetime via the default ones)
+BINDABLE_TYPES = (type(None), int, float, str, bytes, date, datetime)
+
 
 class TradeDatabase:
     """
     Handles connection and operations with the trades SQLite database
+    
+    log_trade() only queues the row; a writer thread with its own
+    connection inserts everything queued during the flush interval in one
+    transaction. The database runs in WAL mode, so readers never wait on
+    the writer, with synchronous=NORMAL: a commit is safe against a
+    process crash and only fsyncs at checkpoints. flush() waits until
+    everything queued so far is committed. A batch that fails is retried a
+    row at a time, so one bad trade cannot take the rest of it down.
+    
+    Safe to share across threads: the writer thread owns the only write
+    connection, and every reading thread gets its own connection (conn).
     """
     
-    def __init__(self, db_path: str = 'data/trades.db'):
+    def __init__(self, db_path: str = 'data/trades.db', synchronous: str = 'NORMAL',
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, batch_size: int = DEFAULT_BATCH_SIZE):
         """
         Initialize database connection
         
         Args:
             db_path: Path to the SQLite database file
+            synchronous: SQLite synchronous level for the writer (OFF, NORMAL, FULL)
+            flush_interval: Max seconds a trade waits in the queue
+            batch_size: Max trades per transaction
         """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
-        self.conn = None
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.stats = {'queued': 0, 'written': 0, 'transactions': 0, 'errors': 0, 'dropped': 0}
+        
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._writer_conn = None
+        self._thread = None
+        self._closing = False
+        
+        # Read connections, one per thread (see conn)
+        self._local = threading.local()
+        self._readers = []                # (thread, connection)
+        self._readers_lock = threading.Lock()
         
         try:
-            self.conn = sqlite3.connect(
-                self.db_path,
-                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-            )
-            self.conn.row_factory = sqlite3.Row
+            # The single writer: migrations here, then only the writer thread
+            self._writer_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._writer_conn.execute("PRAGMA journal_mode=WAL")
+            self._writer_conn.execute(f"PRAGMA synchronous={synchronous}")
             logger.info(f"✅ Database connected at {self.db_path}")
-            self.create_table()
+            self.migrate()
+            
+            self._thread = threading.Thread(target=self._run, name='trade-db-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
             
         except sqlite3.Error as e:
             logger.error(f"❌ Database error: {e}")
-            self.conn = None
+            if self._writer_conn:
+                self._writer_conn.close()
+            self._writer_conn = None
     
-    def create_table(self):
-        """Create the 'trades' table if it doesn't exist"""
-        if not self.conn:
-            return
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """
+        Read connection of the calling thread (None if the database is closed)
+        
+        Each thread gets its own query-only connection on first use. In WAL
+        mode readers see the last committed state and never block, or are
+        blocked by, the writer thread - so the websocket callback, Telegram
+        tasks and schedulers can query concurrently without a shared lock.
+        """
+        if self._writer_conn is None:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        
+        try:
+            # check_same_thread=False only so close() can close it from another thread
+            conn = sqlite3.connect(
+                self.db_path,
+                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only = ON")
+        except sqlite3.Error as e:
+            logger.error(f"❌ Database error: {e}")
+            return None
+        
+        with self._readers_lock:
+            if self._writer_conn is None:   # closed meanwhile
+                conn.close()
+                return None
+            # Drop connections of threads that have exited
+            for thread, reader in self._readers:
+                if not thread.is_alive():
+                    reader.close()
+            self._readers = [(t, c) for t, c in self._readers if t.is_alive()]
+            self._readers.append((threading.current_thread(), conn))
+        self._local.conn = conn
+        return conn
+    
+    def migrate(self) -> int:
+        """
+        Bring the schema up to the latest version
+        
+        Databases created before versioning (user_version 0) already have
+        the trades table; its CREATE is idempotent, so they upgrade in place.
+        Runs on the writer connection before the writer thread starts.
+        
+        Returns:
+            int: Schema version after migrating
+        """
+        conn = self._writer_conn
+        if not conn:
+            return 0
             
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS trades (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    strategy TEXT,
-                    entry_time TIMESTAMP NOT NULL,
-                    exit_time TIMESTAMP NOT NULL,
-                    action TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    entry_price REAL NOT NULL,
-                    exit_price REAL NOT NULL,
-                    pnl REAL NOT NULL,
-                    pnl_percent REAL,
-                    status TEXT NOT NULL,
-                    exit_reason TEXT
-                )
-            """)
-            self.conn.commit()
-            logger.info("Table 'trades' is ready")
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                with conn:   # each step commits with its version, or not at all
+                    for sql in statements:
+                        conn.execute(sql)
+                    conn.execute(f"PRAGMA user_version = {number}")
+                version = number
+                logger.info(f"Trades schema migrated to version {number}")
             
         except sqlite3.Error as e:
-            logger.error(f"❌ Error creating table: {e}")
+            logger.error(f"❌ Schema migration {version + 1} failed: {e}")
+        
+        return version
     
     def log_trade(self, trade_data: Dict) -> bool:
         """
-        Log a completed trade to the database
+        Queue a completed trade for the writer (never waits on disk)
         
         Args:
             trade_data: Dictionary containing trade details
             
         Returns:
-            bool: True if successful
+            bool: True if the trade was valid and queued
         """
-        if not self.conn:
+        if self._writer_conn is None or self._closing:
             return False
             
         required_keys = [
@@ -99,6 +306,10 @@ class TradeDatabase:
             logger.error(f"Missing required keys in trade data: {trade_data}")
             return False
         
+        if not isinstance(trade_data['pnl'], (int, float)):
+            logger.error(f"Non-numeric pnl in trade data: {trade_data}")
+            return False
+        
         # Determine status
         if trade_data['pnl'] > 0:
             status = 'WIN'
@@ -107,14 +318,6 @@ class TradeDatabase:
         else:
             status = 'BREAKEVEN'
         
-        sql = """
-            INSERT INTO trades (
-                symbol, strategy, entry_time, exit_time, action, 
-                quantity, entry_price, exit_price, pnl, pnl_percent, 
-                status, exit_reason
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        
         params = (
             trade_data.get('symbol'),
             trade_data.get('strategy', 'Default'),
@@ -130,40 +333,185 @@ class TradeDatabase:
             trade_data.get('exit_reason', 'Closed')
         )
         
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, params)
-            self.conn.commit()
-            logger.info(f"💾 Trade logged for {trade_data['symbol']}")
+        # A value sqlite3 cannot bind would only fail on the writer thread
+        if not all(isinstance(value, BINDABLE_TYPES) for value in params):
+            logger.error(f"Unsupported value types in trade data: {trade_data}")
+            return False
+        
+        self._queue.append(('trade', params))
+        self.stats['queued'] += 1
+        logger.info(f"💾 Trade queued for {trade_data['symbol']}")
+        return True
+    
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        Block until every trade queued so far is committed
+        
+        Returns:
+            bool: False on timeout
+        """
+        if self._thread is None:
             return True
+        done = threading.Event()
+        self._queue.append(('barrier', done))
+        self._wake.set()
+        return done.wait(timeout)
+    
+    def close(self):
+        """Commit queued trades, stop the writer and close connections"""
+        if self._thread is not None:
+            self._closing = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
             
-        except sqlite3.Error as e:
-            logger.error(f"❌ Failed to log trade: {e}")
-            return False
+            with self._readers_lock:
+                for _, reader in self._readers:
+                    reader.close()
+                self._readers = []
+            logger.info("Database connection closed")
+    
+    def _run(self):
+        while True:
+            # Group commit: everything queued during the interval goes in one transaction
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            
+            while self._queue:
+                self._write_batch()
+            
+            if self._closing and not self._queue:
+                break
+    
+    def _write_batch(self):
+        rows = []
+        barriers = []
+        while self._queue and len(rows) < self.batch_size:
+            kind, item = self._queue.popleft()
+            if kind == 'trade':
+                rows.append(item)
+            else:
+                barriers.append(item)
+        
+        if rows:
+            try:
+                with self._writer_conn:   # one transaction, rolled back on error
+                    self._writer_conn.executemany(INSERT_TRADE, rows)
+                    self._writer_conn.executemany(UPSERT_SUMMARY, self._summarize(rows))
+                self.stats['written'] += len(rows)
+                self.stats['transactions'] += 1
+            except sqlite3.Error as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Failed to log {len(rows)} trades: {e} - retrying one by one")
+                self._write_rows(rows)
+        
+        for done in barriers:
+            done.set()
+    
+    def _write_rows(self, rows):
+        """Write a failed batch a row per transaction, dropping only the rows that fail"""
+        for row in rows:
+            try:
+                with self._writer_conn:
+                    self._writer_conn.execute(INSERT_TRADE, row)
+                    self._writer_conn.executemany(UPSERT_SUMMARY, self._summarize([row]))
+                self.stats['written'] += 1
+                self.stats['transactions'] += 1
+            except sqlite3.Error as e:
+                self.stats['dropped'] += 1
+                logger.error(f"❌ Dropped trade {row}: {e}")
     
-    def get_trades(self, start_date: Optional[str] = None, 
-                   end_date: Optional[str] = None) -> pd.DataFrame:
+    @staticmethod
+    def _summarize(rows):
+        """Summary deltas of a batch of INSERT_TRADE rows, one per (dimension, key)"""
+        totals = {}
+        for symbol, strategy, _, exit_time, _, _, _, _, pnl, *_ in rows:
+            for key in (('all', ''), ('day', str(exit_time)[:10]),
+                        ('strategy', strategy or ''), ('symbol', symbol)):
+                t = totals.get(key)
+                if t is None:
+                    totals[key] = [1, int(pnl > 0), int(pnl < 0), pnl, max(pnl, 0), min(pnl, 0),
+                                   pnl * pnl, pnl, pnl]
+                    continue
+                t[0] += 1
+                t[1] += pnl > 0
+                t[2] += pnl < 0
+                t[3] += pnl
+                t[4] += max(pnl, 0)
+                t[5] += min(pnl, 0)
+                t[6] += pnl * pnl
+                t[7] = max(t[7], pnl)
+                t[8] = min(t[8], pnl)
+        return [(*key, *values) for key, values in totals.items()]
+    
+    @staticmethod
+    def _bound(value: Union[str, date, datetime], end: bool = False) -> str:
+        """
+        Timestamp bound comparable with the stored 'YYYY-MM-DD HH:MM:SS' text
+        
+        A date (or 'YYYY-MM-DD') as the end bound means the whole day, so
+        it becomes the next midnight; datetimes are used as they are.
+        """
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ')
+        if end:
+            value += timedelta(days=1)
+        return value.isoformat()
+    
+    def _where(self, start_date=None, end_date=None, time_column: str = 'entry_time',
+               strategy: Optional[str] = None, symbol: Optional[str] = None) -> Tuple[str, List]:
+        """WHERE clause and parameters for a half-open time range and filters"""
+        if time_column not in TIME_COLUMNS:
+            raise ValueError(f"time_column must be one of {TIME_COLUMNS}")
+        
+        conditions = []
+        params = []
+        
+        if start_date:
+            conditions.append(f"{time_column} >= ?")
+            params.append(self._bound(start_date))
+        if end_date:
+            conditions.append(f"{time_column} < ?")
+            params.append(self._bound(end_date, end=True))
+        if strategy is not None:
+            conditions.append("strategy = ?")
+            params.append(strategy)
+        if symbol is not None:
+            conditions.append("symbol = ?")
+            params.append(symbol)
+        
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def get_trades(self, start_date: Optional[Union[str, date, datetime]] = None, 
+                   end_date: Optional[Union[str, date, datetime]] = None,
+                   time_column: str = 'entry_time') -> pd.DataFrame:
         """
         Fetch trades from the database as a pandas DataFrame
         
+        The range is half-open, start <= time < end, and uses the time
+        column's index. get_trades(today, today) is the whole of today.
+        
         Args:
-            start_date: 'YYYY-MM-DD'
-            end_date: 'YYYY-MM-DD'
+            start_date: 'YYYY-MM-DD', date or datetime (inclusive)
+            end_date: 'YYYY-MM-DD' or date (that whole day), or datetime (exclusive)
+            time_column: 'entry_time' or 'exit_time'
             
         Returns:
             DataFrame of trades
         """
         if not self.conn:
             return pd.DataFrame()
-            
-        query = "SELECT * FROM trades"
-        params = []
-        
-        if start_date and end_date:
-            query += " WHERE entry_time BETWEEN ? AND ?"
-            params.extend([start_date, end_date])
         
-        query += " ORDER BY entry_time ASC"
+        # Read your own writes
+        self.flush()
+            
+        where, params = self._where(start_date, end_date, time_column)
+        query = f"SELECT * FROM trades {where} ORDER BY {time_column} ASC"
         
         try:
             df = pd.read_sql_query(query, self.conn, params=params)
@@ -176,11 +524,152 @@ class TradeDatabase:
             logger.error(f"❌ Failed to fetch trades: {e}")
             return pd.DataFrame()
     
+    def get_metrics(self, start_date: Optional[Union[str, date, datetime]] = None,
+                    end_date: Optional[Union[str, date, datetime]] = None,
+                    time_column: str = 'entry_time', strategy: Optional[str] = None,
+                    symbol: Optional[str] = None, initial_capital: float = 100000.0,
+                    risk_free_rate: float = 0.0, periods_per_year: int = 252) -> Dict:
+        """
+        PerformanceTracker metrics computed inside SQLite
+        
+        Same keys and definitions as PerformanceTracker.calculate_all()
+        over get_trades() of the same slice, without loading the trades:
+        one aggregate row comes back however many trades match.
+        
+        Args:
+            start_date, end_date, time_column: Range as in get_trades()
+            strategy: Only this strategy
+            symbol: Only this symbol
+            initial_capital: Equity before the first trade (drawdown %)
+            risk_free_rate: Annual rate subtracted for the Sharpe ratio
+            periods_per_year: Sharpe annualisation
+            
+        Returns:
+            Dict of metrics (zeros if no trades match)
+        """
+        if not self.conn:
+            return PerformanceTracker.get_empty_metrics()
+        
+        where, params = self._where(start_date, end_date, time_column, strategy, symbol)
+        self.flush()
+        
+        try:
+            row = self.conn.execute(
+                METRICS_QUERY.format(where=where, time_column=time_column), params).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"❌ Failed to calculate metrics: {e}")
+            return PerformanceTracker.get_empty_metrics()
+        
+        n = row['total_trades']
+        if not n:
+            return PerformanceTracker.get_empty_metrics()
+        
+        metrics = {key: row[key] for key in (
+            'total_trades', 'winning_trades', 'losing_trades', 'breakeven_trades',
+            'total_profit', 'total_loss', 'net_pnl')}
+        PerformanceTracker.add_ratios(metrics)
+        metrics['best_trade'] = row['best_trade']
+        metrics['worst_trade'] = row['worst_trade']
+        
+        peak = row['drawdown_peak'] + initial_capital
+        metrics['max_drawdown'] = abs(row['drawdown'])
+        metrics['max_drawdown_percent'] = abs(row['drawdown'] / peak * 100) if peak != 0 else 0
+        
+        # Sample standard deviations, as pandas
+        returns = row['returns']
+        sharpe = 0.0
+        if n > 1 and row['pnl_ss'] > 0 and returns > 1 and row['ret_ss'] > 0:
+            std = (row['ret_ss'] / (returns - 1)) ** 0.5
+            excess = row['mean_ret'] - risk_free_rate / periods_per_year
+            sharpe = excess / std * periods_per_year ** 0.5
+        metrics['sharpe_ratio'] = sharpe
+        
+        return metrics
+    
+    def get_summary(self, dimension: str = 'all', key: Optional[str] = None):
+        """
+        Running totals kept by the writer (primary-key reads, no trade scan)
+        
+        Args:
+            dimension: 'all', 'day' (exit date), 'strategy' or 'symbol'
+            key: Day 'YYYY-MM-DD', strategy or symbol; None for every key
+            
+        Returns:
+            Summary dict for key (zeros if no trades), or {key: summary}
+            for the whole dimension. Summaries hold trades, wins, losses,
+            gross_pnl, gross_profit, gross_loss (negative), pnl_sq,
+            best_pnl, worst_pnl and derived win_rate, avg_pnl, pnl_std
+            and profit_factor.
+        """
+        if dimension not in SUMMARY_DIMENSIONS:
+            raise ValueError(f"dimension must be one of {SUMMARY_DIMENSIONS}")
+        if not self.conn:
+            return {} if key is None else self._summary_dict(None)
+        
+        self.flush()
+        columns = ', '.join(SUMMARY_FIELDS)
+        
+        if dimension == 'all':
+            key = ''
+        if key is not None:
+            row = self.conn.execute(
+                f"SELECT {columns} FROM trade_summary WHERE dimension = ? AND key = ?",
+                (dimension, key)).fetchone()
+            return self._summary_dict(row)
+        
+        rows = self.conn.execute(
+            f"SELECT key, {columns} FROM trade_summary WHERE dimension = ? ORDER BY key", (dimension,))
+        return {row['key']: self._summary_dict(row) for row in rows}
+    
+    def get_daily_summary(self, day: Optional[Union[str, date]] = None) -> Dict:
+        """Summary of trades exited on day (default today)"""
+        day = day or date.today()
+        return self.get_summary('day', day if isinstance(day, str) else day.isoformat())
+    
+    @staticmethod
+    def _summary_dict(row) -> Dict:
+        summary = {field: row[field] for field in SUMMARY_FIELDS} if row else \
+            dict.fromkeys(SUMMARY_FIELDS, 0)
+        n = summary['trades']
+        summary['win_rate'] = summary['wins'] / n * 100 if n else 0.0
+        summary['avg_pnl'] = summary['gross_pnl'] / n if n else 0.0
+        # Sample standard deviation from the running sums
+        variance = (summary['pnl_sq'] - summary['gross_pnl'] ** 2 / n) / (n - 1) if n > 1 else 0.0
+        summary['pnl_std'] = max(variance, 0.0) ** 0.5
+        summary['profit_factor'] = (summary['gross_profit'] / abs(summary['gross_loss'])
+                                    if summary['gross_loss'] else 0.0)
+        return summary
+    
+    def get_recent_trades(self, limit: int = 10) -> pd.DataFrame:
+        """Last trades by exit time, newest first"""
+        if not self.conn:
+            return pd.DataFrame()
+        
+        self.flush()
+        try:
+            return pd.read_sql_query("SELECT * FROM trades ORDER BY exit_time DESC LIMIT ?",
+                                     self.conn, params=[limit])
+        except Exception as e:
+            logger.error(f"❌ Failed to fetch trades: {e}")
+            return pd.DataFrame()
+    
+    def backup(self, backup_dir: str = 'backups', **options):
+        """
+        Online snapshot of this database (see analytics.backup.backup_database)
+        
+        Commits queued trades first; safe to call while trading.
+        
+        Returns:
+            Path of the snapshot, or None on failure
+        """
+        from analytics.backup import backup_database
+        
+        self.flush()
+        return backup_database(self.db_path, backup_dir, **options)
+    
     def __del__(self):
         """Close database connection upon object deletion"""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed")
+        self.close()
 
 
 if __name__ == '__main__':
@@ -203,6 +692,8 @@ if __name__ == '__main__':
         'exit_reason': 'Target Hit'
     }
     db.log_trade(test_trade)
+    db.flush()
+    print(f"Writer stats: {db.stats}")
     
     # Fetch trades
     trades_df = db.get_trades()
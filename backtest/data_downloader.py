@@ -3,10 +3,13 @@ Historical Data Downloader
 Downloads OHLC data from Angel One Historical API
 """
 
+import asyncio
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
+
+from bridge.async_broker import AsyncBrokerClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,7 +28,7 @@ class DataDownloader:
             auth_manager: AngelAuthManager instance
         """
         self.auth_manager = auth_manager
-        self.historical_api = auth_manager.get_historical_api()
+        self.historical_api = auth_manager.get_connection('historical')
         
         if not self.historical_api:
             logger.error("❌ Historical API not available")
@@ -67,42 +70,101 @@ class DataDownloader:
             logger.info(f"   Interval: {interval}")
             
             # Angel One API call
-            params = {
-                "exchange": "NFO",
-                "symboltoken": symbol_token,
-                "interval": interval,
-                "fromdate": f"{from_date} 09:15",
-                "todate": f"{to_date} 15:30"
-            }
+            params = self._candle_params(symbol_token, interval, from_date, to_date)
             
             response = self.historical_api.getCandleData(params)
             
-            if response['status'] and response['data']:
-                # Convert to DataFrame
-                df = pd.DataFrame(
-                    response['data'],
-                    columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-                )
-                
-                # Convert timestamp to datetime
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                
-                # Convert price columns to float
-                for col in ['open', 'high', 'low', 'close']:
-                    df[col] = df[col].astype(float)
-                
-                df['volume'] = df['volume'].astype(int)
-                
-                logger.info(f"✅ Downloaded {len(df)} candles")
-                return df
-            else:
-                logger.error(f"❌ No data received: {response.get('message', 'Unknown error')}")
-                return pd.DataFrame()
+            return self._to_dataframe(response)
                 
         except Exception as e:
             logger.error(f"❌ Download failed: {e}")
             return pd.DataFrame()
     
+    @staticmethod
+    def _candle_params(symbol_token: str, interval: str, from_date: str, to_date: str) -> Dict:
+        """getCandleData request body"""
+        return {
+            "exchange": "NFO",
+            "symboltoken": symbol_token,
+            "interval": interval,
+            "fromdate": f"{from_date} 09:15",
+            "todate": f"{to_date} 15:30"
+        }
+    
+    @staticmethod
+    def _to_dataframe(response: Dict) -> pd.DataFrame:
+        """Convert a getCandleData response to an OHLCV DataFrame"""
+        if response and response.get('status') and response.get('data'):
+            # Convert to DataFrame
+            df = pd.DataFrame(
+                response['data'],
+                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
+            )
+            
+            # Convert timestamp to datetime
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            
+            # Convert price columns to float
+            for col in ['open', 'high', 'low', 'close']:
+                df[col] = df[col].astype(float)
+            
+            df['volume'] = df['volume'].astype(int)
+            
+            logger.info(f"✅ Downloaded {len(df)} candles")
+            return df
+        
+        message = response.get('message', 'Unknown error') if response else 'No response'
+        logger.error(f"❌ No data received: {message}")
+        return pd.DataFrame()
+    
+    def download_many(
+        self,
+        symbol_tokens: List[str],
+        interval: str = "FIVE_MINUTE",
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        client: Optional[AsyncBrokerClient] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Download several tokens concurrently over one pooled async client
+        
+        Requests are paced by the client's getCandleData rate limit, so a
+        long token list queues locally instead of hitting broker throttling.
+        
+        Args:
+            symbol_tokens: Tokens to download
+            interval: Candle interval
+            from_date: Start date (YYYY-MM-DD)
+            to_date: End date (YYYY-MM-DD)
+            client: Async client to use (default: built from the auth manager)
+            
+        Returns:
+            Dict of token -> DataFrame (empty DataFrame on failure)
+        """
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        if not to_date:
+            to_date = datetime.now().strftime('%Y-%m-%d')
+        
+        client = client or AsyncBrokerClient.from_auth(self.auth_manager, 'historical')
+        if client is None:
+            return {token: pd.DataFrame() for token in symbol_tokens}
+        
+        async def fetch_all():
+            async with client:
+                return await client.batch([
+                    ('candle_data', self._candle_params(token, interval, from_date, to_date))
+                    for token in symbol_tokens
+                ])
+        
+        logger.info(f"📥 Downloading {len(symbol_tokens)} tokens concurrently ({from_date} to {to_date})")
+        responses = asyncio.run(fetch_all())
+        
+        return {
+            token: self._to_dataframe(response)
+            for token, response in zip(symbol_tokens, responses)
+        }
+    
     def download_multiple_days(
         self,
         symbol_token: str,
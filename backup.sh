@@ -7,8 +7,12 @@ echo "📦 Creating backup..."
 
 mkdir -p $BACKUP_DIR
 
-# Backup database
-cp data/trades.db "$BACKUP_DIR/trades_$DATE.db"
+# Backup database (online snapshot - safe while the agent is writing;
+# older snapshots are compressed and rotated)
+if ! python3 -m analytics.backup --db data/trades.db --dir "$BACKUP_DIR"; then
+    echo "❌ Database backup failed"
+    exit 1
+fi
 
 # Backup logs
 if [ -f "data/trading.log" ]; then
@@ -21,4 +25,4 @@ if [ -f ".env" ]; then
 fi
 
 echo "✅ Backup created: $BACKUP_DIR"
-ls -lh $BACKUP_DIR/*$DATE*
+ls -lht $BACKUP_DIR | head -5
@@ -0,0 +1,332 @@
+"""
+Async Broker Client Module
+asyncio client for the Angel One SmartAPI REST endpoints with keep-alive
+connection pooling, per-endpoint rate limits and request timeouts
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_URL = 'https://apiconnect.angelone.in'
+
+# endpoint -> (HTTP method, route) - same routes SmartConnect uses
+ROUTES = {
+    'place_order': ('POST', '/rest/secure/angelbroking/order/v1/placeOrder'),
+    'modify_order': ('POST', '/rest/secure/angelbroking/order/v1/modifyOrder'),
+    'cancel_order': ('POST', '/rest/secure/angelbroking/order/v1/cancelOrder'),
+    'order_book': ('GET', '/rest/secure/angelbroking/order/v1/getOrderBook'),
+    'trade_book': ('GET', '/rest/secure/angelbroking/order/v1/getTradeBook'),
+    'order_details': ('GET', '/rest/secure/angelbroking/order/v1/details/{unique_order_id}'),
+    'ltp': ('POST', '/rest/secure/angelbroking/order/v1/getLtpData'),
+    'position': ('GET', '/rest/secure/angelbroking/order/v1/getPosition'),
+    'candle_data': ('POST', '/rest/secure/angelbroking/historical/v1/getCandleData')
+}
+
+# Requests per second allowed by Angel One for each endpoint
+RATE_LIMITS = {
+    'place_order': 20,
+    'modify_order': 20,
+    'cancel_order': 20,
+    'order_book': 1,
+    'trade_book': 1,
+    'order_details': 10,
+    'ltp': 10,
+    'position': 1,
+    'candle_data': 3
+}
+
+
+class TokenBucket:
+    """Async token bucket - rate tokens per second, bursts up to capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def error_response(message: str, errorcode: str = 'CLIENT_ERROR') -> Dict:
+    """Failure shaped like a SmartAPI response"""
+    return {'status': False, 'message': message, 'errorcode': errorcode, 'data': None}
+
+
+class BackgroundLoop:
+    """
+    Event loop on a daemon thread for synchronous callers
+
+    Keeps one AsyncBrokerClient (and its warm connections) alive across
+    calls instead of paying a new loop and session per asyncio.run().
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class AsyncBrokerClient:
+    """
+    Async SmartAPI client
+
+    One aiohttp session per client keeps connections alive and pooled, so
+    concurrent requests (asyncio.gather / batch) share warm TCP+TLS
+    connections instead of each paying the handshake. Every endpoint has
+    its own token bucket, so bursts queue locally instead of being rejected
+    by the broker.
+
+    Usage:
+        async with AsyncBrokerClient(api_key, auth_token) as client:
+            responses = await client.batch([('place_order', leg) for leg in legs])
+    """
+
+    def __init__(self, api_key: str, auth_token: str,
+                 root: str = ROOT_URL,
+                 timeout: float = 10.0,
+                 max_connections: int = 20,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 client_local_ip: str = '127.0.0.1',
+                 client_public_ip: str = '127.0.0.1',
+                 mac_address: str = '00:00:00:00:00:00'):
+        """
+        Initialize client
+
+        Args:
+            api_key: SmartAPI key (X-PrivateKey)
+            auth_token: JWT from login ('Bearer ' prefix optional)
+            root: API root URL (point at MockBrokerServer.url for tests)
+            timeout: Total timeout per request in seconds
+            max_connections: Size of the keep-alive connection pool
+            rate_limits: Requests per second overrides by endpoint
+        """
+        self.root = root.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_connections = max_connections
+
+        if not auth_token.startswith('Bearer '):
+            auth_token = f"Bearer {auth_token}"
+
+        self.headers = {
+            'Authorization': auth_token,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'X-UserType': 'USER',
+            'X-SourceID': 'WEB',
+            'X-ClientLocalIP': client_local_ip,
+            'X-ClientPublicIP': client_public_ip,
+            'X-MACAddress': mac_address,
+            'X-PrivateKey': api_key
+        }
+
+        limits = dict(RATE_LIMITS)
+        limits.update(rate_limits or {})
+        self.buckets = {name: TokenBucket(rate) for name, rate in limits.items()}
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.stats = {'requests': 0, 'errors': 0, 'timeouts': 0}
+
+    @classmethod
+    def from_auth(cls, auth_manager, api_type: str = 'trading', **kwargs) -> Optional['AsyncBrokerClient']:
+        """
+        Build a client from an AngelAuthManager session
+
+        Args:
+            auth_manager: AngelAuthManager instance
+            api_type: API whose key and session to use
+        """
+        if api_type not in auth_manager.auth_tokens and not auth_manager.login(api_type):
+            logger.error(f"❌ No {api_type} session for async client")
+            return None
+
+        return cls(
+            api_key=auth_manager.api_keys[api_type],
+            auth_token=auth_manager.auth_tokens[api_type]['auth_token'],
+            **kwargs
+        )
+
+    async def open(self):
+        """Create the pooled HTTP session"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self.headers
+            )
+
+    async def close(self):
+        """Close the session and its connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, endpoint: str, payload: Optional[Dict] = None,
+                      **path_params) -> Dict:
+        """
+        Call one endpoint
+
+        Args:
+            endpoint: Key of ROUTES
+            payload: JSON body for POST endpoints
+            path_params: Values for route placeholders
+
+        Returns:
+            Broker JSON response (status / message / data); failures are
+            returned as status False, never raised
+        """
+        method, route = ROUTES[endpoint]
+        url = self.root + route.format(**path_params)
+
+        bucket = self.buckets.get(endpoint)
+        if bucket:
+            await bucket.acquire()
+
+        await self.open()
+        self.stats['requests'] += 1
+
+        try:
+            async with self.session.request(method, url, json=payload) as response:
+                if response.status >= 400:
+                    self.stats['errors'] += 1
+                    text = await response.text()
+                    logger.error(f"❌ {endpoint} HTTP {response.status}: {text[:200]}")
+                    return error_response(f"HTTP {response.status}", str(response.status))
+                return await response.json(content_type=None)
+
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.error(f"❌ {endpoint} timed out")
+            return error_response('Request timed out', 'TIMEOUT')
+        except aiohttp.ClientError as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ {endpoint} request failed: {e}")
+            return error_response(str(e))
+        except ValueError as e:
+            # 200 with a non-JSON body (e.g. a gateway's HTML error page)
+            self.stats['errors'] += 1
+            logger.error(f"❌ {endpoint} returned invalid JSON: {e}")
+            return error_response('Invalid JSON response', 'BAD_RESPONSE')
+
+    async def batch(self, calls: List[Tuple[str, Optional[Dict]]]) -> List[Dict]:
+        """
+        Issue many requests concurrently over the pooled connections
+
+        aiohttp does not pipeline HTTP/1.1 requests; concurrent requests on
+        keep-alive connections give the same overlap without head-of-line
+        blocking.
+
+        Args:
+            calls: (endpoint, payload) pairs
+
+        Returns:
+            Responses in call order
+        """
+        return await asyncio.gather(*(self.request(endpoint, payload) for endpoint, payload in calls))
+
+    # SmartConnect-style helpers
+
+    async def place_order(self, order_params: Dict) -> Dict:
+        return await self.request('place_order', order_params)
+
+    async def modify_order(self, order_params: Dict) -> Dict:
+        return await self.request('modify_order', order_params)
+
+    async def cancel_order(self, order_id: str, variety: str = 'NORMAL') -> Dict:
+        return await self.request('cancel_order', {'variety': variety, 'orderid': order_id})
+
+    async def order_book(self) -> Dict:
+        return await self.request('order_book')
+
+    async def trade_book(self) -> Dict:
+        return await self.request('trade_book')
+
+    async def order_details(self, unique_order_id: str) -> Dict:
+        """Single order status - keyed by the placeOrder uniqueorderid, not the orderid"""
+        return await self.request('order_details', unique_order_id=unique_order_id)
+
+    async def position(self) -> Dict:
+        return await self.request('position')
+
+    async def get_candle_data(self, params: Dict) -> Dict:
+        return await self.request('candle_data', params)
+
+
+# ==============================================================================
+# TEST FUNCTION
+# ==============================================================================
+
+if __name__ == "__main__":
+    from bridge.mock_broker import MockBrokerServer
+
+    async def demo(url):
+        legs = [
+            {'variety': 'NORMAL', 'tradingsymbol': f'NIFTY{i}', 'symboltoken': str(i),
+             'transactiontype': 'BUY', 'exchange': 'NFO', 'ordertype': 'MARKET',
+             'producttype': 'INTRADAY', 'duration': 'DAY', 'price': '0', 'quantity': '75'}
+            for i in range(4)
+        ]
+
+        async with AsyncBrokerClient('demo-key', 'demo-token', root=url) as client:
+            start = time.perf_counter()
+            responses = await client.batch([('place_order', leg) for leg in legs])
+            elapsed = (time.perf_counter() - start) * 1000
+
+            print(f"✅ {len(responses)} orders in {elapsed:.1f} ms")
+            for response in responses:
+                print(f"   {response['data']['orderid']}")
+
+            positions = await client.position()
+            print(f"📊 Positions: {len(positions['data'])}")
+
+    print("\n" + "="*60)
+    print("🧪 ASYNC BROKER CLIENT TEST (mock broker)")
+    print("="*60 + "\n")
+
+    server = MockBrokerServer(latency=0.05)
+    server.start()
+    try:
+        asyncio.run(demo(server.url))
+    finally:
+        server.stop()
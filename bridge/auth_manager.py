@@ -5,10 +5,14 @@ Handles Angel One login, session management, and TOTP generation
 
 import os
 import pyotp
+from pathlib import Path
+from typing import Dict, Optional
 from SmartApi import SmartConnect
 from dotenv import load_dotenv
 import logging
 
+from bridge.session_pool import get_session_pool, make_session
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,8 +20,15 @@ logger = logging.getLogger(__name__)
 class AngelAuthManager:
     """Manages authentication with Angel One APIs"""
     
-    def __init__(self):
-        """Initialize auth manager with credentials from .env"""
+    def __init__(self, use_session_pool: Optional[bool] = None, data_dir: str = 'data'):
+        """
+        Initialize auth manager with credentials from .env
+        
+        Args:
+            use_session_pool: Reuse cached sessions across components and
+                              restarts (default: SESSION_POOL env, on)
+            data_dir: Directory of the session cache file
+        """
         load_dotenv()
         
         # Login credentials
@@ -44,6 +55,10 @@ class AngelAuthManager:
         self.connections = {}
         self.auth_tokens = {}
         
+        if use_session_pool is None:
+            use_session_pool = os.getenv('SESSION_POOL', 'true').lower() == 'true'
+        self.session_pool = get_session_pool(Path(data_dir) / 'sessions.json') if use_session_pool else None
+        
         logger.info("✅ Auth Manager initialized")
     
     def generate_totp(self):
@@ -57,12 +72,17 @@ class AngelAuthManager:
             logger.error(f"❌ TOTP generation failed: {e}")
             return None
     
-    def login(self, api_type='trading'):
+    def login(self, api_type='trading', force=False):
         """
         Login to Angel One for specific API type
         
+        With the session pool on, a cached session is reused (or renewed
+        with its refresh token) and a TOTP login only happens when no
+        usable session exists.
+        
         Args:
             api_type: 'market', 'publisher', 'historical', or 'trading'
+            force: Ignore pooled sessions and log in again
         
         Returns:
             SmartConnect object if successful, None otherwise
@@ -75,48 +95,137 @@ class AngelAuthManager:
                 logger.error(f"❌ Missing credentials for {api_type} API")
                 return None
             
-            # Create SmartConnect instance
-            smart_api = SmartConnect(api_key=api_key)
+            if self.session_pool is None:
+                session, smart_api = self._generate_session(api_type)
+                if not session:
+                    return None
+            else:
+                key = self._pool_key(api_type)
+                session = self.session_pool.acquire(
+                    key,
+                    login=lambda: self._pooled_login(api_type),
+                    renew=lambda old: self._renew_session(api_type, old),
+                    force=force
+                )
+                if not session:
+                    return None
+                smart_api = self.session_pool.get_connection(
+                    key, session, lambda s: self._connect(api_type, s)
+                )
+            
+            # Store connection and tokens
+            self.connections[api_type] = smart_api
+            self.auth_tokens[api_type] = {
+                'auth_token': session['auth_token'],
+                'refresh_token': session['refresh_token'],
+                'feed_token': session['feed_token']
+            }
+            
+            return smart_api
+                
+        except Exception as e:
+            logger.error(f"❌ Login exception for {api_type}: {e}")
+            return None
+    
+    def _pool_key(self, api_type: str) -> str:
+        return f"{self.client_id}:{api_type}"
+    
+    def _generate_session(self, api_type: str):
+        """
+        Full TOTP login
+        
+        Returns:
+            (session dict, SmartConnect) or (None, None)
+        """
+        # Create SmartConnect instance
+        smart_api = SmartConnect(api_key=self.api_keys.get(api_type))
+        
+        # Generate TOTP
+        totp_code = self.generate_totp()
+        if not totp_code:
+            return None, None
+        
+        # Login
+        logger.info(f"🔄 Logging in to {api_type.upper()} API...")
+        
+        session_data = smart_api.generateSession(
+            clientCode=self.client_id,
+            password=self.password,
+            totp=totp_code
+        )
+        
+        if not session_data['status']:
+            logger.error(f"❌ Login failed: {session_data.get('message', 'Unknown error')}")
+            return None, None
+        
+        session = make_session(
+            session_data['data']['jwtToken'],
+            session_data['data']['refreshToken'],
+            session_data['data']['feedToken']
+        )
+        
+        logger.info(f"✅ {api_type.upper()} API login successful!")
+        logger.info(f"📊 Feed Token: {session['feed_token'][:20]}...")
+        
+        return session, smart_api
+    
+    def _pooled_login(self, api_type: str) -> Optional[Dict]:
+        """Full login whose connection is handed to the session pool"""
+        session, smart_api = self._generate_session(api_type)
+        if session:
+            self.session_pool.set_connection(self._pool_key(api_type), session, smart_api)
+        return session
+    
+    def _renew_session(self, api_type: str, session: Dict) -> Optional[Dict]:
+        """
+        Renew a session with its refresh token (no TOTP)
+        
+        Returns:
+            New session dict or None if the refresh token was rejected
+        """
+        try:
+            smart_api = self._connect(api_type, session)
+            response = smart_api.generateToken(session['refresh_token'])
             
-            # Generate TOTP
-            totp_code = self.generate_totp()
-            if not totp_code:
+            if not response or not response.get('status'):
+                logger.warning(f"⚠️  Session renewal rejected for {api_type}")
                 return None
             
-            # Login
-            logger.info(f"🔄 Logging in to {api_type.upper()} API...")
+            data = response['data']
+            jwt_token = data['jwtToken']
+            if not jwt_token.startswith('Bearer '):
+                jwt_token = f"Bearer {jwt_token}"
             
-            session_data = smart_api.generateSession(
-                clientCode=self.client_id,
-                password=self.password,
-                totp=totp_code
+            renewed = make_session(
+                jwt_token,
+                data.get('refreshToken') or session['refresh_token'],
+                data.get('feedToken') or session['feed_token']
             )
+            smart_api.setAccessToken(jwt_token[len('Bearer '):])
+            smart_api.setRefreshToken(renewed['refresh_token'])
+            self.session_pool.set_connection(self._pool_key(api_type), renewed, smart_api)
+            
+            logger.info(f"✅ {api_type.upper()} session renewed")
+            return renewed
             
-            if session_data['status']:
-                auth_token = session_data['data']['jwtToken']
-                refresh_token = session_data['data']['refreshToken']
-                feed_token = session_data['data']['feedToken']
-                
-                # Store connection and tokens
-                self.connections[api_type] = smart_api
-                self.auth_tokens[api_type] = {
-                    'auth_token': auth_token,
-                    'refresh_token': refresh_token,
-                    'feed_token': feed_token
-                }
-                
-                logger.info(f"✅ {api_type.upper()} API login successful!")
-                logger.info(f"📊 Feed Token: {feed_token[:20]}...")
-                
-                return smart_api
-            else:
-                logger.error(f"❌ Login failed: {session_data.get('message', 'Unknown error')}")
-                return None
-                
         except Exception as e:
-            logger.error(f"❌ Login exception for {api_type}: {e}")
+            logger.warning(f"⚠️  Session renewal failed for {api_type}: {e}")
             return None
     
+    def _connect(self, api_type: str, session: Dict) -> SmartConnect:
+        """SmartConnect bound to an existing session (no login)"""
+        auth_token = session['auth_token']
+        if auth_token.startswith('Bearer '):
+            auth_token = auth_token[len('Bearer '):]
+        
+        return SmartConnect(
+            api_key=self.api_keys.get(api_type),
+            access_token=auth_token,
+            refresh_token=session['refresh_token'],
+            feed_token=session['feed_token'],
+            userId=self.client_id
+        )
+    
     def get_connection(self, api_type='trading'):
         """Get existing connection or create new one"""
         if api_type in self.connections:
@@ -130,21 +239,33 @@ class AngelAuthManager:
             return self.auth_tokens[api_type]['feed_token']
         return None
     
-    def logout(self, api_type='trading'):
-        """Logout from specific API"""
+    def logout(self, api_type='trading', terminate=False):
+        """
+        Logout from specific API
+        
+        Args:
+            api_type: API type to release
+            terminate: End the broker session even when it is pooled
+                       (other components and restarts would need a new login)
+        """
         try:
             if api_type in self.connections:
-                self.connections[api_type].terminateSession(self.client_id)
-                logger.info(f"✅ Logged out from {api_type.upper()} API")
+                if self.session_pool is None or terminate:
+                    self.connections[api_type].terminateSession(self.client_id)
+                    if self.session_pool is not None:
+                        self.session_pool.remove(self._pool_key(api_type))
+                    logger.info(f"✅ Logged out from {api_type.upper()} API")
+                else:
+                    logger.info(f"✅ Released {api_type.upper()} API (session kept in pool)")
                 del self.connections[api_type]
                 del self.auth_tokens[api_type]
         except Exception as e:
             logger.error(f"❌ Logout failed: {e}")
     
-    def logout_all(self):
+    def logout_all(self, terminate=False):
         """Logout from all APIs"""
         for api_type in list(self.connections.keys()):
-            self.logout(api_type)
+            self.logout(api_type, terminate=terminate)
         logger.info("✅ Logged out from all APIs")
 
 
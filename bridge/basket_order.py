@@ -0,0 +1,360 @@
+"""
+Basket Order Module
+Concurrent multi-leg order placement (straddles, strangles, spreads) with
+per-leg fill tracking and rollback / hedge on partial failure
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from bridge.async_broker import AsyncBrokerClient
+
+logger = logging.getLogger(__name__)
+
+
+ORDER_TYPES = ('MARKET', 'LIMIT')
+
+# Broker order statuses that will not change any more
+TERMINAL_STATUSES = ('complete', 'cancelled', 'rejected')
+
+# What to do when some legs fail or stay unfilled
+ON_FAILURE = ('rollback', 'hedge', 'none')
+
+
+@dataclass(slots=True)
+class BasketLeg:
+    """One leg of a basket and its fill state"""
+    symbol: str
+    exchange: str
+    transaction_type: str
+    quantity: int
+    order_type: str = 'MARKET'
+    price: float = 0.0
+    strategy: Optional[str] = None
+
+    # Filled in by validation
+    token: Optional[str] = None
+    freeze_qty: int = 0
+
+    # Fill tracking
+    order_ids: List[str] = field(default_factory=list)
+    order_qty: Dict[str, int] = field(default_factory=dict)       # order id -> child quantity ordered
+    unique_ids: Dict[str, str] = field(default_factory=dict)      # order id -> uniqueorderid (details key)
+    order_status: Dict[str, str] = field(default_factory=dict)
+    order_fills: Dict[str, tuple] = field(default_factory=dict)   # order id -> (qty, avg price)
+    filled_qty: int = 0
+    avg_price: float = 0.0
+    status: str = 'NEW'      # NEW, OPEN, PARTIAL, FILLED, REJECTED
+    error: Optional[str] = None
+    acked_at: Optional[float] = None
+
+    @property
+    def remaining_qty(self) -> int:
+        return self.quantity - self.filled_qty
+
+    def child_quantities(self, quantity: Optional[int] = None) -> List[int]:
+        """Split a quantity into child orders below the freeze limit"""
+        quantity = self.quantity if quantity is None else quantity
+        if self.freeze_qty <= 0 or quantity <= self.freeze_qty:
+            return [quantity]
+
+        # Freeze limits are lot multiples, so full slices stay lot-aligned
+        children = [self.freeze_qty] * (quantity // self.freeze_qty)
+        if quantity % self.freeze_qty:
+            children.append(quantity % self.freeze_qty)
+        return children
+
+
+@dataclass
+class BasketResult:
+    """Outcome of a basket order"""
+    status: str                                  # COMPLETE, PARTIAL, ROLLED_BACK, HEDGED, REJECTED
+    legs: List[BasketLeg]
+    errors: List[str] = field(default_factory=list)
+    skew_ms: float = 0.0                         # first to last leg acknowledgement
+    elapsed_ms: float = 0.0
+    unwind_legs: List[BasketLeg] = field(default_factory=list)   # orders that flattened filled legs
+
+    @property
+    def success(self) -> bool:
+        return self.status in ('COMPLETE', 'HEDGED')
+
+
+class BasketExecutor:
+    """
+    Submits all legs of a basket concurrently over one async broker client
+
+    Every child order is sent in a single gather, so the legs reach the
+    broker within milliseconds of each other; fills are then polled per
+    order until every leg is terminal or the fill timeout passes.
+    """
+
+    def __init__(self, client: AsyncBrokerClient,
+                 build_params: Callable[[BasketLeg, str, int, str, float], Dict],
+                 fill_timeout: float = 5.0,
+                 poll_interval: float = 0.2):
+        """
+        Initialize basket executor
+
+        Args:
+            client: Async broker client
+            build_params: Builds placeOrder params from
+                          (leg, transaction_type, quantity, order_type, price)
+            fill_timeout: Seconds to wait for fills before failure handling
+            poll_interval: Seconds between order status polls
+        """
+        self.client = client
+        self.build_params = build_params
+        self.fill_timeout = fill_timeout
+        self.poll_interval = poll_interval
+
+    async def execute(self, legs: List[BasketLeg], on_failure: str = 'rollback') -> BasketResult:
+        """
+        Place all legs and resolve partial failures
+
+        Args:
+            legs: Validated legs
+            on_failure: 'rollback' (flatten filled legs), 'hedge' (complete
+                        unfilled legs at market, rollback if that fails)
+                        or 'none'
+
+        Returns:
+            BasketResult
+        """
+        start = time.monotonic()
+
+        await self._submit(legs, [(leg, leg.transaction_type, leg.quantity, leg.order_type, leg.price)
+                                  for leg in legs])
+        await self._track(legs)
+
+        acked = [leg.acked_at for leg in legs if leg.acked_at is not None]
+        skew_ms = (max(acked) - min(acked)) * 1000 if acked else 0.0
+
+        if all(leg.status == 'FILLED' for leg in legs):
+            status = 'COMPLETE'
+            unwind = []
+        else:
+            status, unwind = await self._handle_failure(legs, on_failure)
+
+        result = BasketResult(
+            status=status,
+            legs=legs,
+            errors=[f"{leg.symbol}: {leg.error}" for leg in legs if leg.error],
+            skew_ms=skew_ms,
+            elapsed_ms=(time.monotonic() - start) * 1000,
+            unwind_legs=unwind
+        )
+
+        logger.info(
+            f"🧺 Basket {result.status}: {len(legs)} legs | "
+            f"skew {result.skew_ms:.1f} ms | {result.elapsed_ms:.0f} ms total"
+        )
+
+        return result
+
+    async def place(self, legs: List[BasketLeg]) -> BasketResult:
+        """
+        Place all legs and wait for fills, without failure handling
+
+        Unfilled orders are left working (e.g. kill switch exits, which
+        must not be pulled because a fill was slow).
+
+        Returns:
+            BasketResult - COMPLETE or PARTIAL
+        """
+        start = time.monotonic()
+
+        await self._submit(legs, [(leg, leg.transaction_type, leg.quantity, leg.order_type, leg.price)
+                                  for leg in legs])
+        await self._track(legs)
+
+        return BasketResult(
+            status='COMPLETE' if all(leg.status == 'FILLED' for leg in legs) else 'PARTIAL',
+            legs=legs,
+            errors=[f"{leg.symbol}: {leg.error}" for leg in legs if leg.error],
+            elapsed_ms=(time.monotonic() - start) * 1000
+        )
+
+    async def _submit(self, legs: List[BasketLeg], requests: List[tuple]) -> List[str]:
+        """
+        Send child orders for (leg, side, quantity, type, price) in one gather
+
+        Returns:
+            Order ids placed
+        """
+        calls = []
+        for leg, side, quantity, order_type, price in requests:
+            for child_qty in leg.child_quantities(quantity):
+                calls.append((leg, child_qty, self.build_params(leg, side, child_qty, order_type, price)))
+
+        async def place(params):
+            response = await self.client.place_order(params)
+            return response, time.monotonic()
+
+        # One gather for every child order; each ack is timed on arrival
+        results = await asyncio.gather(*(place(params) for _, _, params in calls))
+
+        placed = []
+        for (leg, child_qty, _), (response, acked_at) in zip(calls, results):
+            if leg.acked_at is None or acked_at < leg.acked_at:
+                leg.acked_at = acked_at
+            if response.get('status') and response.get('data'):
+                order_id = response['data']['orderid']
+                leg.order_ids.append(order_id)
+                leg.order_qty[order_id] = child_qty
+                if response['data'].get('uniqueorderid'):
+                    leg.unique_ids[order_id] = response['data']['uniqueorderid']
+                leg.order_status[order_id] = 'open'
+                placed.append(order_id)
+            else:
+                leg.error = response.get('message', 'Order failed')
+                logger.error(f"❌ Basket leg {leg.symbol} rejected: {leg.error}")
+
+        for leg in legs:
+            self._update_leg_status(leg)
+
+        return placed
+
+    async def _track(self, legs: List[BasketLeg], order_ids: Optional[List[str]] = None):
+        """
+        Poll until the given (default: all) orders are terminal
+
+        Order details are fetched by uniqueorderid; orders whose placeOrder
+        response carried none are looked up in the order book instead.
+        """
+        deadline = time.monotonic() + self.fill_timeout
+        by_order = {oid: leg for leg in legs for oid in leg.order_ids
+                    if order_ids is None or oid in order_ids}
+
+        while True:
+            pending = [oid for oid, leg in by_order.items()
+                       if leg.order_status.get(oid) not in TERMINAL_STATUSES]
+            if not pending:
+                break
+
+            rows = await self._fetch_orders({oid: by_order[oid] for oid in pending})
+            for oid, row in rows.items():
+                status = row.get('status', 'open')
+                by_order[oid].order_status[oid] = status
+                if status == 'rejected':
+                    by_order[oid].error = row.get('text') or 'Rejected by broker'
+                by_order[oid].order_fills[oid] = (
+                    int(row.get('filledshares', 0) or 0),
+                    float(row.get('averageprice', 0) or 0)
+                )
+
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        for leg in legs:
+            self._update_leg_status(leg)
+
+    async def _fetch_orders(self, pending: Dict[str, BasketLeg]) -> Dict[str, Dict]:
+        """Current broker rows of the pending orders, by order id (missing if the read failed)"""
+        detailed = [oid for oid, leg in pending.items() if oid in leg.unique_ids]
+        unkeyed = [oid for oid in pending if oid not in detailed]
+
+        calls = [self.client.order_details(pending[oid].unique_ids[oid]) for oid in detailed]
+        if unkeyed:
+            calls.append(self.client.order_book())
+        responses = await asyncio.gather(*calls)
+
+        rows = {}
+        for oid, response in zip(detailed, responses):
+            if response.get('status') and response.get('data'):
+                rows[oid] = response['data']
+        if unkeyed:
+            book = responses[-1]
+            if book.get('status'):
+                wanted = set(unkeyed)
+                for row in book.get('data') or []:
+                    if row.get('orderid') in wanted:
+                        rows[row['orderid']] = row
+        return rows
+
+    @staticmethod
+    def _update_leg_status(leg: BasketLeg):
+        """Aggregate child order fills into the leg"""
+        filled = 0
+        value = 0.0
+        for oid in leg.order_ids:
+            qty, price = leg.order_fills.get(oid, (0, 0.0))
+            filled += qty
+            value += qty * price
+
+        leg.filled_qty = filled
+        leg.avg_price = round(value / filled, 2) if filled else 0.0
+
+        statuses = [leg.order_status[oid] for oid in leg.order_ids]
+        if filled >= leg.quantity:
+            leg.status = 'FILLED'
+        elif filled > 0:
+            leg.status = 'PARTIAL'
+        elif not statuses or all(s in ('rejected', 'cancelled') for s in statuses):
+            leg.status = 'REJECTED'
+        else:
+            leg.status = 'OPEN'
+
+    async def _cancel_open(self, legs: List[BasketLeg]):
+        """Cancel every child order still working"""
+        open_orders = [(leg, oid) for leg in legs for oid in leg.order_ids
+                       if leg.order_status.get(oid) not in TERMINAL_STATUSES]
+        if not open_orders:
+            return
+
+        await asyncio.gather(*(self.client.cancel_order(oid) for _, oid in open_orders))
+        # Re-read so fills that raced the cancel are counted
+        await self._track(legs, [oid for _, oid in open_orders])
+
+    async def _handle_failure(self, legs: List[BasketLeg], on_failure: str):
+        """
+        Resolve a partially filled basket
+
+        Returns:
+            (status, unwind legs)
+        """
+        await self._cancel_open(legs)
+
+        if on_failure != 'hedge' and not any(leg.filled_qty for leg in legs):
+            return 'REJECTED', []
+
+        if on_failure == 'none':
+            return 'PARTIAL', []
+
+        if on_failure == 'hedge':
+            # Complete the missing quantity at market
+            missing = [(leg, leg.transaction_type, leg.remaining_qty, 'MARKET', 0.0)
+                       for leg in legs if leg.remaining_qty > 0]
+            placed = await self._submit(legs, missing)
+            await self._track(legs, placed)
+            await self._cancel_open(legs)
+
+            if all(leg.status == 'FILLED' for leg in legs):
+                logger.warning("⚠️  Basket completed at market after a partial failure")
+                return 'HEDGED', []
+
+        # Flatten whatever was filled
+        unwind = [(leg, 'SELL' if leg.transaction_type == 'BUY' else 'BUY', leg.filled_qty, 'MARKET', 0.0)
+                  for leg in legs if leg.filled_qty > 0]
+        if not unwind:
+            return 'ROLLED_BACK', []
+
+        unwind_legs = [
+            BasketLeg(symbol=leg.symbol, exchange=leg.exchange, transaction_type=side,
+                      quantity=qty, strategy=leg.strategy, token=leg.token, freeze_qty=leg.freeze_qty)
+            for leg, side, qty, _, _ in unwind
+        ]
+        await self._submit(unwind_legs, [(u, u.transaction_type, u.quantity, 'MARKET', 0.0)
+                                         for u in unwind_legs])
+        await self._track(unwind_legs)
+
+        if all(u.status == 'FILLED' for u in unwind_legs):
+            logger.warning(f"⚠️  Basket rolled back: {len(unwind_legs)} filled legs flattened")
+            return 'ROLLED_BACK', unwind_legs
+
+        logger.error("❌ Basket rollback incomplete - check positions manually")
+        return 'PARTIAL', unwind_legs
@@ -0,0 +1,280 @@
+"""
+Contract Specs Module
+Per-token lot size, tick size and freeze quantity tables with vectorized
+quantity / price rounding for batches of orders
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Exchange freeze quantities (units per order) for index derivatives.
+# NSE revises these periodically - override them in data/freeze_limits.json
+FREEZE_QUANTITIES = {
+    'NIFTY': 1800,
+    'BANKNIFTY': 900,
+    'FINNIFTY': 1800,
+    'MIDCPNIFTY': 2800,
+    'NIFTYNXT50': 600
+}
+
+
+def load_freeze_limits(path: Optional[Path] = None) -> Dict[str, int]:
+    """
+    Freeze quantities per underlying, with overrides from a JSON file
+
+    Args:
+        path: Optional JSON file of {underlying: freeze_qty}
+
+    Returns:
+        Dict of underlying -> freeze quantity
+    """
+    limits = dict(FREEZE_QUANTITIES)
+
+    if path and Path(path).exists():
+        try:
+            with open(path) as f:
+                limits.update({k.upper(): int(v) for k, v in json.load(f).items()})
+        except Exception as e:
+            logger.error(f"❌ Failed to load freeze limits from {path}: {e}")
+
+    return limits
+
+
+def _freeze_key(info: Dict) -> str:
+    """Underlying a freeze limit applies to (derivatives only)"""
+    if not str(info.get('instrument', '')).startswith(('FUT', 'OPT')):
+        return ''
+    return info.get('underlying') or str(info.get('name', '')).upper()
+
+
+def _token_key(token) -> int:
+    """Angel tokens are numeric strings; index them as int64"""
+    try:
+        return int(token)
+    except (TypeError, ValueError):
+        return -1
+
+
+class ContractSpecs:
+    """
+    Columnar lot / tick / freeze table keyed by token
+
+    Tokens are kept as a sorted int64 array, so a whole basket resolves to
+    row indexes with one np.searchsorted call.
+    """
+
+    def __init__(self, tokens: np.ndarray, lot_sizes: np.ndarray,
+                 tick_sizes: np.ndarray, freeze_qtys: np.ndarray):
+        order = np.argsort(tokens, kind='stable')
+        self.tokens = tokens[order]
+        self.lot_sizes = np.maximum(lot_sizes[order], 1)
+        self.tick_sizes = tick_sizes[order]
+        self.freeze_qtys = freeze_qtys[order]
+
+    def __len__(self):
+        return len(self.tokens)
+
+    @classmethod
+    def from_token_infos(cls, infos: Iterable[Dict],
+                         freeze_limits: Optional[Dict[str, int]] = None) -> 'ContractSpecs':
+        """
+        Build from token info dicts (TokenMapper.tokens_data['tokens'] values)
+
+        Args:
+            infos: Token info dicts with 'token', 'lotsize', 'tick_size'
+            freeze_limits: Freeze quantity per underlying (0 = no limit)
+        """
+        infos = [i for i in infos if _token_key(i.get('token')) >= 0]
+        freeze_limits = freeze_limits if freeze_limits is not None else FREEZE_QUANTITIES
+        count = len(infos)
+
+        specs = cls(
+            tokens=np.fromiter((_token_key(i['token']) for i in infos), dtype=np.int64, count=count),
+            lot_sizes=np.fromiter((i.get('lotsize') or 1 for i in infos), dtype=np.int32, count=count),
+            tick_sizes=np.fromiter((i.get('tick_size') or 0 for i in infos), dtype=np.float64, count=count),
+            freeze_qtys=np.fromiter(
+                (freeze_limits.get(_freeze_key(i), 0) for i in infos),
+                dtype=np.int32, count=count
+            )
+        )
+
+        logger.info(f"📏 Contract specs built for {count} tokens")
+
+        return specs
+
+    @classmethod
+    def from_records(cls, records: np.ndarray,
+                     freeze_limits: Optional[Dict[str, int]] = None) -> 'ContractSpecs':
+        """
+        Build from shared token map records
+
+        Args:
+            records: SharedTokenMap.records
+            freeze_limits: Freeze quantity per underlying (0 = no limit)
+        """
+        freeze_limits = freeze_limits if freeze_limits is not None else FREEZE_QUANTITIES
+
+        tokens = np.array([_token_key(t) for t in records['token']], dtype=np.int64)
+
+        # Futures carry no underlying field - fall back to the name column
+        derivative = np.char.startswith(records['instrument'], b'FUT') | \
+            np.char.startswith(records['instrument'], b'OPT')
+        underlyings = np.where(records['underlying'] != b'', records['underlying'],
+                               np.char.upper(records['name']))
+        freeze = np.zeros(len(records), dtype=np.int32)
+        for underlying, qty in freeze_limits.items():
+            freeze[derivative & (underlyings == underlying.encode())] = qty
+
+        # Maps published before tick sizes were stored have no tick column
+        if 'tick_size' in records.dtype.names:
+            ticks = np.asarray(records['tick_size'], dtype=np.float64)
+        else:
+            ticks = np.zeros(len(records), dtype=np.float64)
+
+        valid = tokens >= 0
+        specs = cls(
+            tokens=tokens[valid],
+            lot_sizes=np.asarray(records['lotsize'], dtype=np.int32)[valid],
+            tick_sizes=ticks[valid],
+            freeze_qtys=freeze[valid]
+        )
+
+        logger.info(f"📏 Contract specs built for {len(specs)} tokens")
+
+        return specs
+
+    def rows(self, tokens) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row indexes for a batch of tokens
+
+        Args:
+            tokens: Iterable of token strings / ints
+
+        Returns:
+            (rows, found) - rows is only meaningful where found is True
+        """
+        keys = np.fromiter((_token_key(t) for t in tokens), dtype=np.int64)
+        if len(self.tokens) == 0:
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+
+        rows = np.clip(np.searchsorted(self.tokens, keys), 0, len(self.tokens) - 1)
+        return rows, self.tokens[rows] == keys
+
+    def lookup(self, tokens) -> Dict[str, np.ndarray]:
+        """
+        Lot size, tick size and freeze quantity for a batch of tokens
+
+        Unknown tokens get lot 1, tick 0 (no rounding) and no freeze limit.
+        """
+        rows, found = self.rows(tokens)
+        return {
+            'lot_size': np.where(found, self.lot_sizes[rows], 1),
+            'tick_size': np.where(found, self.tick_sizes[rows], 0.0),
+            'freeze_qty': np.where(found, self.freeze_qtys[rows], 0),
+            'found': found
+        }
+
+    @staticmethod
+    def _round_to_lots(lots: np.ndarray, quantities, mode: str) -> np.ndarray:
+        qty = np.asarray(quantities, dtype=np.float64) / lots
+
+        if mode == 'up':
+            qty = np.ceil(qty)
+        elif mode == 'nearest':
+            qty = np.round(qty)
+        else:
+            qty = np.floor(qty)
+
+        return (qty * lots).astype(np.int64)
+
+    @staticmethod
+    def _round_to_ticks(ticks: np.ndarray, prices, mode) -> np.ndarray:
+        prices = np.asarray(prices, dtype=np.float64)
+        safe_ticks = np.where(ticks > 0, ticks, 1.0)
+
+        # Small epsilon so prices already on a tick survive float error
+        steps = prices / safe_ticks
+        if isinstance(mode, str):
+            if mode == 'down':
+                steps = np.floor(steps + 1e-9)
+            elif mode == 'up':
+                steps = np.ceil(steps - 1e-9)
+            else:
+                steps = np.round(steps)
+        else:
+            # Boolean array: True rounds down, False rounds up
+            steps = np.where(mode, np.floor(steps + 1e-9), np.ceil(steps - 1e-9))
+
+        return np.where(ticks > 0, np.round(steps * safe_ticks, 2), prices)
+
+    def round_quantities(self, tokens, quantities, mode: str = 'down') -> np.ndarray:
+        """
+        Round quantities (units) to whole lots
+
+        Args:
+            tokens: Tokens of the orders
+            quantities: Quantities in units
+            mode: 'down' (never exceed the requested size), 'up' or 'nearest'
+
+        Returns:
+            int64 array of quantities in units
+        """
+        return self._round_to_lots(self.lookup(tokens)['lot_size'], quantities, mode)
+
+    def round_prices(self, tokens, prices, mode: str = 'nearest') -> np.ndarray:
+        """
+        Round prices to the tick size
+
+        Args:
+            tokens: Tokens of the orders
+            prices: Prices in rupees
+            mode: 'nearest', 'down' (passive BUY) or 'up' (passive SELL)
+
+        Returns:
+            float64 array of prices (unchanged where the tick is unknown)
+        """
+        return self._round_to_ticks(self.lookup(tokens)['tick_size'], prices, mode)
+
+    def freeze_slices(self, tokens, quantities) -> np.ndarray:
+        """
+        Number of child orders needed to stay under the freeze quantity
+
+        Returns:
+            int64 array (1 where there is no freeze limit)
+        """
+        return self._slices(self.lookup(tokens)['freeze_qty'], quantities)
+
+    @staticmethod
+    def _slices(freeze: np.ndarray, quantities) -> np.ndarray:
+        qty = np.asarray(quantities, dtype=np.int64)
+        return np.where(freeze > 0, -(-qty // np.maximum(freeze, 1)), 1).astype(np.int64)
+
+    def normalize_orders(self, tokens, quantities, prices, is_buy) -> Dict[str, np.ndarray]:
+        """
+        Round a batch of orders in one pass (a single token lookup)
+
+        Quantities round down to whole lots; prices round to the tick on
+        the passive side (BUY down, SELL up).
+
+        Args:
+            tokens: Tokens of the orders
+            quantities: Quantities in units
+            prices: Limit prices in rupees
+            is_buy: Boolean array, True for BUY legs
+
+        Returns:
+            Dict with 'quantity', 'price', 'slices' plus the lookup() columns
+        """
+        spec = self.lookup(tokens)
+        quantity = self._round_to_lots(spec['lot_size'], quantities, 'down')
+        spec['quantity'] = quantity
+        spec['price'] = self._round_to_ticks(spec['tick_size'], prices, np.asarray(is_buy, dtype=bool))
+        spec['slices'] = self._slices(spec['freeze_qty'], quantity)
+        return spec
@@ -0,0 +1,242 @@
+"""
+Kill Switch Module
+Emergency flatten: halt new risk, cancel every working order and exit
+every open position concurrently, within a deadline, with a report of
+anything left behind
+"""
+
+import logging
+import os
+import signal
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bridge.basket_order import BasketLeg
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_DEADLINE = 5.0      # seconds for cancels, exits and fills
+
+# Telegram commands that trigger the kill switch
+TELEGRAM_COMMANDS = ('/kill', '/flatten')
+
+
+@dataclass
+class KillReport:
+    """Outcome of one flatten-all"""
+    reason: str
+    source: str = 'manual'
+    started_at: datetime = field(default_factory=datetime.now)
+    elapsed_ms: float = 0.0
+    cancelled: List[str] = field(default_factory=list)              # order ids
+    cancel_failed: Dict[str, str] = field(default_factory=dict)     # order id -> error
+    legs: List[BasketLeg] = field(default_factory=list)             # exit orders per symbol
+    residual: Dict[str, int] = field(default_factory=dict)          # symbol -> net qty still open
+    deadline_hit: bool = False
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def failed_legs(self) -> List[BasketLeg]:
+        return [leg for leg in self.legs if leg.status != 'FILLED']
+
+    @property
+    def success(self) -> bool:
+        return not (self.cancel_failed or self.failed_legs or self.residual or self.errors)
+
+    def summary(self) -> str:
+        """Plain-text report (logs / Telegram)"""
+        lines = [
+            f"{'✅' if self.success else '🚨'} KILL SWITCH ({self.source}): {self.reason}",
+            f"Cancelled {len(self.cancelled)} orders | "
+            f"{len(self.legs) - len(self.failed_legs)}/{len(self.legs)} exits filled | "
+            f"{self.elapsed_ms:.0f} ms"
+        ]
+        for order_id, error in self.cancel_failed.items():
+            lines.append(f"❌ cancel {order_id}: {error}")
+        for leg in self.failed_legs:
+            lines.append(f"❌ {leg.transaction_type} {leg.symbol}: {leg.filled_qty}/{leg.quantity} "
+                         f"filled ({leg.error or leg.status})")
+        for symbol, qty in self.residual.items():
+            lines.append(f"⚠️  {symbol} still open: {qty:+d}")
+        for error in self.errors:
+            lines.append(f"❌ {error}")
+        if self.deadline_hit:
+            lines.append("⏱️  Deadline reached before every exit was confirmed")
+        return "\n".join(lines)
+
+
+class KillSwitch:
+    """
+    Flatten-all for the whole account
+
+    trigger() halts the risk gate, then has the order executor cancel all
+    working orders and send every exit at once (one concurrent batch in
+    LIVE mode), waiting for fills no longer than the deadline. Positions
+    the executor flattened are closed in the PositionManager at their
+    exit prices.
+
+    Triggers:
+        - the risk gate: halt() (manual or on a loss-limit breach)
+        - Telegram: /kill or /flatten from the configured chat
+        - a signal: SIGUSR1 by default (kill -USR1 <pid>)
+    """
+
+    def __init__(self, executor, position_manager=None, risk_gate=None, notifier=None,
+                 deadline: float = None):
+        """
+        Initialize kill switch
+
+        Args:
+            executor: OrderExecutor that owns orders and exits
+            position_manager: Optional PositionManager to close locally
+            risk_gate: Optional RiskGate - halted on trigger, and its halts trigger us
+            notifier: Optional TelegramNotifier for the report and /kill commands
+            deadline: Seconds allowed for the whole flatten (default KILL_DEADLINE or 5)
+        """
+        self.executor = executor
+        self.position_manager = position_manager
+        self.risk_gate = risk_gate
+        self.notifier = notifier
+        self.deadline = deadline if deadline is not None else float(os.getenv('KILL_DEADLINE', DEFAULT_DEADLINE))
+
+        self.reports: List[KillReport] = []
+        self._lock = threading.Lock()
+        self._running = False
+
+        if risk_gate is not None:
+            risk_gate.on_halt(self._on_gate_halt)
+
+    # ------------------------------------------------------------------
+    # Triggers
+
+    def trigger(self, reason: str = 'Manual kill switch', source: str = 'manual') -> Optional[KillReport]:
+        """
+        Flatten everything now (blocks up to the deadline)
+
+        Returns:
+            KillReport, or None if a flatten is already running
+        """
+        with self._lock:
+            if self._running:
+                logger.warning(f"⚠️  Kill switch already running - ignoring {source} trigger")
+                return None
+            self._running = True
+
+        try:
+            logger.critical(f"🚨 KILL SWITCH TRIGGERED ({source}): {reason}")
+            if self.risk_gate is not None:
+                self.risk_gate.halt(reason)   # our own halt callback sees _running and returns
+
+            report = self.executor.flatten_all(reason, source=source, deadline=self.deadline)
+            self._close_local(report)
+
+            self.reports.append(report)
+            if report.success:
+                logger.info(report.summary())
+            else:
+                logger.error(report.summary())
+            if self.notifier is not None:
+                self.notifier.send_message(report.summary(), parse_mode=None)
+            return report
+
+        finally:
+            with self._lock:
+                self._running = False
+
+    def trigger_async(self, reason: str, source: str) -> threading.Thread:
+        """Run trigger() on its own thread (for callbacks that must not block)"""
+        thread = threading.Thread(target=self.trigger, args=(reason, source),
+                                  name='kill-switch', daemon=True)
+        thread.start()
+        return thread
+
+    def _on_gate_halt(self, reason: str):
+        if self._running:
+            return
+        # Halts can come from a fill callback - flatten off that thread
+        self.trigger_async(reason, 'risk_gate')
+
+    def install_signal_handlers(self, signals=None):
+        """
+        Flatten on the given signals (main thread only)
+
+        Args:
+            signals: Signal numbers (default SIGUSR1)
+
+        Returns:
+            True if installed
+        """
+        def handler(signum, frame):
+            self.trigger_async(f"Signal {signal.Signals(signum).name}", 'signal')
+
+        try:
+            signals = signals or (signal.SIGUSR1,)
+            for signum in signals:
+                signal.signal(signum, handler)
+        except (ValueError, AttributeError) as e:
+            # Not the main thread, or a signal this platform lacks
+            logger.error(f"❌ Kill switch signal handler not installed: {e}")
+            return False
+
+        logger.info(f"✅ Kill switch armed on {', '.join(signal.Signals(s).name for s in signals)}")
+        return True
+
+    def start_telegram_commands(self) -> bool:
+        """Flatten on /kill or /flatten from the notifier's chat"""
+        if self.notifier is None:
+            return False
+
+        def handle(command: str, args: str) -> str:
+            reason = args or f"Telegram {command}"
+            report = self.trigger(reason, 'telegram')
+            # The report itself goes out through the notifier
+            return None if report else "⚠️ Kill switch already running"
+
+        return self.notifier.start_command_listener({command: handle for command in TELEGRAM_COMMANDS})
+
+    # ------------------------------------------------------------------
+    # Local books
+
+    def _close_local(self, report: KillReport):
+        """Close PositionManager entries the exits flattened and fills did not already close"""
+        manager = self.position_manager
+        if manager is None:
+            return
+
+        for leg in report.legs:
+            if leg.status == 'FILLED':
+                manager.close_position(leg.symbol, leg.avg_price, 'KILL_SWITCH', filled=True)
+
+
+# ==============================================================================
+# TEST FUNCTION
+# ==============================================================================
+
+if __name__ == "__main__":
+    from bridge.order_executor import OrderExecutor
+    from bridge.paper_engine import PaperMatchingEngine
+    from bridge.risk_gate import RiskGate
+
+    print("\n" + "="*60)
+    print("🧪 KILL SWITCH TEST (paper)")
+    print("="*60 + "\n")
+
+    engine = PaperMatchingEngine()
+    gate = RiskGate(max_daily_loss=5000, halt_on_breach=True)
+    executor = OrderExecutor(mode='PAPER', risk_gate=gate, paper_engine=engine)
+    kill_switch = KillSwitch(executor, risk_gate=gate, deadline=2.0)
+
+    for symbol, price in (('NIFTY24DEC24000CE', 120.0), ('NIFTY24DEC24000PE', 95.0)):
+        engine.on_tick(symbol, price)
+    executor.place_order('NIFTY24DEC24000CE', 'NFO', 'BUY', 75, 'MARKET')
+    executor.place_order('NIFTY24DEC24000PE', 'NFO', 'SELL', 150, 'MARKET')
+    executor.place_order('NIFTY24DEC24000CE', 'NFO', 'BUY', 75, 'LIMIT', price=100.0)
+    engine.on_tick('NIFTY24DEC24000CE', 118.0)
+
+    report = kill_switch.trigger('Demo flatten')
+    print(f"\n{report.summary()}")
+    print(f"\n📊 Positions: { {s: p.quantity for s, p in executor.get_positions().items()} }")
+    print(f"🛑 Gate: {gate.check('NIFTY24DEC24000CE', 'BUY', 75, 120.0)}")
@@ -122,10 +122,15 @@ class MarketFeedListener:
         self.websocket = None
         self.candle_builder = CandleBuilder(timeframe_seconds=60)  # 1-minute candles
         self.subscribed_tokens = []
+        self.tick_listeners = []  # Called with every raw tick (e.g. paper matching)
         self.is_connected = False
         
         logger.info("✅ Market Feed Listener initialized")
     
+    def add_tick_listener(self, callback):
+        """Register callback(tick) to run on every tick, before candle building"""
+        self.tick_listeners.append(callback)
+    
     def connect(self):
         """Connect to Angel One market feed"""
         try:
@@ -157,8 +162,11 @@ class MarketFeedListener:
             # Logger tick data for debugging
             logger.debug(f"📊 Raw tick: {tick}")
             
-            # Build candle from tick
             if tick:
+                for listener in self.tick_listeners:
+                    listener(tick)
+                
+                # Build candle from tick
                 candle = self.candle_builder.process_tick(tick)
             
         except Exception as e:
@@ -0,0 +1,140 @@
+"""
+Master Contract Diff Module
+Diffs a fresh Angel One scrip master against the stored token index
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Token info fields that identify a contract revision
+DIFF_FIELDS = ('symbol', 'name', 'exchange', 'instrument', 'expiry', 'strike', 'lotsize', 'tick_size')
+
+
+def contract_fields(row: Dict) -> Dict:
+    """
+    Normalize a raw master row to the fields stored in the token index
+
+    Args:
+        row: Raw contract dict from the scrip master
+
+    Returns:
+        Dict keyed like the token index entries
+    """
+    try:
+        strike = float(row.get('strike', 0) or 0) / 100  # Angel gives in paisa
+    except (TypeError, ValueError):
+        strike = 0.0
+
+    try:
+        lotsize = int(float(row.get('lotsize', 0) or 0))
+    except (TypeError, ValueError):
+        lotsize = 0
+
+    try:
+        tick_size = float(row.get('tick_size', 0) or 0) / 100  # paisa, like strike
+    except (TypeError, ValueError):
+        tick_size = 0.0
+
+    return {
+        'symbol': str(row.get('symbol', '')),
+        'name': str(row.get('name', '')),
+        'exchange': str(row.get('exch_seg', '')),
+        'instrument': str(row.get('instrumenttype', '')),
+        'expiry': str(row.get('expiry', '') or ''),
+        'strike': strike,
+        'lotsize': lotsize,
+        'tick_size': tick_size
+    }
+
+
+@dataclass
+class MasterDiff:
+    """Contracts added, removed and changed between two master snapshots"""
+    added: List[Dict] = field(default_factory=list)            # raw rows
+    removed: List[str] = field(default_factory=list)           # tokens
+    changed: List[Tuple[Dict, Dict]] = field(default_factory=list)  # (raw row, {field: [old, new]})
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} added, -{len(self.removed)} removed, ~{len(self.changed)} changed"
+
+
+def diff_master(indexed_tokens: Dict[str, Dict], contracts: List[Dict]) -> MasterDiff:
+    """
+    Diff a fresh master against the stored token index
+
+    Args:
+        indexed_tokens: TokenMapper.tokens_data['tokens'] (token -> info)
+        contracts: Raw contract rows from the downloaded master
+
+    Returns:
+        MasterDiff
+    """
+    diff = MasterDiff()
+    seen = set()
+
+    for row in contracts:
+        token = str(row.get('token', ''))
+        if not token or not row.get('symbol'):
+            continue
+        seen.add(token)
+
+        current = indexed_tokens.get(token)
+        if current is None:
+            diff.added.append(row)
+            continue
+
+        fresh = contract_fields(row)
+        changes = {
+            name: [current.get(name), fresh[name]]
+            for name in DIFF_FIELDS
+            if current.get(name) != fresh[name]
+        }
+        if changes:
+            diff.changed.append((row, changes))
+
+    diff.removed = [token for token in indexed_tokens if token not in seen]
+
+    return diff
+
+
+def append_changelog(changelog_file: Path, diff: MasterDiff, indexed_tokens: Dict[str, Dict]):
+    """
+    Append one audit record for a master refresh (JSON lines)
+
+    Args:
+        changelog_file: Path of the changelog file
+        diff: Diff that was applied
+        indexed_tokens: Token index before the diff was applied
+    """
+    record = {
+        'time': datetime.now().isoformat(),
+        'added': [
+            {'token': str(row.get('token')), 'symbol': row.get('symbol')}
+            for row in diff.added
+        ],
+        'removed': [
+            {'token': token, 'symbol': indexed_tokens.get(token, {}).get('symbol')}
+            for token in diff.removed
+        ],
+        'changed': [
+            {'token': str(row.get('token')), 'symbol': row.get('symbol'), 'changes': changes}
+            for row, changes in diff.changed
+        ]
+    }
+
+    try:
+        with open(changelog_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    except Exception as e:
+        logger.error(f"❌ Failed to write master changelog: {e}")
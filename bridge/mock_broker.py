@@ -0,0 +1,288 @@
+"""
+Mock Broker Server Module
+Local aiohttp server speaking the SmartAPI order / portfolio / historical
+REST routes, used as the backend for tests and paper dry-runs
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from bridge.async_broker import ROUTES
+
+logger = logging.getLogger(__name__)
+
+
+def _ok(data) -> Dict:
+    return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': data}
+
+
+def _fail(message: str, errorcode: str = 'AB1000') -> Dict:
+    return {'status': False, 'message': message, 'errorcode': errorcode, 'data': None}
+
+
+class MockBrokerServer:
+    """
+    In-process fake of the Angel One REST API
+
+    MARKET orders fill immediately at the symbol's price; LIMIT orders stay
+    open until set_price() crosses them. Latency, rejections and the
+    request log are configurable / inspectable from the test.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        """
+        Initialize server
+
+        Args:
+            host: Bind address
+            port: Port (0 picks a free one)
+            latency: Seconds each request takes
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+
+        self.orders: Dict[str, Dict] = {}
+        self.trades: List[Dict] = []
+        self.prices: Dict[str, float] = defaultdict(lambda: 100.0)
+        self.reject_symbols = set()
+        self.requests: List[tuple] = []  # (monotonic time, endpoint)
+
+        self._order_counter = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+
+    def start(self):
+        """Run the server on a background thread"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_site())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+        logger.info(f"🧪 Mock broker listening on {self.url}")
+
+    async def _start_site(self):
+        app = web.Application()
+        for endpoint, (method, route) in ROUTES.items():
+            handler = getattr(self, f"_handle_{endpoint}")
+            app.router.add_route(method, route, self._wrap(endpoint, handler))
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        """Stop the server"""
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def _wrap(self, endpoint: str, handler):
+        async def wrapped(request: web.Request):
+            self.requests.append((time.monotonic(), endpoint))
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            if not request.headers.get('Authorization', '').startswith('Bearer '):
+                return web.json_response(_fail('Invalid Token', 'AG8001'))
+
+            payload = await request.json() if request.can_read_body else {}
+            with self._lock:
+                return web.json_response(handler(payload, request))
+        return wrapped
+
+    # ------------------------------------------------------------------
+    # Test controls
+
+    def set_price(self, symbol: str, price: float):
+        """Move a symbol's price and fill crossed LIMIT orders"""
+        with self._lock:
+            self.prices[symbol] = price
+            for order in self.orders.values():
+                if order['status'] != 'open' or order['tradingsymbol'] != symbol:
+                    continue
+                limit = float(order['price'])
+                if (order['transactiontype'] == 'BUY' and price <= limit) or \
+                        (order['transactiontype'] == 'SELL' and price >= limit):
+                    self._fill(order, limit)
+
+    def request_count(self, endpoint: Optional[str] = None) -> int:
+        return sum(1 for _, name in self.requests if endpoint is None or name == endpoint)
+
+    # ------------------------------------------------------------------
+    # Order book
+
+    def _fill(self, order: Dict, price: float, quantity: Optional[int] = None):
+        quantity = quantity or order['unfilledshares']
+        filled = order['filledshares'] + quantity
+
+        order['averageprice'] = round(
+            (order['averageprice'] * order['filledshares'] + price * quantity) / filled, 2
+        )
+        order['filledshares'] = filled
+        order['unfilledshares'] = order['quantity'] - filled
+        order['status'] = 'complete' if order['unfilledshares'] == 0 else 'open'
+        order['orderstatus'] = order['status']
+        order['updatetime'] = datetime.now().strftime('%d-%b-%Y %H:%M:%S')
+
+        self.trades.append({
+            'orderid': order['orderid'],
+            'tradingsymbol': order['tradingsymbol'],
+            'symboltoken': order['symboltoken'],
+            'exchange': order['exchange'],
+            'producttype': order['producttype'],
+            'transactiontype': order['transactiontype'],
+            'fillprice': price,
+            'fillsize': quantity,
+            'fillid': str(len(self.trades) + 1),
+            'filltime': order['updatetime']
+        })
+
+    def _handle_place_order(self, payload: Dict, request) -> Dict:
+        required = ('tradingsymbol', 'symboltoken', 'transactiontype', 'exchange', 'ordertype', 'quantity')
+        missing = [name for name in required if not payload.get(name)]
+        if missing:
+            return _fail(f"Missing fields: {', '.join(missing)}", 'AB4008')
+
+        self._order_counter += 1
+        order_id = f"MOCK{self._order_counter:08d}"
+        symbol = payload['tradingsymbol']
+
+        order = {
+            'orderid': order_id,
+            'uniqueorderid': str(uuid.uuid4()),
+            'variety': payload.get('variety', 'NORMAL'),
+            'tradingsymbol': symbol,
+            'symboltoken': payload['symboltoken'],
+            'transactiontype': payload['transactiontype'],
+            'exchange': payload['exchange'],
+            'ordertype': payload['ordertype'],
+            'producttype': payload.get('producttype', 'INTRADAY'),
+            'price': float(payload.get('price') or 0),
+            'quantity': int(payload['quantity']),
+            'filledshares': 0,
+            'unfilledshares': int(payload['quantity']),
+            'averageprice': 0.0,
+            'ordertag': payload.get('ordertag', ''),
+            'status': 'open',
+            'orderstatus': 'open',
+            'text': '',
+            'updatetime': datetime.now().strftime('%d-%b-%Y %H:%M:%S')
+        }
+        self.orders[order_id] = order
+
+        if symbol in self.reject_symbols:
+            order['status'] = order['orderstatus'] = 'rejected'
+            order['text'] = 'Rejected by mock broker'
+        elif payload['ordertype'] == 'MARKET':
+            self._fill(order, self.prices[symbol])
+
+        return _ok({'script': symbol, 'orderid': order_id, 'uniqueorderid': order['uniqueorderid']})
+
+    def _handle_modify_order(self, payload: Dict, request) -> Dict:
+        order = self.orders.get(payload.get('orderid'))
+        if not order or order['status'] != 'open':
+            return _fail('Order not open', 'AB4009')
+
+        if payload.get('price') is not None:
+            order['price'] = float(payload['price'])
+        if payload.get('quantity'):
+            order['quantity'] = int(payload['quantity'])
+            order['unfilledshares'] = order['quantity'] - order['filledshares']
+        return _ok({'orderid': order['orderid']})
+
+    def _handle_cancel_order(self, payload: Dict, request) -> Dict:
+        order = self.orders.get(payload.get('orderid'))
+        if not order or order['status'] != 'open':
+            return _fail('Order not open', 'AB4009')
+
+        order['status'] = order['orderstatus'] = 'cancelled'
+        return _ok({'orderid': order['orderid']})
+
+    def _handle_order_book(self, payload: Dict, request) -> Dict:
+        return _ok([dict(order) for order in self.orders.values()])
+
+    def _handle_trade_book(self, payload: Dict, request) -> Dict:
+        return _ok(list(self.trades))
+
+    def _handle_order_details(self, payload: Dict, request) -> Dict:
+        unique_order_id = request.match_info.get('unique_order_id')
+        order = next((o for o in self.orders.values() if o['uniqueorderid'] == unique_order_id), None)
+        return _ok(dict(order)) if order else _fail('Order not found', 'AB4010')
+
+    def _handle_ltp(self, payload: Dict, request) -> Dict:
+        symbol = payload.get('tradingsymbol', '')
+        return _ok({'tradingsymbol': symbol, 'symboltoken': payload.get('symboltoken'),
+                    'ltp': self.prices[symbol]})
+
+    def _handle_position(self, payload: Dict, request) -> Dict:
+        positions = {}
+        for trade in self.trades:
+            pos = positions.setdefault(trade['tradingsymbol'], {
+                'tradingsymbol': trade['tradingsymbol'],
+                'symboltoken': trade['symboltoken'],
+                'exchange': trade['exchange'],
+                'producttype': trade['producttype'],
+                'buyqty': 0, 'sellqty': 0, 'buyamount': 0.0, 'sellamount': 0.0
+            })
+            side = 'buy' if trade['transactiontype'] == 'BUY' else 'sell'
+            pos[f'{side}qty'] += trade['fillsize']
+            pos[f'{side}amount'] += trade['fillsize'] * trade['fillprice']
+
+        result = []
+        for symbol, pos in positions.items():
+            net = pos['buyqty'] - pos['sellqty']
+            ltp = self.prices[symbol]
+            pnl = pos['sellamount'] - pos['buyamount'] + net * ltp
+            avg = pos['buyamount'] / pos['buyqty'] if net > 0 and pos['buyqty'] else \
+                pos['sellamount'] / pos['sellqty'] if net < 0 and pos['sellqty'] else 0.0
+            result.append({
+                **{k: pos[k] for k in ('tradingsymbol', 'symboltoken', 'exchange', 'producttype')},
+                'netqty': str(net),
+                'buyqty': str(pos['buyqty']),
+                'sellqty': str(pos['sellqty']),
+                'avgprice': f"{avg:.2f}",
+                'ltp': f"{ltp:.2f}",
+                'pnl': f"{pnl:.2f}"
+            })
+        return _ok(result)
+
+    def _handle_candle_data(self, payload: Dict, request) -> Dict:
+        start = datetime.strptime(payload.get('fromdate', '2025-01-01 09:15'), '%Y-%m-%d %H:%M')
+        price = 100.0
+        candles = []
+        for i in range(75):
+            ts = start + timedelta(minutes=5 * i)
+            candles.append([ts.strftime('%Y-%m-%dT%H:%M:%S+05:30'), price, price + 1, price - 1, price + 0.5, 1000])
+            price += 0.5
+        return _ok(candles)
@@ -0,0 +1,336 @@
+"""
+Option Chain Index Module
+Sorted NumPy strike arrays per (underlying, expiry, option type) for O(log n)
+ATM, nearest-strike and expiry lookups
+"""
+
+import bisect
+import logging
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Angel One ships expiries as DDMMMYYYY; older caches used DDMMMYY
+EXPIRY_FORMATS = ('%d%b%Y', '%d%b%y')
+
+
+def parse_expiry(expiry_str: str) -> Optional[date]:
+    """
+    Parse an expiry string from the master contract file
+
+    Args:
+        expiry_str: Expiry string (e.g., '27FEB2025' or '27FEB25')
+
+    Returns:
+        date or None if the string cannot be parsed
+    """
+    for fmt in EXPIRY_FORMATS:
+        try:
+            return datetime.strptime(expiry_str.strip(), fmt).date()
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+
+class ChainSlice:
+    """
+    One (underlying, expiry, option type) slice of the chain
+    Strikes are sorted ascending; tokens and symbols are aligned to them
+    """
+
+    __slots__ = ('strikes', 'tokens', 'symbols')
+
+    def __init__(self, strikes: np.ndarray, tokens: np.ndarray, symbols: np.ndarray):
+        self.strikes = strikes
+        self.tokens = tokens
+        self.symbols = symbols
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def token_at(self, idx: int) -> str:
+        """Token at a position in the slice"""
+        token = self.tokens[idx]
+        return token.decode() if isinstance(token, bytes) else str(token)
+
+    def symbol_at(self, idx: int) -> str:
+        """Trading symbol at a position in the slice"""
+        symbol = self.symbols[idx]
+        return symbol.decode() if isinstance(symbol, bytes) else str(symbol)
+
+    def nearest_index(self, price: float) -> int:
+        """
+        Index of the strike closest to price (lower strike wins a tie)
+
+        Args:
+            price: Target strike / spot level
+
+        Returns:
+            Index into the slice
+        """
+        strikes = self.strikes
+        idx = int(np.searchsorted(strikes, price))
+
+        if idx <= 0:
+            return 0
+        if idx >= len(strikes):
+            return len(strikes) - 1
+
+        # Compare neighbours on either side of the insertion point
+        if price - strikes[idx - 1] <= strikes[idx] - price:
+            return idx - 1
+        return idx
+
+    def nearest_indices(self, prices: np.ndarray) -> np.ndarray:
+        """
+        Vectorized nearest_index for a batch of prices
+
+        Args:
+            prices: Array of target levels
+
+        Returns:
+            Array of indices into the slice
+        """
+        strikes = self.strikes
+        prices = np.asarray(prices, dtype=np.float64)
+
+        if len(strikes) == 1:
+            return np.zeros(len(prices), dtype=np.int64)
+
+        hi = np.clip(np.searchsorted(strikes, prices), 1, len(strikes) - 1)
+        lo = hi - 1
+        use_lo = (prices - strikes[lo]) <= (strikes[hi] - prices)
+        return np.where(use_lo, lo, hi)
+
+
+class OptionChainIndex:
+    """
+    Per-(underlying, expiry, option type) strike index with pre-parsed expiries
+
+    Built once from the token mappings; every lookup afterwards is a bisect
+    over a sorted NumPy array instead of a linear scan over dicts
+    """
+
+    def __init__(self):
+        self.slices: Dict[Tuple[str, str, str], ChainSlice] = {}
+
+        # underlying -> expiry strings and their ordinal dates, sorted by date
+        self.expiries: Dict[str, List[str]] = {}
+        self.expiry_ordinals: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_tokens_data(cls, tokens_data: Dict) -> 'OptionChainIndex':
+        """
+        Build the index from TokenMapper.tokens_data
+
+        Args:
+            tokens_data: Dict with 'strikes' and 'expiries' sections
+
+        Returns:
+            OptionChainIndex
+        """
+        index = cls()
+
+        for strike_key, rows in tokens_data.get('strikes', {}).items():
+            try:
+                underlying, expiry, option_type = strike_key.rsplit('_', 2)
+            except ValueError:
+                continue
+            index.set_slice(underlying, expiry, option_type, rows)
+
+        for underlying, expiries in tokens_data.get('expiries', {}).items():
+            index.set_expiries(underlying, expiries)
+
+        logger.info(
+            f"📐 Option chain index built: {len(index.slices)} slices, "
+            f"{len(index.expiries)} underlyings"
+        )
+
+        return index
+
+    def set_slice(self, underlying: str, expiry: str, option_type: str, rows: List[Dict]):
+        """
+        Replace one chain slice
+
+        Args:
+            underlying: Base symbol (NIFTY, BANKNIFTY, etc.)
+            expiry: Expiry string as stored in the master
+            option_type: 'CE' or 'PE'
+            rows: List of {'strike', 'token', 'symbol'} dicts
+        """
+        key = (underlying, expiry, option_type)
+
+        if not rows:
+            self.slices.pop(key, None)
+            return
+
+        strikes = np.fromiter((r['strike'] for r in rows), dtype=np.float64, count=len(rows))
+        order = np.argsort(strikes, kind='stable')
+
+        self.slices[key] = ChainSlice(
+            strikes=strikes[order],
+            tokens=np.array([rows[i]['token'] for i in order]),
+            symbols=np.array([rows[i]['symbol'] for i in order])
+        )
+
+    def set_expiries(self, underlying: str, expiries: List[str]):
+        """
+        Replace the expiry list of an underlying (parsed and sorted by date)
+
+        Args:
+            underlying: Base symbol
+            expiries: Expiry strings in any order
+        """
+        parsed = []
+        for expiry_str in expiries:
+            expiry_date = parse_expiry(expiry_str)
+            if expiry_date is not None:
+                parsed.append((expiry_date.toordinal(), expiry_str))
+
+        if not parsed:
+            self.expiries.pop(underlying, None)
+            self.expiry_ordinals.pop(underlying, None)
+            return
+
+        parsed.sort()
+        self.expiry_ordinals[underlying] = [p[0] for p in parsed]
+        self.expiries[underlying] = [p[1] for p in parsed]
+
+    def get_slice(self, underlying: str, expiry: str, option_type: str) -> Optional[ChainSlice]:
+        """Get a chain slice or None"""
+        return self.slices.get((underlying, expiry, option_type))
+
+    def current_expiry(self, underlying: str, today: Optional[date] = None) -> Optional[str]:
+        """
+        Nearest expiry strictly after today
+
+        Args:
+            underlying: Base symbol
+            today: Reference date (defaults to today)
+
+        Returns:
+            Expiry string, or the earliest expiry if none are in the future
+        """
+        ordinals = self.expiry_ordinals.get(underlying)
+        if not ordinals:
+            return None
+
+        today = today or datetime.now().date()
+        idx = bisect.bisect_right(ordinals, today.toordinal())
+
+        expiries = self.expiries[underlying]
+        return expiries[idx] if idx < len(expiries) else expiries[0]
+
+    def upcoming_expiries(self, underlying: str, count: int = 4,
+                          today: Optional[date] = None) -> List[str]:
+        """
+        Next N expiries strictly after today
+
+        Args:
+            underlying: Base symbol
+            count: Number of expiries to return
+            today: Reference date (defaults to today)
+        """
+        ordinals = self.expiry_ordinals.get(underlying)
+        if not ordinals:
+            return []
+
+        today = today or datetime.now().date()
+        idx = bisect.bisect_right(ordinals, today.toordinal())
+        return self.expiries[underlying][idx:idx + count]
+
+    def nearest(self, underlying: str, expiry: str, option_type: str,
+                price: float) -> Optional[Tuple[float, str, str]]:
+        """
+        Strike closest to price
+
+        Returns:
+            (strike, token, symbol) or None if the slice is empty
+        """
+        chain = self.get_slice(underlying, expiry, option_type)
+        if not chain:
+            return None
+
+        idx = chain.nearest_index(price)
+        return float(chain.strikes[idx]), chain.token_at(idx), chain.symbol_at(idx)
+
+    def middle(self, underlying: str, expiry: str,
+               option_type: str) -> Optional[Tuple[float, str, str]]:
+        """Middle strike of a slice (used when no spot price is known)"""
+        chain = self.get_slice(underlying, expiry, option_type)
+        if not chain:
+            return None
+
+        idx = len(chain) // 2
+        return float(chain.strikes[idx]), chain.token_at(idx), chain.symbol_at(idx)
+
+    def strikes_around(self, underlying: str, expiry: str, option_type: str,
+                       price: float, n: int = 5) -> List[Tuple[float, str, str]]:
+        """
+        N strikes on either side of the strike closest to price
+
+        Args:
+            underlying: Base symbol
+            expiry: Expiry string
+            option_type: 'CE' or 'PE'
+            price: ATM level
+            n: Strikes on each side
+
+        Returns:
+            List of (strike, token, symbol) sorted by strike
+        """
+        chain = self.get_slice(underlying, expiry, option_type)
+        if not chain:
+            return []
+
+        idx = chain.nearest_index(price)
+        lo = max(idx - n, 0)
+        hi = min(idx + n + 1, len(chain))
+
+        return [
+            (float(chain.strikes[i]), chain.token_at(i), chain.symbol_at(i))
+            for i in range(lo, hi)
+        ]
+
+    def chain_window(self, underlying: str, expiry: str, price: float,
+                     n: int = 5) -> Dict[str, np.ndarray]:
+        """
+        Whole-chain selection around ATM as aligned arrays (CE and PE)
+
+        Returns:
+            Dict with 'strikes', 'ce_tokens', 'pe_tokens' arrays; a side
+            missing a strike holds an empty token
+        """
+        ce = self.get_slice(underlying, expiry, 'CE')
+        pe = self.get_slice(underlying, expiry, 'PE')
+        reference = ce if ce else pe
+        if not reference:
+            return {'strikes': np.array([]), 'ce_tokens': np.array([]), 'pe_tokens': np.array([])}
+
+        idx = reference.nearest_index(price)
+        lo = max(idx - n, 0)
+        hi = min(idx + n + 1, len(reference))
+        strikes = np.array(reference.strikes[lo:hi])
+
+        return {
+            'strikes': strikes,
+            'ce_tokens': self._tokens_for(ce, strikes),
+            'pe_tokens': self._tokens_for(pe, strikes)
+        }
+
+    @staticmethod
+    def _tokens_for(chain: Optional[ChainSlice], strikes: np.ndarray) -> np.ndarray:
+        """Tokens of a slice at the given strikes ('' where a strike is missing)"""
+        result = np.full(len(strikes), '', dtype=object)
+        if not chain or len(strikes) == 0:
+            return result
+
+        idx = np.clip(np.searchsorted(chain.strikes, strikes), 0, len(chain) - 1)
+        found = chain.strikes[idx] == strikes
+        for out_pos in np.nonzero(found)[0]:
+            result[out_pos] = chain.token_at(int(idx[out_pos]))
+        return result
@@ -5,9 +5,21 @@ Handles order placement, modification, cancellation (Paper + Live Mode)
 
 import os
 import json
+import time
+import asyncio
 import logging
-from datetime import datetime
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from bridge.async_broker import AsyncBrokerClient, BackgroundLoop
 from bridge.auth_manager import AngelAuthManager
+from bridge.basket_order import BasketExecutor, BasketLeg, BasketResult, ORDER_TYPES, ON_FAILURE, TERMINAL_STATUSES
+from bridge.kill_switch import KillReport
+from bridge.order_state import OrderStateMachine, OrderUpdateStream, OrderPoller
+from bridge.paper_engine import PaperMatchingEngine
+from bridge.records import OrderRecord, FillRecord, NetPosition
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,26 +31,66 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Client order ids remembered for dedupe (most recent first to go)
+CLIENT_ID_TAIL = int(os.getenv('CLIENT_ID_TAIL', 5000))
+
+# Broker order statuses that end an order, as OrderRecord statuses; any
+# other broker status (open, trigger pending, ...) is a working PLACED order
+LOCAL_STATUS = {'complete': 'COMPLETE', 'cancelled': 'CANCELLED', 'rejected': 'REJECTED'}
+
+
 class OrderExecutor:
     """Professional order execution engine with paper + live trading"""
     
-    def __init__(self, mode='PAPER'):
+    def __init__(self, mode='PAPER', token_mapper=None, broker_client=None, journal=None,
+                 risk_gate=None, paper_engine=None):
         """
         Initialize order executor
         
         Args:
             mode: 'PAPER' or 'LIVE'
+            token_mapper: Optional TokenMapper for tokens, lot and tick sizes
+            broker_client: Optional AsyncBrokerClient for concurrent orders
+                           (default: built from the trading session)
+            journal: Optional Journal for crash recovery
+            risk_gate: Optional RiskGate checked before every order
+            paper_engine: Optional PaperMatchingEngine - PAPER orders then rest
+                          and fill against ticks instead of instantly
         """
         self.mode = mode.upper()
+        self.journal = journal
+        self.risk_gate = risk_gate
+        self.token_mapper = token_mapper
+        self.broker_client = broker_client
+        self._broker_loop = None
+        
+        # Order lifecycle (fed by the order update stream / poller)
+        self.order_states = OrderStateMachine()
+        self.order_stream = None
+        self.order_poller = None
+        if risk_gate is not None:
+            self.order_states.on_fill(risk_gate.on_fill)
+        
+        self.paper_engine = paper_engine if self.mode == 'PAPER' else None
+        if self.paper_engine is not None:
+            self.paper_engine.on_update = self._on_paper_fill
+        
         self.auth = AngelAuthManager()
         self.smart_api = None
         self.client_code = os.getenv('CLIENT_ID')
         
         # Order tracking
-        self.orders = {}  # {order_id: order_details}
-        self.positions = {}  # {symbol: position_details}
+        self.orders: Dict[str, OrderRecord] = {}
+        self.positions: Dict[str, NetPosition] = {}
         self.paper_order_counter = 1000
         
+        # Idempotent submission: client order id -> order id (bounded tail),
+        # ids being submitted, and ids whose submission outcome is unknown
+        self.client_orders = OrderedDict()
+        self._client_lock = threading.Lock()
+        self._in_flight = set()
+        self._unconfirmed = set()
+        
         # Risk settings
         self.risk_per_trade = float(os.getenv('RISK_PER_TRADE', 0.5))
         self.max_positions = int(os.getenv('MAX_POSITIONS', 2))
@@ -53,6 +105,9 @@ class OrderExecutor:
     def connect(self):
         """Connect to trading API"""
         try:
+            # Restore journaled orders before touching the broker
+            self.recover()
+            
             if self.mode == 'PAPER':
                 logger.info("📄 Paper mode - No API connection needed")
                 return True
@@ -71,7 +126,8 @@ class OrderExecutor:
             logger.error(f"❌ Connection error: {e}")
             return False
     
-    def calculate_position_size(self, capital, risk_percent, entry_price, stop_loss_price):
+    def calculate_position_size(self, capital, risk_percent, entry_price, stop_loss_price,
+                                symbol=None):
         """
         Calculate position size based on risk management
         
@@ -80,9 +136,11 @@ class OrderExecutor:
             risk_percent: Risk per trade (0.5 = 0.5%)
             entry_price: Entry price
             stop_loss_price: Stop loss price
+            symbol: Trading symbol - rounds down to whole lots when a
+                    token mapper is set
             
         Returns:
-            quantity: Number of lots/shares to buy
+            quantity: Number of units to buy (a lot multiple for F&O)
         """
         try:
             risk_amount = capital * (risk_percent / 100)
@@ -94,6 +152,10 @@ class OrderExecutor:
             
             quantity = int(risk_amount / price_diff)
             
+            token = self._get_symbol_token(symbol) if symbol and self.token_mapper else None
+            if token:
+                quantity = int(self.token_mapper.contract_specs.round_quantities([token], [quantity])[0])
+            
             logger.info(
                 f"📊 Position Size: {quantity} units | "
                 f"Risk: ₹{risk_amount:.2f} ({risk_percent}%) | "
@@ -107,75 +169,171 @@ class OrderExecutor:
             return 0
     
     def place_order(self, symbol, exchange, transaction_type, quantity, 
-                    order_type='MARKET', price=0, stop_loss=None, target=None):
+                    order_type='MARKET', price=0, stop_loss=None, target=None, strategy=None,
+                    trigger_price=0, client_order_id=None):
         """
         Place order (Paper or Live)
         
+        Submission is idempotent per client_order_id: a retry with an id
+        that already produced an order returns that order instead of
+        placing another. Reuse the id when retrying the same intent.
+        
         Args:
             symbol: Trading symbol (e.g., 'NIFTY23FEB23500CE')
             exchange: 'NSE', 'NFO', 'BSE', etc.
             transaction_type: 'BUY' or 'SELL'
             quantity: Number of lots/shares
-            order_type: 'MARKET', 'LIMIT', 'STOPLOSS_LIMIT'
+            order_type: 'MARKET', 'LIMIT', 'STOPLOSS_LIMIT', 'STOPLOSS_MARKET'
             price: Limit price (for LIMIT orders)
             stop_loss: Stop loss price
             target: Target price
+            strategy: Strategy placing the order (for per-strategy risk limits)
+            trigger_price: Trigger price (for STOPLOSS_* orders)
+            client_order_id: Caller's id for this order (default: a new one)
             
         Returns:
             order_id: Order ID if successful, None otherwise
         """
+        client_order_id = client_order_id or self.new_client_order_id()
+        
+        with self._client_lock:
+            existing = self.client_orders.get(client_order_id)
+            if existing is not None:
+                logger.warning(f"♻️  Duplicate client order id {client_order_id} - returning order {existing}")
+                return existing
+            if client_order_id in self._in_flight:
+                logger.warning(f"⚠️  Client order id {client_order_id} already being submitted")
+                return None
+            self._in_flight.add(client_order_id)
+        
+        try:
+            order_id = self._place_order(symbol, exchange, transaction_type, quantity, order_type,
+                                         price, stop_loss, target, strategy, trigger_price,
+                                         client_order_id)
+            if order_id:
+                self._remember_client_order(client_order_id, order_id)
+            return order_id
+        finally:
+            with self._client_lock:
+                self._in_flight.discard(client_order_id)
+    
+    @staticmethod
+    def new_client_order_id():
+        """Fresh client order id (fits Angel One's 20-character ordertag)"""
+        return uuid.uuid4().hex[:20]
+    
+    def _remember_client_order(self, client_order_id, order_id):
+        with self._client_lock:
+            self.client_orders[client_order_id] = order_id
+            self.client_orders.move_to_end(client_order_id)
+            while len(self.client_orders) > CLIENT_ID_TAIL:
+                self.client_orders.popitem(last=False)
+            self._unconfirmed.discard(client_order_id)
+    
+    def _reference_price(self, symbol, price):
+        """Price to value an order at: its own, else the paper engine's last tick (the gate falls back to its own)"""
+        if price:
+            return price
+        if self.paper_engine is not None:
+            return self.paper_engine.last_price(symbol) or 0.0
+        return 0.0
+    
+    def _place_order(self, symbol, exchange, transaction_type, quantity, order_type, price,
+                     stop_loss, target, strategy, trigger_price, client_order_id):
+        """Validate and route one order (place_order without the dedupe)"""
         try:
             # Validation
-            if len(self.positions) >= self.max_positions:
+            if self.risk_gate is not None:
+                allowed, reason = self.risk_gate.check(symbol, transaction_type, quantity,
+                                                       self._reference_price(symbol, price), strategy)
+                if not allowed:
+                    logger.warning(f"🛑 Order rejected by risk gate - {reason}")
+                    return None
+            elif len(self.positions) >= self.max_positions:
                 logger.warning(f"⚠️  Max positions ({self.max_positions}) reached!")
                 return None
             
-            order_details = {
-                'symbol': symbol,
-                'exchange': exchange,
-                'transaction_type': transaction_type,
-                'quantity': quantity,
-                'order_type': order_type,
-                'price': price,
-                'stop_loss': stop_loss,
-                'target': target,
-                'timestamp': datetime.now(),
-                'status': 'PENDING'
-            }
+            if self.token_mapper:
+                prepared = self.prepare_orders([{
+                    'symbol': symbol,
+                    'transaction_type': transaction_type,
+                    'quantity': quantity,
+                    'order_type': order_type,
+                    'price': price
+                }])[0]
+                if prepared['quantity'] != quantity:
+                    logger.warning(
+                        f"⚠️  {symbol}: quantity {quantity} rounded to {prepared['quantity']} "
+                        f"(lot size {prepared['lot_size']})"
+                    )
+                if prepared['quantity'] <= 0:
+                    logger.error(f"❌ {symbol}: quantity below one lot")
+                    return None
+                quantity, price = prepared['quantity'], prepared['price']
+            
+            order = OrderRecord(
+                symbol=symbol,
+                exchange=exchange,
+                transaction_type=transaction_type,
+                quantity=quantity,
+                order_type=order_type,
+                price=price,
+                trigger_price=trigger_price,
+                stop_loss=stop_loss,
+                target=target,
+                strategy=strategy,
+                client_order_id=client_order_id
+            )
             
             if self.mode == 'PAPER':
-                return self._place_paper_order(order_details)
+                return self._place_paper_order(order)
             else:
-                return self._place_live_order(order_details)
+                return self._place_live_order(order)
                 
         except Exception as e:
             logger.error(f"❌ Order placement error: {e}")
             return None
     
-    def _place_paper_order(self, order_details):
+    def _place_paper_order(self, order: OrderRecord):
         """Place paper order (simulated)"""
         try:
             order_id = f"PAPER_{self.paper_order_counter}"
             self.paper_order_counter += 1
+            order.order_id = order_id
+            
+            if self.paper_engine is not None:
+                return self._place_matched_order(order_id, order)
             
             # Simulate instant execution for market orders
-            if order_details['order_type'] == 'MARKET':
-                order_details['status'] = 'COMPLETE'
-                order_details['executed_price'] = order_details.get('price', 0)
-                order_details['executed_qty'] = order_details['quantity']
+            if order.order_type == 'MARKET':
+                order.status = 'COMPLETE'
+                order.executed_price = order.price
+                order.executed_qty = order.quantity
             
-            self.orders[order_id] = order_details
+            self.orders[order_id] = order
+            self.order_states.track(order_id, order.symbol, order.transaction_type, order.quantity,
+                                    tag=order.strategy)
             
             logger.info(
                 f"📄 PAPER ORDER PLACED\n"
                 f"   Order ID: {order_id}\n"
-                f"   {order_details['transaction_type']} {order_details['quantity']} x {order_details['symbol']}\n"
-                f"   Type: {order_details['order_type']} @ ₹{order_details['price']}\n"
-                f"   SL: {order_details['stop_loss']} | Target: {order_details['target']}"
+                f"   {order.transaction_type} {order.quantity} x {order.symbol}\n"
+                f"   Type: {order.order_type} @ ₹{order.price}\n"
+                f"   SL: {order.stop_loss} | Target: {order.target}"
             )
             
             # Update positions
-            self._update_position(order_id, order_details)
+            self._update_position(FillRecord(order_id, order.symbol, order.transaction_type,
+                                             order.quantity, order.price))
+            
+            # Paper fills go through the same state machine as broker updates
+            self.order_states.apply_update({
+                'orderid': order_id,
+                'status': 'complete' if order.status == 'COMPLETE' else 'open',
+                'filledshares': order.executed_qty,
+                'averageprice': order.executed_price
+            })
+            self._journal_order(order_id)
             
             return order_id
             
@@ -183,7 +341,67 @@ class OrderExecutor:
             logger.error(f"❌ Paper order error: {e}")
             return None
     
-    def _place_live_order(self, order_details):
+    def _place_matched_order(self, order_id, order: OrderRecord):
+        """Rest a paper order in the matching engine; fills arrive via _on_paper_fill"""
+        order.status = 'OPEN'
+        order.executed_qty = 0
+        self.orders[order_id] = order
+        self.order_states.track(order_id, order.symbol,
+                                order.transaction_type, order.quantity,
+                                tag=order.strategy)
+        self._journal_order(order_id)
+        
+        logger.info(
+            f"📄 PAPER ORDER RESTING\n"
+            f"   Order ID: {order_id}\n"
+            f"   {order.transaction_type} {order.quantity} x {order.symbol}\n"
+            f"   Type: {order.order_type} @ ₹{order.price}"
+        )
+        
+        paper_order = self.paper_engine.submit(
+            order_id,
+            order.symbol,
+            order.transaction_type,
+            order.quantity,
+            order_type=order.order_type,
+            price=order.price,
+            trigger_price=order.trigger_price,
+            tag=order.strategy,
+            token=self._feed_token(order.symbol)
+        )
+        
+        if paper_order.status == 'rejected':
+            order.status = 'REJECTED'
+            self.order_states.apply_update({'orderid': order_id, 'status': 'rejected'})
+            self._journal_order(order_id)
+            return None
+        
+        return order_id
+    
+    def _on_paper_fill(self, record):
+        """Matching engine fill: book the new quantity and feed the state machine"""
+        order_id = record['orderid']
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+        
+        filled, avg_price = record['filledshares'], record['averageprice']
+        previous_qty = order.executed_qty
+        if filled > previous_qty:
+            fill_qty = filled - previous_qty
+            fill_value = avg_price * filled - order.executed_price * previous_qty
+            self._update_position(FillRecord(order_id, order.symbol, order.transaction_type,
+                                             fill_qty, round(fill_value / fill_qty, 2)))
+        
+        order.executed_qty = filled
+        order.executed_price = avg_price
+        if record['status'] == 'complete':
+            order.status = 'COMPLETE'
+        
+        self.order_states.apply_update(record)
+        self._journal_order(order_id)
+    
+    def _place_live_order(self, order: OrderRecord):
         """Place live order via Angel One API"""
         try:
             if not self.smart_api:
@@ -191,88 +409,628 @@ class OrderExecutor:
                 return None
             
             # Angel One order parameters
-            order_params = {
-                "variety": "NORMAL",
-                "tradingsymbol": order_details['symbol'],
-                "symboltoken": self._get_symbol_token(order_details['symbol']),
-                "transactiontype": order_details['transaction_type'],
-                "exchange": order_details['exchange'],
-                "ordertype": order_details['order_type'],
-                "producttype": "INTRADAY",  # or "DELIVERY"
-                "duration": "DAY",
-                "price": str(order_details['price']) if order_details['price'] > 0 else "0",
-                "squareoff": "0",
-                "stoploss": "0",
-                "quantity": str(order_details['quantity'])
-            }
+            order_params = self._order_params(
+                order.symbol,
+                self._get_symbol_token(order.symbol),
+                order.exchange,
+                order.transaction_type,
+                order.quantity,
+                order.order_type,
+                order.price,
+                order.trigger_price
+            )
+            client_order_id = order.client_order_id
+            if client_order_id:
+                order_params['ordertag'] = client_order_id
             
-            # Place order
-            logger.info(f"🔄 Placing LIVE order...")
-            response = self.smart_api.placeOrder(order_params)
+            # An earlier attempt with this id may have reached the broker
+            if client_order_id in self._unconfirmed:
+                order_id = self._find_broker_order(client_order_id)
+                if order_id:
+                    return self._record_live_order(order_id, order, 'ADOPTED')
             
-            if response and response.get('status'):
-                order_id = response['data']['orderid']
-                order_details['status'] = 'PLACED'
-                order_details['order_id'] = order_id
-                self.orders[order_id] = order_details
-                
-                logger.info(
-                    f"✅ LIVE ORDER PLACED\n"
-                    f"   Order ID: {order_id}\n"
-                    f"   {order_details['transaction_type']} {order_details['quantity']} x {order_details['symbol']}\n"
-                    f"   Type: {order_details['order_type']} @ ₹{order_details['price']}"
-                )
-                
-                return order_id
-            else:
-                logger.error(f"❌ Order failed: {response.get('message', 'Unknown error')}")
+            # Place order. placeOrder returns only the order id (None on any
+            # failure), so use the full response to tell a rejection apart
+            logger.info(f"🔄 Placing LIVE order...")
+            try:
+                response = self.smart_api.placeOrderFullResponse(order_params)
+            except Exception as e:
+                # Timeout or dropped connection: the order may still be live
+                logger.error(f"❌ Live order outcome unknown: {e}")
+                if client_order_id:
+                    order_id = self._find_broker_order(client_order_id)
+                    if order_id:
+                        return self._record_live_order(order_id, order, 'ADOPTED')
+                    self._unconfirmed.add(client_order_id)
                 return None
+            
+            if response and response.get('status') and (response.get('data') or {}).get('orderid'):
+                return self._record_live_order(response['data']['orderid'], order, 'PLACED')
+            
+            # The broker answered: a plain rejection
+            order.status = 'REJECTED'
+            logger.error(f"❌ Order rejected: {(response or {}).get('message') or 'Unknown error'}")
+            return None
                 
         except Exception as e:
             logger.error(f"❌ Live order error: {e}")
             return None
     
-    def _update_position(self, order_id, order_details):
-        """Update position tracking"""
+    def _record_live_order(self, order_id, order: OrderRecord, how):
+        """Track an order the broker accepted"""
+        order.status = 'PLACED'
+        order.order_id = order_id
+        self.orders[order_id] = order
+        self.order_states.track(order_id, order.symbol,
+                                order.transaction_type, order.quantity,
+                                tag=order.strategy)
+        self._journal_order(order_id)
+        
+        logger.info(
+            f"✅ LIVE ORDER {how}\n"
+            f"   Order ID: {order_id}\n"
+            f"   {order.transaction_type} {order.quantity} x {order.symbol}\n"
+            f"   Type: {order.order_type} @ ₹{order.price}"
+        )
+        
+        return order_id
+    
+    def _find_broker_order(self, client_order_id):
+        """Order id of the broker order tagged with client_order_id, if any"""
         try:
-            symbol = order_details['symbol']
+            response = self.smart_api.orderBook()
+            for row in (response or {}).get('data') or []:
+                if row.get('ordertag') == client_order_id and row.get('status') != 'rejected':
+                    logger.warning(f"♻️  Found order {row['orderid']} for client order id {client_order_id}")
+                    return row['orderid']
+        except Exception as e:
+            logger.error(f"❌ Order book lookup error: {e}")
+        return None
+    
+    @staticmethod
+    def _order_params(symbol, token, exchange, transaction_type, quantity, order_type, price,
+                      trigger_price=0):
+        """Angel One placeOrder parameters"""
+        params = {
+            "variety": "STOPLOSS" if order_type.startswith('STOPLOSS') else "NORMAL",
+            "tradingsymbol": symbol,
+            "symboltoken": token,
+            "transactiontype": transaction_type,
+            "exchange": exchange,
+            "ordertype": order_type,
+            "producttype": "INTRADAY",  # or "DELIVERY"
+            "duration": "DAY",
+            "price": str(price) if price > 0 else "0",
+            "squareoff": "0",
+            "stoploss": "0",
+            "quantity": str(quantity)
+        }
+        if trigger_price:
+            params["triggerprice"] = str(trigger_price)
+        return params
+    
+    def place_basket(self, legs: List[Dict], on_failure='rollback', fill_timeout=5.0) -> BasketResult:
+        """
+        Place a multi-leg basket (straddle, strangle, spread) in one shot
+        
+        All legs are validated first - one bad leg rejects the whole basket
+        before anything is sent. Live legs are then submitted concurrently
+        and their fills tracked per leg; if any leg fails or stays unfilled
+        the basket is rolled back or hedged.
+        
+        Args:
+            legs: Dicts with 'symbol', 'exchange', 'transaction_type',
+                  'quantity', optional 'order_type', 'price' and 'strategy'
+            on_failure: 'rollback' (flatten filled legs), 'hedge' (complete
+                        missing legs at market) or 'none'
+            fill_timeout: Seconds to wait for fills (LIVE)
             
-            if symbol not in self.positions:
-                self.positions[symbol] = {
-                    'symbol': symbol,
-                    'quantity': 0,
-                    'avg_price': 0,
-                    'pnl': 0,
-                    'orders': []
-                }
+        Returns:
+            BasketResult
+        """
+        basket, errors = self._validate_basket(legs, on_failure)
+        if errors:
+            for error in errors:
+                logger.error(f"❌ Basket rejected: {error}")
+            return BasketResult(status='REJECTED', legs=basket, errors=errors)
+        
+        if self.mode == 'PAPER':
+            result = self._place_paper_basket(basket)
+        else:
+            client = self._get_broker_client()
+            if client is None:
+                return BasketResult(status='REJECTED', legs=basket, errors=['Trading API not connected'])
             
-            position = self.positions[symbol]
+            executor = BasketExecutor(client, self._leg_params, fill_timeout=fill_timeout)
+            result = self._broker_loop.run(executor.execute(basket, on_failure))
+            self._book_basket_fills(result)
+        
+        return result
+    
+    def _book_basket_fills(self, result: BasketResult):
+        """Record basket and rollback orders and apply their fills to positions"""
+        for leg in result.legs + result.unwind_legs:
+            for order_id in leg.order_ids:
+                qty, price = leg.order_fills.get(order_id, (0, 0.0))
+                ordered = leg.order_qty.get(order_id, qty)
+                self.orders[order_id] = OrderRecord(
+                    symbol=leg.symbol,
+                    exchange=leg.exchange,
+                    transaction_type=leg.transaction_type,
+                    quantity=ordered,
+                    order_type=leg.order_type,
+                    price=price,
+                    strategy=leg.strategy,
+                    order_id=order_id,
+                    status=LOCAL_STATUS.get(leg.order_status.get(order_id, ''), 'PLACED'),
+                    executed_qty=qty,
+                    executed_price=price
+                )
+                tracked = self.order_states.track(order_id, leg.symbol, leg.transaction_type, ordered,
+                                                  tag=leg.strategy)
+                # An update may have reached the stream before the basket returned
+                tracked.tag = tracked.tag or leg.strategy or ''
+                if qty:
+                    self._update_position(FillRecord(order_id, leg.symbol, leg.transaction_type, qty, price))
+                self._journal_order(order_id)
+    
+    def _validate_basket(self, legs: List[Dict], on_failure: str):
+        """
+        Validate every leg and resolve tokens / lot sizes in one batch
+        
+        Returns:
+            (basket legs, errors)
+        """
+        errors = []
+        
+        if not legs:
+            return [], ['Basket has no legs']
+        if on_failure not in ON_FAILURE:
+            errors.append(f"Unknown on_failure '{on_failure}'")
+        
+        for i, leg in enumerate(legs):
+            missing = [k for k in ('symbol', 'exchange', 'transaction_type', 'quantity') if not leg.get(k)]
+            if missing:
+                errors.append(f"Leg {i}: missing {', '.join(missing)}")
+                continue
+            if leg['transaction_type'] not in ('BUY', 'SELL'):
+                errors.append(f"Leg {i}: bad transaction type {leg['transaction_type']}")
+            if leg.get('order_type', 'MARKET') not in ORDER_TYPES:
+                errors.append(f"Leg {i}: unsupported order type {leg.get('order_type')}")
+            if leg.get('order_type') == 'LIMIT' and not leg.get('price'):
+                errors.append(f"Leg {i}: LIMIT order needs a price")
+            if int(leg['quantity']) <= 0:
+                errors.append(f"Leg {i}: quantity must be positive")
+        
+        if errors:
+            return [], errors
+        
+        if self.risk_gate is not None:
+            # The whole basket against the limits, not each leg on its own
+            allowed, reason = self.risk_gate.check_basket([
+                dict(leg, price=self._reference_price(leg['symbol'], float(leg.get('price') or 0)))
+                for leg in legs
+            ])
+            if not allowed:
+                errors.append(f"Basket: {reason}")
+        else:
+            new_symbols = {leg['symbol'] for leg in legs} - set(self.positions)
+            if len(self.positions) + len(new_symbols) > self.max_positions:
+                errors.append(f"Basket would exceed max positions ({self.max_positions})")
+        
+        prepared = self.prepare_orders(legs)
+        basket = []
+        for i, (leg, order) in enumerate(zip(legs, prepared)):
+            if self.token_mapper and not order['token']:
+                errors.append(f"Leg {i}: unknown symbol {leg['symbol']}")
+            if order['quantity'] != int(leg['quantity']):
+                errors.append(f"Leg {i}: quantity {leg['quantity']} is not a multiple of lot size {order['lot_size']}")
+            
+            basket.append(BasketLeg(
+                symbol=leg['symbol'],
+                exchange=leg['exchange'],
+                transaction_type=leg['transaction_type'],
+                quantity=order['quantity'],
+                order_type=leg.get('order_type', 'MARKET'),
+                price=order['price'],
+                strategy=leg.get('strategy'),
+                token=order['token'],
+                freeze_qty=order['freeze_qty']
+            ))
+        
+        return basket, errors
+    
+    def _leg_params(self, leg: BasketLeg, transaction_type, quantity, order_type, price):
+        """placeOrder parameters for one basket child order"""
+        return self._order_params(leg.symbol, leg.token, leg.exchange,
+                                  transaction_type, quantity, order_type, price)
+    
+    def _place_paper_basket(self, basket: List[BasketLeg]) -> BasketResult:
+        """Simulated basket - every leg goes through the paper order path"""
+        for leg in basket:
+            order_id = self._place_paper_order(OrderRecord(
+                symbol=leg.symbol,
+                exchange=leg.exchange,
+                transaction_type=leg.transaction_type,
+                quantity=leg.quantity,
+                order_type=leg.order_type,
+                price=leg.price,
+                strategy=leg.strategy
+            ))
+            if not order_id:
+                leg.status, leg.error = 'REJECTED', 'Paper order failed'
+                continue
+            
+            leg.order_ids.append(order_id)
+            leg.order_qty[order_id] = leg.quantity
+            order = self.orders[order_id]
+            if order.status == 'COMPLETE':
+                price = order.executed_price
+                leg.order_status[order_id] = 'complete'
+                leg.order_fills[order_id] = (leg.quantity, price)
+                leg.filled_qty, leg.avg_price, leg.status = leg.quantity, price, 'FILLED'
+            else:
+                leg.order_status[order_id] = 'open'
+                leg.status = 'OPEN'
+        
+        complete = all(leg.status == 'FILLED' for leg in basket)
+        return BasketResult(
+            status='COMPLETE' if complete else 'PARTIAL',
+            legs=basket,
+            errors=[f"{leg.symbol}: {leg.error}" for leg in basket if leg.error]
+        )
+    
+    def flatten_all(self, reason='FLATTEN_ALL', source='manual', deadline=5.0) -> KillReport:
+        """
+        Cancel every working order and exit every open position at market
+        
+        Cancels and exits go out together (LIVE: one concurrent batch over
+        the async client); the call returns once every exit is filled or
+        the deadline passes. Exits skip the risk gate - they only reduce
+        risk - and unfilled exits are left working.
+        
+        Args:
+            reason: Why (for the report)
+            source: Trigger name (manual, risk_gate, telegram, signal)
+            deadline: Seconds to wait for cancels, exits and fills
+            
+        Returns:
+            KillReport with failed cancels, unfilled legs and residual positions
+        """
+        report = KillReport(reason=reason, source=source)
+        start = time.monotonic()
+        
+        try:
+            if self.mode == 'PAPER':
+                self._flatten_paper(report, start + deadline)
+            else:
+                client = self._get_broker_client()
+                if client is None:
+                    report.errors.append('Trading API not connected')
+                else:
+                    self._broker_loop.run(self._flatten_live(client, report, start + deadline))
+        except Exception as e:
+            logger.error(f"❌ Flatten error: {e}")
+            report.errors.append(str(e))
+        
+        report.elapsed_ms = (time.monotonic() - start) * 1000
+        return report
+    
+    def _exit_legs(self, positions) -> List[BasketLeg]:
+        """Opposite-side MARKET legs for {symbol: (net qty, exchange, token)}"""
+        items = [(symbol, net, exchange, token) for symbol, (net, exchange, token) in positions.items() if net]
+        if not items:
+            return []
+        
+        # Freeze limits only - exits keep their exact quantity
+        prepared = self.prepare_orders([
+            {'symbol': symbol, 'transaction_type': 'SELL' if net > 0 else 'BUY', 'quantity': abs(net)}
+            for symbol, net, _, _ in items
+        ])
+        return [
+            BasketLeg(symbol=symbol, exchange=exchange, transaction_type='SELL' if net > 0 else 'BUY',
+                      quantity=abs(net), token=token or order['token'], freeze_qty=order['freeze_qty'])
+            for (symbol, net, exchange, token), order in zip(items, prepared)
+        ]
+    
+    def _flatten_paper(self, report: KillReport, deadline_at: float):
+        working = [order_id for order_id, order in self.orders.items() if not order.is_done]
+        for order_id in working:
+            if self.cancel_order(order_id):
+                report.cancelled.append(order_id)
+            else:
+                report.cancel_failed[order_id] = 'Cancel failed'
+        
+        def exchange(position):
+            orders = position.orders
+            return self.orders[orders[-1]].exchange if orders and orders[-1] in self.orders else 'NFO'
+        
+        report.legs = self._exit_legs({
+            symbol: (position.quantity, exchange(position), None)
+            for symbol, position in self.positions.items()
+        })
+        
+        for leg in report.legs:
+            price = self.paper_engine.last_price(leg.symbol) if self.paper_engine is not None else None
+            order_id = self._place_paper_order(OrderRecord(
+                symbol=leg.symbol,
+                exchange=leg.exchange,
+                transaction_type=leg.transaction_type,
+                quantity=leg.quantity,
+                order_type='MARKET',
+                price=price or self.positions[leg.symbol].avg_price
+            ))
+            if order_id:
+                leg.order_ids.append(order_id)
+            else:
+                leg.status, leg.error = 'REJECTED', 'Paper order failed'
+        
+        # Matched paper exits fill on the next tick
+        def filled(leg):
+            return all(self.orders[oid].status == 'COMPLETE' for oid in leg.order_ids)
+        while not all(filled(leg) for leg in report.legs if leg.order_ids) and time.monotonic() < deadline_at:
+            time.sleep(0.01)
+        
+        for leg in report.legs:
+            for order_id in leg.order_ids:
+                order = self.orders[order_id]
+                leg.order_status[order_id] = order.status.lower()
+                leg.order_fills[order_id] = (order.executed_qty, order.executed_price)
+                leg.filled_qty, leg.avg_price = order.executed_qty, order.executed_price
+                leg.status = 'FILLED' if order.status == 'COMPLETE' else 'OPEN'
+        
+        report.deadline_hit = bool(report.failed_legs) and time.monotonic() >= deadline_at
+        report.residual = {symbol: position.quantity for symbol, position in self.positions.items()
+                           if position.quantity}
+    
+    async def _flatten_live(self, client, report: KillReport, deadline_at: float):
+        def remaining():
+            return max(0.0, deadline_at - time.monotonic())
+        
+        # Broker state, not local state: orders and positions from any session count
+        try:
+            book, positions = await asyncio.wait_for(
+                asyncio.gather(client.order_book(), client.position()), remaining())
+        except asyncio.TimeoutError:
+            report.deadline_hit = True
+            report.errors.append('Timed out reading order book / positions')
+            return
+        
+        if not book.get('status'):
+            report.errors.append(f"Order book: {book.get('message')}")
+        if not positions.get('status'):
+            report.errors.append(f"Positions: {positions.get('message')}")
+        
+        working = [order for order in book.get('data') or []
+                   if order.get('orderid') and str(order.get('status', '')).lower() not in TERMINAL_STATUSES]
+        
+        held = {}
+        products = {}
+        for position in positions.get('data') or []:
+            net = int(float(position.get('netqty') or 0))
+            if net:
+                symbol = position['tradingsymbol']
+                held[symbol] = (net, position['exchange'], position.get('symboltoken'))
+                products[symbol] = position.get('producttype') or 'INTRADAY'
+        legs = self._exit_legs(held)
+        
+        def build_params(leg, transaction_type, quantity, order_type, price):
+            params = self._leg_params(leg, transaction_type, quantity, order_type, price)
+            params['producttype'] = products[leg.symbol]   # exit the product that is held
+            return params
+        
+        basket = BasketExecutor(client, build_params, fill_timeout=remaining(), poll_interval=0.1)
+        cancels = asyncio.gather(*(client.cancel_order(order['orderid'], order.get('variety') or 'NORMAL')
+                                   for order in working))
+        if legs:
+            responses, result = await asyncio.gather(cancels, basket.place(legs))
+            report.legs = result.legs
+            self._book_basket_fills(result)
+        else:
+            responses = await cancels
+        
+        for order, response in zip(working, responses):
+            order_id = order['orderid']
+            if response.get('status'):
+                report.cancelled.append(order_id)
+                if order_id in self.orders:
+                    self.orders[order_id].status = 'CANCELLED'
+                    self._journal_order(order_id)
+            else:
+                report.cancel_failed[order_id] = response.get('message', 'Cancel failed')
+        
+        # Confirm with the broker what is still open
+        try:
+            positions = await asyncio.wait_for(client.position(), remaining())
+            report.residual = {
+                position['tradingsymbol']: int(float(position.get('netqty') or 0))
+                for position in positions.get('data') or []
+                if int(float(position.get('netqty') or 0))
+            }
+        except asyncio.TimeoutError:
+            report.deadline_hit = True
+    
+    def _get_broker_client(self):
+        """Async broker client on the background loop (LIVE)"""
+        if self.broker_client is None:
+            self.broker_client = AsyncBrokerClient.from_auth(self.auth, 'trading')
+        if self.broker_client is not None and self._broker_loop is None:
+            self._broker_loop = BackgroundLoop()
+        return self.broker_client
+    
+    def _update_position(self, fill: FillRecord):
+        """Update position tracking"""
+        try:
+            symbol = fill.symbol
             
-            if order_details['transaction_type'] == 'BUY':
-                total_value = (position['quantity'] * position['avg_price']) + \
-                             (order_details['quantity'] * order_details['price'])
-                total_qty = position['quantity'] + order_details['quantity']
-                position['avg_price'] = total_value / total_qty if total_qty > 0 else 0
-                position['quantity'] = total_qty
-            else:  # SELL
-                position['quantity'] -= order_details['quantity']
+            position = self.positions.get(symbol)
+            if position is None:
+                position = self.positions[symbol] = NetPosition(symbol)
             
-            position['orders'].append(order_id)
+            position.apply(fill)
+            self._journal('position', {
+                'symbol': symbol,
+                'order_id': fill.order_id,
+                'position': {'symbol': symbol, 'quantity': position.quantity, 'avg_price': position.avg_price}
+            })
             
             logger.info(
                 f"📊 POSITION UPDATED: {symbol}\n"
-                f"   Quantity: {position['quantity']}\n"
-                f"   Avg Price: ₹{position['avg_price']:.2f}"
+                f"   Quantity: {position.quantity}\n"
+                f"   Avg Price: ₹{position.avg_price:.2f}"
             )
             
         except Exception as e:
             logger.error(f"❌ Position update error: {e}")
     
+    def _journal_order(self, order_id):
+        self._journal('order', {'order_id': order_id, 'order': self.orders[order_id].to_dict(),
+                                'paper_order_counter': self.paper_order_counter})
+    
+    def _journal(self, event_type, data):
+        """Journal an event (queued - no disk I/O on the order path)"""
+        if not self.journal:
+            return
+        self.journal.append(event_type, data)
+        if self.journal.needs_snapshot():
+            # Built and encoded on the journal thread, not the order path
+            self.journal.snapshot(self._snapshot_state)
+    
+    def _snapshot_state(self):
+        """Journal snapshot (called on the journal writer thread)"""
+        # list() copies in one step, so concurrent inserts cannot break iteration
+        return {
+            'orders': {order_id: order.to_dict() for order_id, order in list(self.orders.items())},
+            'positions': {symbol: position.to_dict() for symbol, position in list(self.positions.items())},
+            'paper_order_counter': self.paper_order_counter
+        }
+    
+    def recover(self):
+        """
+        Rebuild orders and positions from the journal
+        
+        Returns:
+            Number of journal events replayed
+        """
+        if not self.journal:
+            return 0
+        
+        try:
+            state, events = self.journal.recover()
+            
+            if state:
+                self.orders = {oid: OrderRecord.from_dict(order) for oid, order in state['orders'].items()}
+                self.positions = {symbol: NetPosition.from_dict(position)
+                                  for symbol, position in state['positions'].items()}
+                self.paper_order_counter = state['paper_order_counter']
+            
+            for event_type, data in events:
+                if event_type == 'order':
+                    self.orders[data['order_id']] = OrderRecord.from_dict(data['order'])
+                    self.paper_order_counter = max(self.paper_order_counter, data['paper_order_counter'])
+                elif event_type == 'position':
+                    # Order ids are journaled one per event, not the whole list;
+                    # the snapshot may already hold this one
+                    previous = self.positions.get(data['symbol'])
+                    orders = previous.orders if previous is not None else []
+                    if data['order_id'] not in orders:
+                        orders = orders + [data['order_id']]
+                    self.positions[data['symbol']] = NetPosition(**data['position'], orders=orders)
+            
+            # Journal order is submission order, so the newest ids stay in the tail
+            for order_id, order in self.orders.items():
+                if order.client_order_id and order.status != 'REJECTED':
+                    self._remember_client_order(order.client_order_id, order_id)
+            
+            # Working orders are reconciled by the order update poller
+            for order_id, order in self.orders.items():
+                tracked = self.order_states.track(order_id, order.symbol, order.transaction_type,
+                                                  order.quantity, tag=order.strategy)
+                
+                # Paper orders go back into the matching engine; fills already
+                # booked are restored without replaying the fill callbacks
+                if self.paper_engine is not None and order.status == 'OPEN':
+                    tracked.filled_qty = order.executed_qty
+                    tracked.avg_price = order.executed_price
+                    self.paper_engine.submit(
+                        order_id, order.symbol, order.transaction_type, order.quantity,
+                        order_type=order.order_type, price=order.price,
+                        trigger_price=order.trigger_price, tag=order.strategy,
+                        token=self._feed_token(order.symbol),
+                        filled_qty=order.executed_qty,
+                        avg_price=order.executed_price
+                    )
+            
+            if self.risk_gate is not None:
+                for symbol, position in self.positions.items():
+                    if position.quantity:
+                        side = 'BUY' if position.quantity > 0 else 'SELL'
+                        self.risk_gate.apply_fill(symbol, side, abs(position.quantity), position.avg_price)
+            
+            if state or events:
+                logger.info(f"✅ Recovered {len(self.orders)} orders from journal")
+            return len(events)
+            
+        except Exception as e:
+            logger.error(f"❌ Journal recovery error: {e}")
+            return 0
+    
+    def start_order_updates(self, position_manager=None, stream=True):
+        """
+        Follow order state changes and fills
+        
+        LIVE orders are fed by the order update websocket, with order book
+        polling as the fallback; PAPER fills are fed directly.
+        
+        Args:
+            position_manager: PositionManager to notify on every fill (with
+                              the order record, for its SL, target and strategy)
+            stream: Use the websocket (False = polling only)
+        """
+        if position_manager is not None:
+            def notify(order, fill_qty, fill_price):
+                position_manager.on_fill(order, fill_qty, fill_price, self.orders.get(order.order_id))
+            self.order_states.on_fill(notify)
+        
+        if self.mode == 'PAPER':
+            return True
+        
+        if not self.smart_api:
+            logger.error("❌ Trading API not connected")
+            return False
+        
+        tokens = self.auth.auth_tokens.get('trading')
+        if stream and tokens:
+            self.order_stream = OrderUpdateStream(
+                self.order_states,
+                auth_token=tokens['auth_token'],
+                api_key=self.auth.api_keys['trading'],
+                client_code=self.client_code,
+                feed_token=tokens['feed_token']
+            )
+            self.order_stream.start()
+        
+        self.order_poller = OrderPoller(self.order_states, self.smart_api.orderBook,
+                                        stream=self.order_stream)
+        self.order_poller.start()
+        
+        logger.info("✅ Order updates started")
+        return True
+    
     def get_order_status(self, order_id):
-        """Get order status"""
-        if order_id in self.orders:
-            return self.orders[order_id]
-        return None
+        """Get order status (with lifecycle state when tracked)"""
+        if order_id not in self.orders:
+            return None
+        
+        order = self.orders[order_id].to_dict()
+        tracked = self.order_states.get(order_id)
+        if tracked:
+            order.update({
+                'state': tracked.state.value,
+                'filled_qty': tracked.filled_qty,
+                'avg_price': tracked.avg_price
+            })
+        return order
     
     def get_all_orders(self):
         """Get all orders"""
@@ -291,19 +1049,25 @@ class OrderExecutor:
             
             order = self.orders[order_id]
             
-            if order['status'] == 'COMPLETE':
+            if order.status == 'COMPLETE':
                 logger.warning(f"⚠️  Cannot cancel completed order {order_id}")
                 return False
             
             if self.mode == 'PAPER':
-                order['status'] = 'CANCELLED'
+                if self.paper_engine is not None and not self.paper_engine.cancel(order_id):
+                    logger.warning(f"⚠️  Paper order {order_id} is no longer working")
+                    return False
+                order.status = 'CANCELLED'
+                self.order_states.apply_update({'orderid': order_id, 'status': 'cancelled'})
+                self._journal_order(order_id)
                 logger.info(f"✅ Paper order {order_id} cancelled")
                 return True
             else:
                 # Cancel live order
                 response = self.smart_api.cancelOrder(order_id, "NORMAL")
                 if response and response.get('status'):
-                    order['status'] = 'CANCELLED'
+                    order.status = 'CANCELLED'
+                    self._journal_order(order_id)
                     logger.info(f"✅ Live order {order_id} cancelled")
                     return True
                 else:
@@ -314,16 +1078,95 @@ class OrderExecutor:
             logger.error(f"❌ Cancel error: {e}")
             return False
     
+    def prepare_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Resolve tokens and round a batch of orders to lot and tick sizes
+        
+        Quantities are rounded down to whole lots. LIMIT prices are rounded
+        to the tick on the passive side (BUY down, SELL up); MARKET orders
+        keep their price. The whole batch goes through the contract spec
+        table in one vectorized pass.
+        
+        Args:
+            orders: Dicts with 'symbol', 'transaction_type', 'quantity',
+                    optional 'price' and 'order_type'
+            
+        Returns:
+            New order dicts with 'token', 'lot_size', 'tick_size',
+            'freeze_qty' and 'slices' (child orders needed under the freeze limit)
+        """
+        if not orders:
+            return []
+        
+        tokens = [self._get_symbol_token(o['symbol']) for o in orders]
+        quantities = np.array([o['quantity'] for o in orders], dtype=np.int64)
+        prices = np.array([o.get('price') or 0 for o in orders], dtype=np.float64)
+        is_buy = np.array([o['transaction_type'] == 'BUY' for o in orders])
+        is_market = np.array([o.get('order_type', 'MARKET') == 'MARKET' for o in orders])
+        
+        if self.token_mapper:
+            spec = self.token_mapper.contract_specs.normalize_orders(tokens, quantities, prices, is_buy)
+            quantities = spec['quantity']
+            prices = np.where(is_market, prices, spec['price'])
+            slices = spec['slices']
+        else:
+            spec = {
+                'lot_size': np.ones(len(orders), dtype=np.int64),
+                'tick_size': np.zeros(len(orders)),
+                'freeze_qty': np.zeros(len(orders), dtype=np.int64)
+            }
+            slices = np.ones(len(orders), dtype=np.int64)
+        
+        return [
+            {
+                **order,
+                'token': tokens[i],
+                'quantity': int(quantities[i]),
+                'price': float(prices[i]),
+                'lot_size': int(spec['lot_size'][i]),
+                'tick_size': float(spec['tick_size'][i]),
+                'freeze_qty': int(spec['freeze_qty'][i]),
+                'slices': int(slices[i])
+            }
+            for i, order in enumerate(orders)
+        ]
+    
     def _get_symbol_token(self, symbol):
-        """Get symbol token (placeholder - implement token mapping)"""
-        # TODO: Implement proper symbol to token mapping
-        # This requires master contract download
-        return "99926000"  # NIFTY 50 example
+        """Get symbol token from the token mapper"""
+        if self.token_mapper:
+            token = self.token_mapper.get_token(symbol)
+            if not token:
+                logger.warning(f"⚠️  No token found for {symbol}")
+            return token
+        # Without a token mapper only the index token is known
+        return "99926000"  # NIFTY 50
+    
+    def _feed_token(self, symbol):
+        """
+        Feed token whose ticks price a paper order, or None if unknown
+        
+        Never the index fallback of _get_symbol_token - registering it
+        would price every paper order off NIFTY ticks.
+        """
+        return self.token_mapper.get_token(symbol) if self.token_mapper else None
     
     def disconnect(self):
         """Disconnect and cleanup"""
         logger.info("🔄 Disconnecting order executor...")
         
+        if self.order_poller:
+            self.order_poller.stop()
+        if self.order_stream:
+            self.order_stream.stop()
+        
+        if self.journal:
+            self.journal.close()
+        
+        if self._broker_loop is not None:
+            self._broker_loop.run(self.broker_client.close())
+            self._broker_loop.stop()
+            self._broker_loop = None
+        
         if self.mode == 'LIVE':
             try:
                 self.auth.logout_all()
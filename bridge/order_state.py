@@ -0,0 +1,326 @@
+"""
+Order State Module
+Explicit order state machine fed by the Angel One order-update websocket,
+with an order book polling fallback and fill callbacks
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+from SmartApi.smartWebSocketOrderUpdate import SmartWebSocketOrderUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class OrderState(Enum):
+    NEW = "new"
+    OPEN = "open"
+    PARTIALLY_FILLED = "partially_filled"
+    FILLED = "filled"
+    CANCELLED = "cancelled"
+    REJECTED = "rejected"
+
+
+TERMINAL_STATES = {OrderState.FILLED, OrderState.CANCELLED, OrderState.REJECTED}
+
+# Allowed transitions - anything else is a stale / out-of-order update
+TRANSITIONS = {
+    OrderState.NEW: {OrderState.OPEN, OrderState.PARTIALLY_FILLED, OrderState.FILLED,
+                     OrderState.CANCELLED, OrderState.REJECTED},
+    OrderState.OPEN: {OrderState.PARTIALLY_FILLED, OrderState.FILLED,
+                      OrderState.CANCELLED, OrderState.REJECTED},
+    OrderState.PARTIALLY_FILLED: {OrderState.FILLED, OrderState.CANCELLED},
+    OrderState.FILLED: set(),
+    OrderState.CANCELLED: set(),
+    OrderState.REJECTED: set()
+}
+
+# Broker status strings that end an order; every other status means working
+BROKER_TERMINAL = {
+    'complete': OrderState.FILLED,
+    'cancelled': OrderState.CANCELLED,
+    'rejected': OrderState.REJECTED
+}
+
+
+@dataclass(slots=True)
+class TrackedOrder:
+    """One order and its lifecycle"""
+    order_id: str
+    symbol: str = ''
+    transaction_type: str = ''
+    quantity: int = 0
+    filled_qty: int = 0
+    avg_price: float = 0.0
+    state: OrderState = OrderState.NEW
+    text: str = ''
+    tag: str = ''                                          # strategy / caller tag
+    updated_at: float = field(default_factory=time.time)
+    history: List[tuple] = field(default_factory=list)   # (timestamp, state)
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OrderStateMachine:
+    """
+    Order lifecycle tracker
+
+    Updates may arrive from the websocket and the poller in any order;
+    fills are derived from the change in cumulative filled quantity, so a
+    duplicate or older update never double-counts.
+    """
+
+    def __init__(self):
+        self.orders: Dict[str, TrackedOrder] = {}
+        self._fill_callbacks: List[Callable] = []
+        self._state_callbacks: List[Callable] = []
+        self._lock = threading.RLock()
+
+    def on_fill(self, callback: Callable[[TrackedOrder, int, float], None]):
+        """Register callback(order, fill_qty, fill_price)"""
+        self._fill_callbacks.append(callback)
+
+    def on_state_change(self, callback: Callable[[TrackedOrder, OrderState, OrderState], None]):
+        """Register callback(order, old_state, new_state)"""
+        self._state_callbacks.append(callback)
+
+    def track(self, order_id: str, symbol: str, transaction_type: str, quantity: int,
+              tag: str = '') -> TrackedOrder:
+        """Register an order placed by this process (state NEW)"""
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                order = TrackedOrder(order_id, symbol, transaction_type, int(quantity), tag=tag or '')
+                order.history.append((order.updated_at, OrderState.NEW))
+                self.orders[order_id] = order
+            return order
+
+    def get(self, order_id: str) -> Optional[TrackedOrder]:
+        return self.orders.get(order_id)
+
+    def open_orders(self) -> List[TrackedOrder]:
+        with self._lock:
+            return [o for o in self.orders.values() if not o.is_terminal]
+
+    def apply_update(self, data: Dict) -> Optional[TrackedOrder]:
+        """
+        Apply one broker order record (websocket orderData or order book row)
+
+        Args:
+            data: Dict with 'orderid', 'status', 'filledshares', 'averageprice', ...
+
+        Returns:
+            The tracked order, or None if the record has no order id
+        """
+        order_id = str(data.get('orderid') or '')
+        if not order_id:
+            return None
+
+        fills = []
+        transition = None
+
+        with self._lock:
+            order = self.orders.get(order_id) or self.track(
+                order_id,
+                data.get('tradingsymbol', ''),
+                data.get('transactiontype', ''),
+                _to_int(data.get('quantity'))
+            )
+            if _to_int(data.get('quantity')):
+                order.quantity = _to_int(data.get('quantity'))
+
+            filled = _to_int(data.get('filledshares'))
+            avg_price = _to_float(data.get('averageprice'))
+            status = str(data.get('status') or data.get('orderstatus') or '').lower()
+
+            # Cumulative fill only ever grows - ignore stale snapshots
+            if filled > order.filled_qty:
+                fill_qty = filled - order.filled_qty
+                fill_value = avg_price * filled - order.avg_price * order.filled_qty
+                fills.append((fill_qty, round(fill_value / fill_qty, 2)))
+                order.filled_qty = filled
+                order.avg_price = avg_price
+
+            new_state = BROKER_TERMINAL.get(status)
+            if new_state is None:
+                if 0 < order.filled_qty < order.quantity or (order.quantity == 0 and order.filled_qty):
+                    new_state = OrderState.PARTIALLY_FILLED
+                else:
+                    new_state = OrderState.OPEN
+
+            if new_state != order.state:
+                if new_state in TRANSITIONS[order.state]:
+                    transition = (order.state, new_state)
+                    order.state = new_state
+                    order.history.append((time.time(), new_state))
+                else:
+                    logger.debug(f"Ignoring {order.state.value} -> {new_state.value} for {order_id}")
+
+            order.text = data.get('text') or order.text
+            order.updated_at = time.time()
+
+        # Callbacks run outside the lock
+        for fill_qty, fill_price in fills:
+            logger.info(f"💰 FILL {order.transaction_type} {fill_qty} x {order.symbol} @ ₹{fill_price:.2f} ({order_id})")
+            for callback in self._fill_callbacks:
+                try:
+                    callback(order, fill_qty, fill_price)
+                except Exception as e:
+                    logger.error(f"❌ Fill callback error: {e}")
+
+        if transition:
+            for callback in self._state_callbacks:
+                try:
+                    callback(order, *transition)
+                except Exception as e:
+                    logger.error(f"❌ State callback error: {e}")
+
+        return order
+
+
+class OrderUpdateStream(SmartWebSocketOrderUpdate):
+    """Angel One order-update websocket feeding an OrderStateMachine"""
+
+    def __init__(self, machine: OrderStateMachine, auth_token: str, api_key: str,
+                 client_code: str, feed_token: str):
+        super().__init__(auth_token, api_key, client_code, feed_token)
+        self.machine = machine
+        self.is_connected = False
+        self.last_message = 0.0
+        self._thread = None
+
+    def start(self):
+        """Connect on a daemon thread"""
+        self._thread = threading.Thread(target=self.connect, daemon=True)
+        self._thread.start()
+        logger.info("🔌 Order update stream starting...")
+
+    def stop(self):
+        self.MAX_CONNECTION_RETRY_ATTEMPTS = 0
+        self.close_connection()
+
+    def healthy(self, stale_after: float = 30.0) -> bool:
+        """Connected and heard from recently (messages or heartbeat pongs)"""
+        last = max(self.last_message, self.last_pong_timestamp or 0)
+        return self.is_connected and time.time() - last < stale_after
+
+    def on_open(self, wsapp):
+        self.is_connected = True
+        self.last_message = time.time()
+        self.current_retry_attempt = 0
+        logger.info("✅ Order update stream connected")
+
+    def on_close(self, wsapp, close_status_code, close_msg):
+        self.is_connected = False
+        logger.warning("⚠️  Order update stream closed")
+        super().on_close(wsapp, close_status_code, close_msg)
+
+    def on_error(self, wsapp, error):
+        logger.error(f"❌ Order update stream error: {error}")
+
+    def on_message(self, wsapp, message):
+        self.last_message = time.time()
+        try:
+            payload = json.loads(message)
+        except (TypeError, ValueError):
+            return
+
+        order_data = payload.get('orderData') if isinstance(payload, dict) else None
+        if order_data:
+            self.machine.apply_update(order_data)
+
+
+class OrderPoller:
+    """
+    Order book polling fallback
+
+    Polls quickly while the stream is down or stale and slowly otherwise,
+    so an update the websocket missed is still picked up.
+    """
+
+    def __init__(self, machine: OrderStateMachine, fetch_order_book: Callable[[], Dict],
+                 stream: Optional[OrderUpdateStream] = None,
+                 interval: float = 2.0, reconcile_interval: float = 30.0):
+        """
+        Initialize poller
+
+        Args:
+            machine: State machine to feed
+            fetch_order_book: Returns a SmartAPI order book response
+            stream: Websocket stream whose health decides the poll rate
+            interval: Seconds between polls while the stream is unhealthy
+            reconcile_interval: Seconds between polls while it is healthy
+        """
+        self.machine = machine
+        self.fetch_order_book = fetch_order_book
+        self.stream = stream
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_poll = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def poll_once(self) -> int:
+        """
+        Fetch the order book and apply every row
+
+        Returns:
+            Number of rows applied
+        """
+        self._last_poll = time.monotonic()
+        try:
+            response = self.fetch_order_book()
+        except Exception as e:
+            logger.error(f"❌ Order book poll failed: {e}")
+            return 0
+
+        if not response or not response.get('status'):
+            return 0
+
+        rows = response.get('data') or []
+        for row in rows:
+            self.machine.apply_update(row)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            stream_ok = self.stream is not None and self.stream.healthy()
+            due = self.reconcile_interval if stream_ok else self.interval
+
+            # With a healthy stream and no working orders there is nothing to poll
+            if time.monotonic() - self._last_poll >= due and \
+                    (self.machine.open_orders() or not stream_ok):
+                self.poll_once()
+
+            self._stop.wait(min(self.interval, 1.0))
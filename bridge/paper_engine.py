@@ -0,0 +1,545 @@
+"""
+Paper Matching Engine
+Resting limit / stop orders in per-symbol price-sorted books, filled
+against the live (or replayed) tick stream, depth-aware when available
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Angel One order types
+MARKET = 'MARKET'
+LIMIT = 'LIMIT'
+STOPLOSS_LIMIT = 'STOPLOSS_LIMIT'      # SL: trigger, then a limit order at price
+STOPLOSS_MARKET = 'STOPLOSS_MARKET'    # SL-M: trigger, then a market order
+
+ORDER_TYPES = (MARKET, LIMIT, STOPLOSS_LIMIT, STOPLOSS_MARKET)
+
+# Paper order status (broker order book strings)
+OPEN = 'open'
+TRIGGER_PENDING = 'trigger pending'
+COMPLETE = 'complete'
+CANCELLED = 'cancelled'
+REJECTED = 'rejected'
+
+WORKING = (OPEN, TRIGGER_PENDING)
+
+
+class PaperOrder:
+    """One simulated order"""
+
+    __slots__ = ('order_id', 'symbol', 'side', 'quantity', 'order_type', 'price',
+                 'trigger_price', 'filled_qty', 'avg_price', 'status', 'tag', 'seq', 'since')
+
+    def __init__(self, order_id, symbol, side, quantity, order_type, price, trigger_price, tag, seq):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.order_type = order_type
+        self.price = price
+        self.trigger_price = trigger_price
+        self.filled_qty = 0
+        self.avg_price = 0.0
+        self.status = OPEN
+        self.tag = tag
+        self.seq = seq
+        self.since = 0          # tick number it became marketable at
+
+    @property
+    def remaining(self) -> int:
+        return self.quantity - self.filled_qty
+
+    def to_record(self) -> Dict:
+        """Broker order book style record (what OrderStateMachine consumes)"""
+        return {
+            'orderid': self.order_id,
+            'tradingsymbol': self.symbol,
+            'transactiontype': self.side,
+            'ordertype': self.order_type,
+            'quantity': self.quantity,
+            'price': self.price,
+            'triggerprice': self.trigger_price,
+            'filledshares': self.filled_qty,
+            'unfilledshares': self.remaining,
+            'averageprice': round(self.avg_price, 2),
+            'status': self.status,
+            'ordertag': self.tag or ''
+        }
+
+
+class _SymbolBook:
+    """
+    Working orders of one symbol
+
+    Limit orders sit in price-time priority heaps (best bid / best offer
+    at index 0) and stops in trigger-ordered heaps (next to fire at index
+    0), so a tick that crosses nothing costs four comparisons. Cancelled
+    orders are dropped lazily when they reach the top.
+    """
+
+    __slots__ = ('buys', 'sells', 'buy_stops', 'sell_stops', 'market',
+                 'ltp', 'depth', 'bids', 'asks', 'ticks')
+
+    def __init__(self):
+        self.buys: List[Tuple[float, int, PaperOrder]] = []        # (-price, seq, order)
+        self.sells: List[Tuple[float, int, PaperOrder]] = []       # (price, seq, order)
+        self.buy_stops: List[Tuple[float, int, PaperOrder]] = []   # (trigger, seq, order)
+        self.sell_stops: List[Tuple[float, int, PaperOrder]] = []  # (-trigger, seq, order)
+        self.market = deque()
+        self.ltp = 0.0
+        self.depth = False                   # last tick carried market depth
+        self.bids: List[List[float]] = []    # [[price, qty], ...] best first
+        self.asks: List[List[float]] = []
+        self.ticks = 0
+
+    def crossed(self) -> bool:
+        """Anything to do at the current quote?"""
+        ltp = self.ltp
+        if not ltp:
+            return False
+        if self.market:
+            return True
+        if self.buy_stops and self.buy_stops[0][0] <= ltp:
+            return True
+        if self.sell_stops and -self.sell_stops[0][0] >= ltp:
+            return True
+        if self.depth:
+            # Only what is left of the quoted depth is available
+            if self.buys and self.asks and -self.buys[0][0] >= self.asks[0][0]:
+                return True
+            if self.sells and self.bids and self.sells[0][0] <= self.bids[0][0]:
+                return True
+            return False
+        if self.buys and -self.buys[0][0] >= ltp:
+            return True
+        if self.sells and self.sells[0][0] <= ltp:
+            return True
+        return False
+
+
+class PaperMatchingEngine:
+    """
+    Tick-driven matching for paper trading
+
+    Orders rest until the market trades through them:
+
+    - LIMIT buys fill when the best ask (or LTP) reaches the limit, sells
+      when the best bid does - marketable limits fill at the quote, resting
+      ones at their limit (a resting order only counts as filled when the
+      print goes through it, unless touch_fills=True)
+    - STOPLOSS_MARKET / STOPLOSS_LIMIT wait in trigger books until LTP
+      crosses the trigger, then become market / limit orders
+    - MARKET orders fill at the quote, or on the next tick if none is known
+
+    With market depth (SNAP_QUOTE ticks) fills walk the book level by
+    level, consuming its quantity, so large orders partially fill and
+    slip; without depth the LTP has unlimited size.
+
+    Fills are reported as cumulative broker-style order records through
+    on_update, so OrderStateMachine / PositionManager / RiskGate see the
+    same stream as a live order.
+    """
+
+    def __init__(self, on_update: Callable[[Dict], None] = None, touch_fills: bool = False,
+                 price_divisor: float = 1):
+        """
+        Initialize matching engine
+
+        Args:
+            on_update: Called with an order record on every fill
+            touch_fills: Fill resting limits when LTP only touches the limit
+            price_divisor: Tick price scale (100 for raw SmartWebSocketV2 paise)
+        """
+        self.on_update = on_update
+        self.touch_fills = touch_fills
+        self.price_divisor = price_divisor
+
+        self.books: Dict[str, _SymbolBook] = {}
+        self.orders: Dict[str, PaperOrder] = {}
+        self.token_symbols: Dict[str, str] = {}    # feed token -> order symbol
+
+        self.stats = {'ticks': 0, 'fills': 0, 'orders': 0}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Orders
+
+    def submit(self, order_id: str, symbol: str, side: str, quantity: int,
+               order_type: str = MARKET, price: float = 0, trigger_price: float = 0,
+               tag: str = None, token: str = None, filled_qty: int = 0,
+               avg_price: float = 0.0) -> PaperOrder:
+        """
+        Add an order; it fills immediately if marketable at the last quote
+
+        Args:
+            order_id: Order id
+            symbol: Trading symbol
+            side: 'BUY' or 'SELL'
+            quantity: Quantity
+            order_type: MARKET, LIMIT, STOPLOSS_LIMIT or STOPLOSS_MARKET
+            price: Limit price (LIMIT / STOPLOSS_LIMIT)
+            trigger_price: Trigger price (STOPLOSS_*)
+            tag: Strategy / caller tag
+            token: Feed token whose ticks price this symbol
+            filled_qty: Quantity already filled (resuming a recovered order)
+            avg_price: Average price of filled_qty
+
+        Returns:
+            The paper order (status REJECTED when invalid)
+        """
+        side = side.upper()
+        order_type = order_type.upper()
+
+        with self._lock:
+            self._seq += 1
+            order = PaperOrder(order_id, symbol, side, int(quantity), order_type,
+                               float(price or 0), float(trigger_price or 0), tag, self._seq)
+            order.filled_qty = int(filled_qty)
+            order.avg_price = float(avg_price or 0)
+            self.orders[order_id] = order
+            self.stats['orders'] += 1
+
+            if side not in ('BUY', 'SELL') or order_type not in ORDER_TYPES or order.remaining <= 0:
+                order.status = REJECTED
+            elif order_type in (LIMIT, STOPLOSS_LIMIT) and order.price <= 0:
+                order.status = REJECTED
+            elif order_type in (STOPLOSS_LIMIT, STOPLOSS_MARKET) and order.trigger_price <= 0:
+                order.status = REJECTED
+            if order.status == REJECTED:
+                logger.warning(f"⚠️  Paper order {order_id} rejected: "
+                               f"{side} {quantity} {order_type} @ {price}/{trigger_price}")
+                return order
+
+            if token is not None:
+                self.token_symbols[str(token)] = symbol
+
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = _SymbolBook()
+
+            order.since = book.ticks
+            if order_type in (STOPLOSS_LIMIT, STOPLOSS_MARKET):
+                self._arm(book, order)
+            else:
+                self._rest(book, order)
+
+            fills = self._match(book) if book.crossed() else []
+
+        self._report(fills)
+        return order
+
+    def cancel(self, order_id: str) -> bool:
+        """Cancel a working order (removed lazily from its book)"""
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status not in WORKING:
+                return False
+            order.status = CANCELLED
+            return True
+
+    def modify(self, order_id: str, price: float = None, trigger_price: float = None,
+               quantity: int = None) -> bool:
+        """
+        Modify a working order; like the exchange, it loses time priority
+
+        Returns:
+            True if modified
+        """
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status not in WORKING:
+                return False
+            if quantity is not None and int(quantity) <= order.filled_qty:
+                return False
+
+            # Retire the old heap entry and re-queue the order under a new seq
+            pending = order.status == TRIGGER_PENDING
+            order.status = CANCELLED
+            self._seq += 1
+            replacement = PaperOrder(order.order_id, order.symbol, order.side,
+                                     int(quantity) if quantity is not None else order.quantity,
+                                     order.order_type,
+                                     float(price) if price is not None else order.price,
+                                     float(trigger_price) if trigger_price is not None else order.trigger_price,
+                                     order.tag, self._seq)
+            replacement.filled_qty = order.filled_qty
+            replacement.avg_price = order.avg_price
+            self.orders[order_id] = replacement
+
+            book = self.books[order.symbol]
+            replacement.since = book.ticks
+            if pending:
+                self._arm(book, replacement)
+            else:
+                self._rest(book, replacement)
+
+            fills = self._match(book) if book.crossed() else []
+
+        self._report(fills)
+        return True
+
+    def get(self, order_id: str) -> Optional[PaperOrder]:
+        return self.orders.get(order_id)
+
+    def open_orders(self, symbol: str = None) -> List[PaperOrder]:
+        return [order for order in self.orders.values()
+                if order.status in WORKING and (symbol is None or order.symbol == symbol)]
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        book = self.books.get(symbol)
+        return book.ltp if book and book.ltp else None
+
+    # ------------------------------------------------------------------
+    # Ticks
+
+    def on_tick(self, symbol: str, ltp: float, bids: List = None, asks: List = None) -> List[Dict]:
+        """
+        Match a symbol's working orders against one tick
+
+        Args:
+            symbol: Trading symbol
+            ltp: Last traded price
+            bids: Optional [(price, qty), ...] best first
+            asks: Optional [(price, qty), ...] best first
+
+        Returns:
+            Order records of the fills this tick caused
+        """
+        with self._lock:
+            self.stats['ticks'] += 1
+            book = self.books.get(symbol)
+            if book is None:
+                # Nothing resting yet: remember the quote for incoming orders
+                book = self.books[symbol] = _SymbolBook()
+
+            book.ticks += 1
+            book.ltp = ltp
+            book.depth = bool(bids or asks)
+            book.bids = [[p, q] for p, q in bids] if bids else []
+            book.asks = [[p, q] for p, q in asks] if asks else []
+            fills = self._match(book) if book.crossed() else []
+
+        if fills:
+            self._report(fills)
+        return fills
+
+    def process_tick(self, tick: Dict) -> List[Dict]:
+        """
+        Feed one market feed tick (MarketFeedListener tick listener)
+
+        Accepts the same dicts as CandleBuilder; SNAP_QUOTE ticks with
+        best_5_buy_data / best_5_sell_data make matching depth-aware.
+        """
+        if not isinstance(tick, dict):
+            return []
+        key = tick.get('name', tick.get('token'))
+        symbol = self.token_symbols.get(str(key), key)
+        ltp = float(tick.get('ltp', tick.get('last_traded_price', 0)) or 0) / self.price_divisor
+        if not ltp or symbol is None:
+            return []
+        return self.on_tick(symbol, ltp,
+                            self._depth(tick.get('best_5_buy_data')),
+                            self._depth(tick.get('best_5_sell_data')))
+
+    def replay(self, ticks: Iterable[Dict]) -> int:
+        """
+        Replay recorded ticks through the engine
+
+        Returns:
+            Number of fills
+        """
+        fills = 0
+        for tick in ticks:
+            fills += len(self.process_tick(tick))
+        return fills
+
+    def _depth(self, levels) -> Optional[List[Tuple[float, int]]]:
+        if not levels:
+            return None
+        divisor = self.price_divisor
+        depth = [(float(level['price']) / divisor, int(level['quantity']))
+                 for level in levels if level.get('quantity')]
+        return depth or None
+
+    # ------------------------------------------------------------------
+    # Matching (called with the lock held)
+
+    def _arm(self, book: _SymbolBook, order: PaperOrder):
+        order.status = TRIGGER_PENDING
+        if order.side == 'BUY':
+            heapq.heappush(book.buy_stops, (order.trigger_price, order.seq, order))
+        else:
+            heapq.heappush(book.sell_stops, (-order.trigger_price, order.seq, order))
+
+    def _rest(self, book: _SymbolBook, order: PaperOrder):
+        if order.order_type in (MARKET, STOPLOSS_MARKET):
+            book.market.append(order)
+        elif order.side == 'BUY':
+            heapq.heappush(book.buys, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(book.sells, (order.price, order.seq, order))
+
+    def _match(self, book: _SymbolBook) -> List[Dict]:
+        fills = []
+        self._trigger_stops(book)
+
+        # Market orders first, in arrival order
+        market = book.market
+        while market:
+            order = market[0]
+            if order.status in WORKING:
+                self._fill(book, order, None, fills)
+                if order.remaining:
+                    break       # depth exhausted - wait for the next tick
+            market.popleft()
+
+        self._match_side(book, book.buys, -1, fills)
+        self._match_side(book, book.sells, 1, fills)
+        return fills
+
+    def _trigger_stops(self, book: _SymbolBook):
+        ltp = book.ltp
+        buy_stops, sell_stops = book.buy_stops, book.sell_stops
+        triggered = []
+        while buy_stops and buy_stops[0][0] <= ltp:
+            triggered.append(heapq.heappop(buy_stops)[2])
+        while sell_stops and -sell_stops[0][0] >= ltp:
+            triggered.append(heapq.heappop(sell_stops)[2])
+
+        for order in sorted(triggered, key=lambda o: o.seq):
+            if order.status != TRIGGER_PENDING:
+                continue
+            order.status = OPEN
+            order.since = book.ticks
+            self._rest(book, order)
+
+    def _match_side(self, book: _SymbolBook, heap: List, sign: int, fills: List[Dict]):
+        """Fill crossed limits of one side; sign -1 for buys, +1 for sells"""
+        levels = book.asks if sign < 0 else book.bids
+        while heap:
+            key, _, order = heap[0]
+            if order.status not in WORKING:
+                heapq.heappop(heap)
+                continue
+
+            limit = sign * key
+            if book.depth:
+                if not levels:
+                    break
+                best = levels[0][0]
+                if (best > limit) if sign < 0 else (best < limit):
+                    break
+            else:
+                ltp = book.ltp
+                if order.since == book.ticks:
+                    # Marketable on arrival: fills at the print
+                    if (ltp > limit) if sign < 0 else (ltp < limit):
+                        break
+                else:
+                    # Resting: the print has to go through the limit
+                    through = (ltp < limit) if sign < 0 else (ltp > limit)
+                    if not through and not (self.touch_fills and ltp == limit):
+                        break
+
+            self._fill(book, order, limit, fills)
+            if order.remaining:
+                break           # depth exhausted at this limit
+            heapq.heappop(heap)
+
+    def _fill(self, book: _SymbolBook, order: PaperOrder, limit: Optional[float], fills: List[Dict]):
+        """Fill as much of order as the quote allows (limit None = market)"""
+        buy = order.side == 'BUY'
+        levels = book.asks if buy else book.bids
+        qty = 0
+        value = 0.0
+
+        if book.depth:
+            # Walk the depth, consuming what we take
+            while levels and order.remaining > qty:
+                price, available = levels[0]
+                if limit is not None and ((price > limit) if buy else (price < limit)):
+                    break
+                take = min(order.remaining - qty, available)
+                qty += take
+                value += take * price
+                if take == available:
+                    levels.pop(0)
+                else:
+                    levels[0][1] = available - take
+        else:
+            qty = order.remaining
+            if limit is None or order.since == book.ticks:
+                price = book.ltp if limit is None else (min(book.ltp, limit) if buy else max(book.ltp, limit))
+            else:
+                price = limit
+            value = qty * price
+
+        if not qty:
+            return
+
+        total = order.filled_qty + qty
+        order.avg_price = (order.avg_price * order.filled_qty + value) / total
+        order.filled_qty = total
+        if not order.remaining:
+            order.status = COMPLETE
+        self.stats['fills'] += 1
+        fills.append(order.to_record())
+
+    def _report(self, fills: List[Dict]):
+        if self.on_update is None:
+            return
+        for record in fills:
+            try:
+                self.on_update(record)
+            except Exception as e:
+                logger.error(f"❌ Paper fill callback error: {e}")
+
+
+# ==============================================================================
+# TEST FUNCTION
+# ==============================================================================
+
+if __name__ == "__main__":
+    import random
+
+    print("\n" + "="*60)
+    print("🧪 PAPER MATCHING ENGINE TEST")
+    print("="*60 + "\n")
+
+    engine = PaperMatchingEngine(on_update=lambda r: print(
+        f"   💰 {r['orderid']}: {r['transactiontype']} {r['filledshares']}/{r['quantity']} "
+        f"@ ₹{r['averageprice']} ({r['status']})"))
+
+    engine.on_tick('NIFTY', 23500)
+    engine.submit('P1', 'NIFTY', 'BUY', 75, LIMIT, price=23480)
+    engine.submit('P2', 'NIFTY', 'SELL', 75, STOPLOSS_MARKET, trigger_price=23450)
+    engine.submit('P3', 'NIFTY', 'BUY', 150, MARKET)
+
+    for price in (23490, 23480, 23470, 23440):
+        print(f"📊 tick {price}")
+        engine.on_tick('NIFTY', price)
+
+    print("\n📊 Depth: market BUY 200 against 3 ask levels")
+    engine.on_tick('BANKNIFTY', 50000, bids=[(49995, 30)], asks=[(50005, 50), (50010, 100), (50020, 500)])
+    engine.submit('P4', 'BANKNIFTY', 'BUY', 200, MARKET)
+
+    # Throughput: 2000 symbols, 10 resting orders each, nothing crossing
+    for s in range(2000):
+        engine.on_tick(f"OPT{s}", 100.0)
+        for i in range(10):
+            engine.submit(f"R{s}_{i}", f"OPT{s}", 'BUY', 50, LIMIT, price=90 - i)
+    ticks = [(f"OPT{random.randrange(2000)}", 100 + random.random()) for _ in range(200000)]
+    start = time.perf_counter()
+    for symbol, price in ticks:
+        engine.on_tick(symbol, price)
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ {len(ticks) / elapsed:,.0f} ticks/s ({elapsed / len(ticks) * 1e6:.2f} µs/tick) | {engine.stats}")
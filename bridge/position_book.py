@@ -0,0 +1,268 @@
+"""
+Position Book Module
+Array-backed open positions with vectorized mark-to-market and
+stop-loss / target trigger columns
+"""
+
+import logging
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# column -> dtype; the EXTRA_FIELDS are kept per row in a dict
+COLUMNS = {
+    'quantity': np.int64,
+    'entry_price': np.float64,
+    'current_price': np.float64,
+    'side': np.int8,            # +1 BUY, -1 SELL
+    'stop_loss': np.float64,    # NaN = none
+    'target': np.float64,       # NaN = none
+    'pnl': np.float64,
+    'pnl_percent': np.float64,
+    'lower': np.float64,        # exit when price <= lower
+    'upper': np.float64         # exit when price >= upper
+}
+
+# Position dict keys backed by columns
+FIELDS = ('quantity', 'entry_price', 'current_price', 'stop_loss', 'target', 'pnl', 'pnl_percent')
+
+# Every other key a position may carry - anything else is schema drift
+EXTRA_FIELDS = frozenset(('symbol', 'entry_time', 'status', 'metadata'))
+
+
+def _check_key(key):
+    if key not in EXTRA_FIELDS:
+        raise KeyError(f"Unknown position field {key!r}")
+
+
+class PositionView(MutableMapping):
+    """
+    Live dict-style view of one position row
+
+    Reads and writes go straight to the book's columns, so existing code
+    that does position['quantity'] -= qty keeps working.
+    """
+
+    __slots__ = ('_book', '_row')
+
+    def __init__(self, book: 'PositionBook', row: int):
+        self._book = book
+        self._row = row
+
+    def __getitem__(self, key):
+        book, row = self._book, self._row
+        if key == 'order_type':
+            return 'BUY' if book.cols['side'][row] > 0 else 'SELL'
+        if key in FIELDS:
+            value = book.cols[key][row].item()
+            if key in ('stop_loss', 'target') and value != value:
+                return None
+            return value
+        return book.extra[row][key]
+
+    def __setitem__(self, key, value):
+        book, row = self._book, self._row
+        if key == 'order_type':
+            book.cols['side'][row] = 1 if str(value).upper() == 'BUY' else -1
+            book._set_triggers(row)
+        elif key in FIELDS:
+            book.cols[key][row] = np.nan if value is None else value
+            if key in ('stop_loss', 'target'):
+                book._set_triggers(row)
+        else:
+            _check_key(key)
+            book.extra[row][key] = value
+
+    def __delitem__(self, key):
+        del self._book.extra[self._row][key]
+
+    def __iter__(self):
+        yield from FIELDS
+        yield 'order_type'
+        yield from self._book.extra[self._row]
+
+    def __len__(self):
+        return len(FIELDS) + 1 + len(self._book.extra[self._row])
+
+    def to_dict(self) -> Dict:
+        """Plain dict snapshot"""
+        cols, row = self._book.cols, self._row
+        position = {key: cols[key][row].item() for key in FIELDS}
+        for key in ('stop_loss', 'target'):
+            if position[key] != position[key]:
+                position[key] = None
+        position['order_type'] = 'BUY' if cols['side'][row] > 0 else 'SELL'
+        position.update(self._book.extra[row])
+        return position
+
+    def __repr__(self):
+        return f"PositionView({self.to_dict()!r})"
+
+
+class PositionBook(MutableMapping):
+    """
+    Open positions stored column-wise in numpy arrays
+
+    Behaves like the old {symbol: position dict} mapping, while
+    mark() prices a whole batch of ticks in a few vector operations and
+    returns only the rows whose stop-loss or target was crossed. Each row
+    keeps its nearest exit below (lower) and above (upper) the price, so a
+    trigger check is one comparison per ticked position.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.cols = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.extra: List[Optional[Dict]] = [None] * capacity
+        self.symbols: List[Optional[str]] = [None] * capacity
+        self.index: Dict[str, int] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+
+    def __getitem__(self, symbol: str) -> PositionView:
+        return PositionView(self, self.index[symbol])
+
+    def __setitem__(self, symbol: str, position: Dict):
+        """Add (or replace) a position from a dict"""
+        extra = {key: value for key, value in position.items()
+                 if key not in FIELDS and key != 'order_type'}
+        for key in extra:
+            _check_key(key)
+
+        row = self.index.get(symbol)
+        if row is None:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self.index[symbol] = row
+            self.symbols[row] = symbol
+        self.extra[row] = extra
+
+        cols = self.cols
+        cols['side'][row] = 1 if str(position.get('order_type', 'BUY')).upper() == 'BUY' else -1
+        cols['quantity'][row] = position.get('quantity', 0)
+        cols['entry_price'][row] = position.get('entry_price', 0.0)
+        cols['current_price'][row] = position.get('current_price', position.get('entry_price', 0.0))
+        cols['pnl'][row] = position.get('pnl', 0.0)
+        cols['pnl_percent'][row] = position.get('pnl_percent', 0.0)
+        for key in ('stop_loss', 'target'):
+            value = position.get(key)
+            cols[key][row] = np.nan if value is None else value
+        self._set_triggers(row)
+
+    def __delitem__(self, symbol: str):
+        row = self.index.pop(symbol)
+        self.symbols[row] = None
+        self.extra[row] = None
+        self.cols['lower'][row] = -np.inf
+        self.cols['upper'][row] = np.inf
+        self._free.append(row)
+
+    def __iter__(self):
+        return iter(list(self.index))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    # ------------------------------------------------------------------
+    # Storage
+
+    def _grow(self):
+        old = len(self.symbols)
+        new = old * 2
+        for name, column in self.cols.items():
+            grown = np.zeros(new, dtype=column.dtype)
+            grown[:old] = column
+            self.cols[name] = grown
+        self.extra.extend([None] * (new - old))
+        self.symbols.extend([None] * (new - old))
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _set_triggers(self, row: int):
+        """Recompute the nearest exit levels below and above the price"""
+        cols = self.cols
+        stop, target = cols['stop_loss'][row], cols['target'][row]
+        if cols['side'][row] > 0:
+            lower, upper = stop, target
+        else:
+            lower, upper = target, stop
+        cols['lower'][row] = -np.inf if np.isnan(lower) else lower
+        cols['upper'][row] = np.inf if np.isnan(upper) else upper
+
+    def rows(self, symbols: Iterable[str]) -> np.ndarray:
+        """Row numbers for symbols (-1 when not held)"""
+        symbols = list(symbols)
+        index = self.index
+        return np.fromiter((index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def active_rows(self) -> np.ndarray:
+        return np.fromiter(self.index.values(), dtype=np.int64, count=len(self.index))
+
+    # ------------------------------------------------------------------
+    # Mark to market
+
+    def mark_rows(self, rows: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Mark rows to new prices
+
+        Args:
+            rows: Row numbers (from rows()); negative rows are skipped
+            prices: Prices aligned with rows
+
+        Returns:
+            Rows whose stop-loss or target was crossed
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        held = rows >= 0
+        if not held.all():
+            rows, prices = rows[held], prices[held]
+
+        cols = self.cols
+        entry = cols['entry_price'][rows]
+        quantity = cols['quantity'][rows]
+
+        pnl = cols['side'][rows] * (prices - entry) * quantity
+        cost = entry * quantity
+        cols['current_price'][rows] = prices
+        cols['pnl'][rows] = pnl
+        cols['pnl_percent'][rows] = np.divide(pnl * 100, cost, out=np.zeros_like(pnl), where=cost != 0)
+
+        crossed = (prices <= cols['lower'][rows]) | (prices >= cols['upper'][rows])
+        return rows[crossed]
+
+    def mark(self, prices: Dict[str, float]) -> np.ndarray:
+        """Mark a batch of {symbol: price} ticks; returns crossed rows"""
+        return self.mark_rows(self.rows(prices.keys()), np.fromiter(prices.values(), dtype=np.float64,
+                                                                   count=len(prices)))
+
+    def exit_reason(self, row: int) -> str:
+        """'STOP_LOSS' or 'TARGET' for a crossed row"""
+        cols = self.cols
+        stop = cols['stop_loss'][row]
+        if not np.isnan(stop) and cols['side'][row] * (cols['current_price'][row] - stop) <= 0:
+            return 'STOP_LOSS'
+        return 'TARGET'
+
+    def crossed(self, rows: np.ndarray) -> List[Tuple[str, float, str]]:
+        """(symbol, price, reason) for crossed rows"""
+        prices = self.cols['current_price']
+        return [(self.symbols[row], float(prices[row]), self.exit_reason(row)) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Aggregates
+
+    def total_value(self) -> float:
+        rows = self.active_rows()
+        return float(np.dot(self.cols['current_price'][rows], self.cols['quantity'][rows]))
+
+    def unrealized_pnl(self) -> float:
+        return float(self.cols['pnl'][self.active_rows()].sum())
@@ -6,9 +6,12 @@ Real-time portfolio tracking, P&L calculation, risk monitoring
 import os
 import json
 import logging
-from datetime import datetime
+import threading
+from datetime import date, datetime
 from collections import defaultdict
 from bridge.auth_manager import AngelAuthManager
+from bridge.journal import restore_times
+from bridge.position_book import PositionBook
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,30 +26,42 @@ logger = logging.getLogger(__name__)
 class PositionManager:
     """Professional position and portfolio management"""
     
-    def __init__(self, mode='PAPER'):
+    def __init__(self, mode='PAPER', journal=None, risk_gate=None):
         """
         Initialize position manager
         
         Args:
             mode: 'PAPER' or 'LIVE'
+            journal: Optional Journal for crash recovery
+            risk_gate: Optional RiskGate that owns the risk limits
         """
         self.mode = mode.upper()
+        self.journal = journal
+        self.risk_gate = risk_gate
         self.auth = AngelAuthManager()
         self.smart_api = None
         self.client_code = os.getenv('CLIENT_ID')
         
         # Portfolio tracking
-        self.positions = {}  # Active positions
-        self.closed_positions = []  # Trade history
+        self.positions = PositionBook()  # Active positions (symbol -> position view)
+        self.closed_positions = []  # Today's trade history
+        self.trading_day = date.today().isoformat()
         self.daily_pnl = 0.0
         self.total_pnl = 0.0
+        self._lock = threading.RLock()  # fills arrive on the order update thread
         
         # Risk limits
         self.max_daily_loss = float(os.getenv('MAX_DAILY_LOSS', 2.5))
         self.max_positions = int(os.getenv('MAX_POSITIONS', 2))
         
-        # Statistics
-        self.stats = {
+        # Statistics (today's trades)
+        self.stats = self._new_stats()
+        
+        logger.info(f"✅ Position Manager initialized in {self.mode} mode")
+    
+    @staticmethod
+    def _new_stats():
+        return {
             'total_trades': 0,
             'winning_trades': 0,
             'losing_trades': 0,
@@ -60,12 +75,38 @@ class PositionManager:
             'profit_factor': 0.0,
             'expectancy': 0.0
         }
+    
+    def _roll_day(self, day=None):
+        """
+        Start a new trading day when the date changes
         
-        logger.info(f"✅ Position Manager initialized in {self.mode} mode")
+        Daily P&L, statistics and trade history are reset, and intraday
+        positions are dropped - the broker squared them off. Carry-forward
+        positions (metadata product DELIVERY / CARRYFORWARD) are kept.
+        
+        Returns:
+            True if the day changed
+        """
+        day = day or date.today().isoformat()
+        if self.trading_day == day:
+            return False
+        
+        self.trading_day = day
+        self.daily_pnl = 0.0
+        self.stats = self._new_stats()
+        self.closed_positions = []
+        for symbol in list(self.positions):
+            product = (self.positions[symbol]['metadata'] or {}).get('product') or 'INTRADAY'
+            if product == 'INTRADAY':
+                del self.positions[symbol]
+        return True
     
     def connect(self):
         """Connect to Angel One API"""
         try:
+            # Restore journaled state before touching the broker
+            self.recover()
+            
             if self.mode == 'PAPER':
                 logger.info("📄 Paper mode - Simulated positions")
                 return True
@@ -97,20 +138,11 @@ class PositionManager:
             response = self.smart_api.position()
             
             if response and response.get('status'):
-                broker_positions = response.get('data', [])
+                broker_positions = response.get('data') or []
                 
                 for pos in broker_positions:
-                    if int(pos.get('netqty', 0)) != 0:
-                        symbol = pos.get('tradingsymbol')
-                        self.positions[symbol] = {
-                            'symbol': symbol,
-                            'quantity': int(pos.get('netqty')),
-                            'avg_price': float(pos.get('avgprice', 0)),
-                            'ltp': float(pos.get('ltp', 0)),
-                            'pnl': float(pos.get('pnl', 0)),
-                            'exchange': pos.get('exchange'),
-                            'product': pos.get('producttype')
-                        }
+                    if int(float(pos.get('netqty', 0) or 0)) != 0:
+                        self.apply_broker_position(pos)
                 
                 logger.info(f"✅ Synced {len(self.positions)} positions from broker")
             else:
@@ -119,6 +151,61 @@ class PositionManager:
         except Exception as e:
             logger.error(f"❌ Position sync error: {e}")
     
+    def _broker_position(self, pos):
+        """Position dict in the add_position schema from a broker position row"""
+        symbol = pos.get('tradingsymbol')
+        net_qty = int(float(pos.get('netqty', 0) or 0))
+        quantity = abs(net_qty)
+        entry_price = float(pos.get('avgprice', 0) or 0)
+        current_price = float(pos.get('ltp', 0) or 0) or entry_price
+        side = 1 if net_qty > 0 else -1
+        pnl = side * (current_price - entry_price) * quantity
+        
+        # Keep what only we know: stops, targets, entry time, strategy metadata
+        known = self.positions[symbol].to_dict() if symbol in self.positions else {}
+        return {
+            'symbol': symbol,
+            'quantity': quantity,
+            'entry_price': entry_price,
+            'current_price': current_price,
+            'order_type': 'BUY' if net_qty > 0 else 'SELL',
+            'stop_loss': known.get('stop_loss'),
+            'target': known.get('target'),
+            'entry_time': known.get('entry_time', datetime.now()),
+            'pnl': pnl,
+            'pnl_percent': pnl / (entry_price * quantity) * 100 if entry_price and quantity else 0.0,
+            'status': 'OPEN',
+            'metadata': {
+                **known.get('metadata', {}),
+                'exchange': pos.get('exchange'),
+                'product': pos.get('producttype')
+            }
+        }
+    
+    def apply_broker_position(self, pos):
+        """
+        Set a position from a broker position row (broker is the source of truth)
+        
+        Args:
+            pos: Angel One position row ('tradingsymbol', 'netqty', 'avgprice', 'ltp', ...)
+        """
+        with self._lock:
+            symbol = pos.get('tradingsymbol')
+            self.positions[symbol] = self._broker_position(pos)
+            self._journal_position(symbol)
+    
+    def close_position(self, symbol, exit_price, reason='MANUAL', filled=False):
+        """
+        Close one position at exit_price (thread-safe)
+        
+        Args:
+            filled: The exit was an executor order whose fill the risk gate
+                    has already booked
+        """
+        with self._lock:
+            if symbol in self.positions:
+                self._close_position(symbol, exit_price, reason, filled=filled)
+    
     def add_position(self, symbol, quantity, entry_price, order_type='BUY', 
                      stop_loss=None, target=None, metadata=None):
         """
@@ -155,6 +242,7 @@ class PositionManager:
             }
             
             self.positions[symbol] = position
+            self._journal_position(symbol)
             
             logger.info(
                 f"✅ POSITION ADDED\n"
@@ -180,18 +268,46 @@ class PositionManager:
                 total_qty = position['quantity'] + quantity
                 position['entry_price'] = total_value / total_qty
                 position['quantity'] = total_qty
+                self._journal_position(symbol)
                 logger.info(f"📊 Position averaged: {symbol} @ ₹{position['entry_price']:.2f}")
             else:
-                # Reducing/Closing position
-                position['quantity'] -= quantity
-                if position['quantity'] <= 0:
-                    self._close_position(symbol, price)
+                # Reducing/Closing position (close on the full quantity so P&L is right)
+                if position['quantity'] - quantity <= 0:
+                    self._close_position(symbol, price, filled=True)
                 else:
+                    position['quantity'] -= quantity
+                    self._journal_position(symbol)
                     logger.info(f"📊 Position reduced: {symbol} - Remaining qty: {position['quantity']}")
                     
         except Exception as e:
             logger.error(f"❌ Update position error: {e}")
     
+    def on_fill(self, order, fill_qty, fill_price, record=None):
+        """
+        Apply a broker fill (OrderStateMachine fill callback)
+        
+        Args:
+            order: TrackedOrder that was (partially) filled
+            fill_qty: Quantity of this fill
+            fill_price: Price of this fill
+            record: Executor OrderRecord of the order (SL, target, strategy)
+        """
+        with self._lock:
+            if order.symbol in self.positions:
+                self._update_existing_position(order.symbol, fill_qty, fill_price, order.transaction_type)
+            else:
+                metadata = {'order_id': order.order_id}
+                strategy = record.strategy if record is not None else order.tag
+                if strategy:
+                    metadata['strategy'] = strategy
+                self.add_position(
+                    order.symbol, fill_qty, fill_price,
+                    order_type=order.transaction_type,
+                    stop_loss=record.stop_loss if record is not None else None,
+                    target=record.target if record is not None else None,
+                    metadata=metadata
+                )
+    
     def update_price(self, symbol, current_price):
         """
         Update current price and calculate P&L
@@ -200,55 +316,56 @@ class PositionManager:
             symbol: Trading symbol
             current_price: Current market price
         """
-        try:
-            if symbol not in self.positions:
-                return
+        self.update_prices({symbol: current_price})
+    
+    def update_prices(self, prices):
+        """
+        Mark a batch of ticks and close positions whose SL/target was crossed
+        
+        P&L for every ticked position is computed in one vector pass; only
+        the crossed positions are handled individually.
+        
+        Args:
+            prices: Dict of symbol -> current market price
             
-            position = self.positions[symbol]
-            position['current_price'] = current_price
+        Returns:
+            List of (symbol, price, reason) for positions closed
+        """
+        try:
+            if self.risk_gate is not None:
+                self.risk_gate.update_prices(prices)
             
-            # Calculate P&L
-            if position['order_type'] == 'BUY':
-                pnl = (current_price - position['entry_price']) * position['quantity']
-            else:  # SELL
-                pnl = (position['entry_price'] - current_price) * position['quantity']
-            
-            position['pnl'] = pnl
-            position['pnl_percent'] = (pnl / (position['entry_price'] * position['quantity'])) * 100
-            
-            # Check stop loss
-            if position['stop_loss']:
-                if position['order_type'] == 'BUY' and current_price <= position['stop_loss']:
-                    logger.warning(f"🛑 STOP LOSS HIT: {symbol} @ ₹{current_price}")
-                    self._close_position(symbol, current_price, reason='STOP_LOSS')
-                    return
-                elif position['order_type'] == 'SELL' and current_price >= position['stop_loss']:
-                    logger.warning(f"🛑 STOP LOSS HIT: {symbol} @ ₹{current_price}")
-                    self._close_position(symbol, current_price, reason='STOP_LOSS')
-                    return
-            
-            # Check target
-            if position['target']:
-                if position['order_type'] == 'BUY' and current_price >= position['target']:
-                    logger.info(f"🎯 TARGET HIT: {symbol} @ ₹{current_price}")
-                    self._close_position(symbol, current_price, reason='TARGET')
-                    return
-                elif position['order_type'] == 'SELL' and current_price <= position['target']:
-                    logger.info(f"🎯 TARGET HIT: {symbol} @ ₹{current_price}")
-                    self._close_position(symbol, current_price, reason='TARGET')
-                    return
+            with self._lock:
+                crossed = self.positions.crossed(self.positions.mark(prices))
+                
+                for symbol, price, reason in crossed:
+                    if reason == 'STOP_LOSS':
+                        logger.warning(f"🛑 STOP LOSS HIT: {symbol} @ ₹{price}")
+                    else:
+                        logger.info(f"🎯 TARGET HIT: {symbol} @ ₹{price}")
+                    self._close_position(symbol, price, reason=reason)
+                
+                return crossed
             
         except Exception as e:
             logger.error(f"❌ Price update error: {e}")
+            return []
     
-    def _close_position(self, symbol, exit_price, reason='MANUAL'):
-        """Close position and move to history"""
+    def _close_position(self, symbol, exit_price, reason='MANUAL', filled=False):
+        """
+        Close position and move to history
+        
+        A local exit (SL/target, close all, broker flat) sends no order, so
+        it is booked on the risk gate here as the opposite fill; an exit
+        that was a fill (filled=True) already reached the gate through the
+        executor.
+        """
         try:
             if symbol not in self.positions:
                 logger.error(f"❌ Position {symbol} not found")
                 return
             
-            position = self.positions[symbol]
+            position = self.positions[symbol].to_dict()
             position['exit_price'] = exit_price
             position['exit_time'] = datetime.now()
             position['exit_reason'] = reason
@@ -263,6 +380,11 @@ class PositionManager:
             position['pnl'] = final_pnl
             position['pnl_percent'] = (final_pnl / (position['entry_price'] * position['quantity'])) * 100
             
+            if self.risk_gate is not None and not filled:
+                self.risk_gate.apply_fill(symbol, 'SELL' if position['order_type'] == 'BUY' else 'BUY',
+                                          position['quantity'], exit_price,
+                                          (position.get('metadata') or {}).get('strategy'))
+            
             # Update statistics
             self._update_statistics(position)
             
@@ -270,6 +392,17 @@ class PositionManager:
             self.closed_positions.append(position)
             del self.positions[symbol]
             
+            if self.journal:
+                self.journal.append('close', {
+                    'date': self.trading_day,
+                    'symbol': symbol,
+                    'position': position,
+                    'stats': dict(self.stats),
+                    'daily_pnl': self.daily_pnl,
+                    'total_pnl': self.total_pnl
+                })
+                self._maybe_snapshot()
+            
             logger.info(
                 f"{'🟢' if final_pnl > 0 else '🔴'} POSITION CLOSED\n"
                 f"   Symbol: {symbol}\n"
@@ -282,6 +415,79 @@ class PositionManager:
         except Exception as e:
             logger.error(f"❌ Close position error: {e}")
     
+    def _journal_position(self, symbol):
+        """Journal the current state of an open position"""
+        if self.journal:
+            self.journal.append('position', {'date': self.trading_day, 'symbol': symbol,
+                                             'position': self.positions[symbol].to_dict()})
+            self._maybe_snapshot()
+    
+    def _maybe_snapshot(self):
+        if self.journal.needs_snapshot():
+            self._snapshot()
+    
+    def _snapshot(self):
+        self.journal.snapshot({
+            'date': self.trading_day,
+            'positions': {symbol: self.positions[symbol].to_dict() for symbol in self.positions},
+            'closed_positions': self.closed_positions,
+            'stats': self.stats,
+            'daily_pnl': self.daily_pnl,
+            'total_pnl': self.total_pnl
+        })
+    
+    def recover(self):
+        """
+        Rebuild positions, history and P&L from the journal
+        
+        Snapshot and events carry their trading day; state from earlier
+        days is rolled over as _roll_day does, so yesterday's P&L and
+        squared-off positions do not come back.
+        
+        Returns:
+            Number of journal events replayed
+        """
+        if not self.journal:
+            return 0
+        
+        try:
+            state, events = self.journal.recover()
+            
+            with self._lock:
+                if state:
+                    self.trading_day = state.get('date')   # None: journaled before dates
+                    for symbol, position in state['positions'].items():
+                        self.positions[symbol] = restore_times(position)
+                    self.closed_positions = [restore_times(p) for p in state['closed_positions']]
+                    self.stats.update(state['stats'])
+                    self.daily_pnl = state['daily_pnl']
+                    self.total_pnl = state['total_pnl']
+                
+                for event_type, data in events:
+                    if data.get('date'):
+                        self._roll_day(data['date'])
+                    symbol = data['symbol']
+                    if event_type == 'position':
+                        self.positions[symbol] = restore_times(data['position'])
+                    elif event_type == 'close':
+                        if symbol in self.positions:
+                            del self.positions[symbol]
+                        self.closed_positions.append(restore_times(data['position']))
+                        self.stats.update(data['stats'])
+                        self.daily_pnl = data['daily_pnl']
+                        self.total_pnl = data['total_pnl']
+                
+                if self._roll_day() and self.journal:
+                    self._snapshot()
+            
+            if state or events:
+                logger.info(f"✅ Recovered {len(self.positions)} positions from journal")
+            return len(events)
+            
+        except Exception as e:
+            logger.error(f"❌ Journal recovery error: {e}")
+            return 0
+    
     def _update_statistics(self, closed_position):
         """Update trading statistics"""
         try:
@@ -334,13 +540,8 @@ class PositionManager:
     def get_portfolio_summary(self):
         """Get portfolio summary"""
         try:
-            total_value = 0
-            total_pnl = 0
-            
-            for symbol, pos in self.positions.items():
-                position_value = pos['current_price'] * pos['quantity']
-                total_value += position_value
-                total_pnl += pos['pnl']
+            total_value = self.positions.total_value()
+            total_pnl = self.positions.unrealized_pnl()
             
             summary = {
                 'total_positions': len(self.positions),
@@ -364,6 +565,16 @@ class PositionManager:
     def check_risk_limits(self):
         """Check if risk limits breached"""
         try:
+            with self._lock:
+                if self._roll_day() and self.journal:
+                    self._snapshot()
+            
+            if self.risk_gate is not None:
+                allowed, reason = self.risk_gate.check_limits()
+                if not allowed:
+                    logger.warning(f"🛑 Trading blocked - {reason}")
+                return allowed
+            
             # Check max daily loss
             if abs(self.daily_pnl) >= self.max_daily_loss:
                 logger.error(
@@ -461,6 +672,9 @@ class PositionManager:
         """Cleanup and disconnect"""
         logger.info("🔄 Disconnecting position manager...")
         
+        if self.journal:
+            self.journal.close()
+        
         if self.mode == 'LIVE':
             try:
                 self.auth.logout_all()
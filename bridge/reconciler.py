@@ -0,0 +1,359 @@
+"""
+Reconciler Module
+Periodic diff-based reconciliation of local positions, orders and fills
+against the broker's position, order and trade books
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from bridge.async_broker import AsyncBrokerClient
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INTERVAL = 5.0       # seconds between cycles
+DEFAULT_CONFIRM = 2          # cycles a mismatch must persist before it is acted on
+
+# Alert kinds
+POSITION_MISMATCH = 'POSITION_MISMATCH'
+UNKNOWN_ORDER = 'UNKNOWN_ORDER'
+MISSING_ORDER = 'MISSING_ORDER'
+FILL_MISMATCH = 'FILL_MISMATCH'
+FETCH_FAILED = 'FETCH_FAILED'
+
+
+def _num(value, cast=float):
+    try:
+        return cast(float(value or 0))
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+class BrokerReconciler:
+    """
+    Background broker reconciliation
+
+    Every cycle fetches the position, order and trade books concurrently
+    and diffs them by key against the previous snapshot and local state:
+
+    - orders (orderid): only rows whose status or filled quantity changed
+      are fed to the OrderStateMachine; orders we never placed and local
+      working orders the broker does not know are alerted
+    - trades (fillid): only new fills are added to per-order totals and
+      checked against the tracked filled quantity
+    - positions (tradingsymbol): broker net quantity vs the PositionManager;
+      differences are alerted and the broker's side applied
+
+    A mismatch must persist for confirm_cycles cycles before it is acted
+    on, so fills in flight between the two books are not flagged. Runs on
+    its own thread and event loop, never on the trading loop.
+    """
+
+    def __init__(self, client: AsyncBrokerClient, position_manager=None, executor=None,
+                 interval: float = DEFAULT_INTERVAL, confirm_cycles: int = DEFAULT_CONFIRM,
+                 on_alert: Optional[Callable[[Dict], None]] = None):
+        """
+        Initialize reconciler
+
+        Args:
+            client: Async broker client used only by the reconciler (its
+                    session lives on the reconciler thread)
+            position_manager: PositionManager to reconcile positions into
+            executor: OrderExecutor whose orders / order states to reconcile
+            interval: Seconds between cycles
+            confirm_cycles: Cycles a mismatch must persist before acting
+            on_alert: Called with every alert dict
+        """
+        self.client = client
+        self.position_manager = position_manager
+        self.executor = executor
+        self.interval = interval
+        self.confirm_cycles = confirm_cycles
+        self.on_alert = on_alert
+
+        self.alerts = deque(maxlen=500)
+        self.stats = {'cycles': 0, 'order_deltas': 0, 'new_fills': 0, 'position_fixes': 0,
+                      'alerts': 0, 'last_ms': 0.0}
+
+        self._orders: Dict[str, tuple] = {}            # orderid -> (status, filledshares)
+        self._fill_ids = set()
+        self._fills: Dict[str, List[float]] = {}       # orderid -> [qty, value]
+        self._pending: Dict[tuple, int] = {}           # (kind, key) -> cycles seen
+        self._alerted = set()                          # one-shot alerts (kind, key)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Background loop
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reconciler', daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Broker reconciler started (every {self.interval:g}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 10)
+            self._thread = None
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while not self._stop.is_set():
+                try:
+                    loop.run_until_complete(self.reconcile_once())
+                except Exception as e:
+                    logger.error(f"❌ Reconcile error: {e}")
+                self._stop.wait(self.interval)
+        finally:
+            loop.run_until_complete(self.client.close())
+            loop.close()
+
+    async def reconcile_once(self) -> Dict[str, int]:
+        """
+        Fetch the three books concurrently and apply the deltas
+
+        Returns:
+            Delta counts of this cycle
+        """
+        start = time.perf_counter()
+        positions, orders, trades = await asyncio.gather(
+            self.client.position(), self.client.order_book(), self.client.trade_book())
+
+        failed = [name for name, response in (('position', positions), ('order_book', orders),
+                                              ('trade_book', trades)) if not response.get('status')]
+        if failed:
+            # Never diff against a failed read - an empty book would look like a flat account
+            self._alert(FETCH_FAILED, ','.join(failed), detail=f"{positions.get('message') or orders.get('message')}")
+            return {}
+
+        deltas = self.apply(positions.get('data') or [], orders.get('data') or [], trades.get('data') or [])
+        self.stats['last_ms'] = (time.perf_counter() - start) * 1000
+        return deltas
+
+    # ------------------------------------------------------------------
+    # Diff
+
+    def apply(self, positions: List[Dict], orders: List[Dict], trades: List[Dict]) -> Dict[str, int]:
+        """
+        Diff one snapshot of the broker books against local state
+
+        Args:
+            positions: Position book rows
+            orders: Order book rows
+            trades: Trade book rows
+
+        Returns:
+            {'orders': n, 'fills': n, 'positions': n} deltas applied
+        """
+        self.stats['cycles'] += 1
+        deltas = {
+            'orders': self._apply_orders(orders),
+            'fills': self._apply_trades(trades),
+            'positions': self._apply_positions(positions)
+        }
+        self.stats['order_deltas'] += deltas['orders']
+        self.stats['new_fills'] += deltas['fills']
+        self.stats['position_fixes'] += deltas['positions']
+        return deltas
+
+    def _apply_orders(self, rows: List[Dict]) -> int:
+        executor = self.executor
+        changed = 0
+        seen = set()
+
+        for row in rows:
+            order_id = str(row.get('orderid') or '')
+            if not order_id:
+                continue
+            seen.add(order_id)
+
+            signature = (str(row.get('status') or '').lower(), _num(row.get('filledshares'), int))
+            if self._orders.get(order_id) == signature:
+                continue
+            self._orders[order_id] = signature
+            changed += 1
+
+            if executor is None:
+                continue
+            if order_id not in executor.orders:
+                self._alert_once(UNKNOWN_ORDER, order_id,
+                                 detail=f"{row.get('transactiontype')} {row.get('quantity')} x "
+                                        f"{row.get('tradingsymbol')} ({signature[0]})")
+            executor.order_states.apply_update(row)
+
+        # Our working orders the broker does not list
+        if executor is not None:
+            for order in executor.order_states.open_orders():
+                key = (MISSING_ORDER, order.order_id)
+                if order.order_id in seen:
+                    self._pending.pop(key, None)
+                elif self._confirm(key):
+                    self._alert_once(MISSING_ORDER, order.order_id,
+                                     detail=f"{order.transaction_type} {order.quantity} x {order.symbol} "
+                                            f"is {order.state.value} locally")
+
+        return changed
+
+    def _apply_trades(self, rows: List[Dict]) -> int:
+        touched = set()
+        for row in rows:
+            fill_id = (row.get('orderid'), row.get('fillid'))
+            if fill_id in self._fill_ids:
+                continue
+            self._fill_ids.add(fill_id)
+
+            qty = _num(row.get('fillsize'), int)
+            totals = self._fills.setdefault(str(row.get('orderid')), [0, 0.0])
+            totals[0] += qty
+            totals[1] += qty * _num(row.get('fillprice'))
+            touched.add(str(row.get('orderid')))
+
+        # Cross-check fill totals against the tracked orders
+        if self.executor is not None:
+            machine = self.executor.order_states
+            for order_id, (qty, value) in self._fills.items():
+                order = machine.get(order_id)
+                key = (FILL_MISMATCH, order_id)
+                if order is None or qty <= order.filled_qty:
+                    self._pending.pop(key, None)
+                    continue
+                if not self._confirm(key):
+                    continue
+                self._alert(FILL_MISMATCH, order_id,
+                            local=order.filled_qty, broker=qty, action='applied trade book fills')
+                machine.apply_update({
+                    'orderid': order_id,
+                    'status': 'complete' if order.quantity and qty >= order.quantity else 'open',
+                    'filledshares': qty,
+                    'averageprice': round(value / qty, 2)
+                })
+
+        return len(touched)
+
+    def _apply_positions(self, rows: List[Dict]) -> int:
+        manager = self.position_manager
+        if manager is None:
+            return 0
+
+        broker = {}
+        for row in rows:
+            net = _num(row.get('netqty'), int)
+            if net:
+                broker[row['tradingsymbol']] = (net, row)
+
+        fixes = 0
+        with manager._lock:
+            local = {}
+            for symbol in manager.positions:
+                position = manager.positions[symbol]
+                local[symbol] = position['quantity'] * (1 if position['order_type'] == 'BUY' else -1)
+
+            for symbol in set(broker) | set(local):
+                broker_net, row = broker.get(symbol, (0, None))
+                local_net = local.get(symbol, 0)
+                key = (POSITION_MISMATCH, symbol)
+
+                if broker_net == local_net:
+                    self._pending.pop(key, None)
+                    continue
+                if not self._confirm(key):
+                    continue
+
+                if broker_net == 0:
+                    price = manager.positions[symbol]['current_price']
+                    manager.close_position(symbol, price, 'BROKER_FLAT')
+                    action = f"closed locally @ ₹{price:.2f}"
+                else:
+                    manager.apply_broker_position(row)
+                    action = 'adopted broker position'
+
+                self._alert(POSITION_MISMATCH, symbol, local=local_net, broker=broker_net, action=action)
+                self._pending.pop(key, None)
+                fixes += 1
+
+        return fixes
+
+    # ------------------------------------------------------------------
+    # Alerts
+
+    def _confirm(self, key: tuple) -> bool:
+        """Count a cycle of mismatch; True once it has persisted long enough"""
+        count = self._pending.get(key, 0) + 1
+        self._pending[key] = count
+        return count >= self.confirm_cycles
+
+    def _alert_once(self, kind: str, key: str, **details):
+        if (kind, key) in self._alerted:
+            return
+        self._alerted.add((kind, key))
+        self._alert(kind, key, **details)
+
+    def _alert(self, kind: str, key: str, **details):
+        alert = {'kind': kind, 'key': key, 'time': datetime.now(), **details}
+        self.alerts.append(alert)
+        self.stats['alerts'] += 1
+
+        text = ', '.join(f"{k}={v}" for k, v in details.items())
+        logger.warning(f"⚠️  RECONCILE {kind}: {key} {text}")
+
+        if self.on_alert is not None:
+            try:
+                self.on_alert(alert)
+            except Exception as e:
+                logger.error(f"❌ Reconcile alert callback error: {e}")
+
+
+# ==============================================================================
+# TEST FUNCTION
+# ==============================================================================
+
+if __name__ == "__main__":
+    from bridge.mock_broker import MockBrokerServer
+    from bridge.order_executor import OrderExecutor
+    from bridge.position_manager import PositionManager
+
+    print("\n" + "="*60)
+    print("🧪 BROKER RECONCILER TEST (mock broker)")
+    print("="*60 + "\n")
+
+    server = MockBrokerServer()
+    server.start()
+    server.set_price('NIFTY24DEC24000CE', 120.0)
+    server.set_price('NIFTY24DEC24000PE', 95.0)
+
+    executor = OrderExecutor(mode='LIVE', broker_client=AsyncBrokerClient('demo', 'demo', root=server.url))
+    manager = PositionManager(mode='LIVE')
+    manager.add_position('NIFTY24DEC24000PE', 75, 95.0, 'BUY')     # broker never saw this
+
+    # An order placed outside this process
+    order = {'tradingsymbol': 'NIFTY24DEC24000CE', 'symboltoken': '1', 'transactiontype': 'BUY',
+             'exchange': 'NFO', 'ordertype': 'MARKET', 'quantity': '75'}
+    executor._get_broker_client()
+    executor._broker_loop.run(executor.broker_client.place_order(order))
+
+    reconciler = BrokerReconciler(AsyncBrokerClient('demo', 'demo', root=server.url),
+                                  manager, executor, interval=1.0)
+    loop = asyncio.new_event_loop()
+    for cycle in range(3):
+        print(f"📊 cycle {cycle + 1}: {loop.run_until_complete(reconciler.reconcile_once())}")
+    loop.run_until_complete(reconciler.client.close())
+
+    print(f"\n📊 Positions: { {s: manager.positions[s]['quantity'] for s in manager.positions} }")
+    print(f"⚠️  Alerts: {[(a['kind'], a['key']) for a in reconciler.alerts]}")
+    print(f"📊 Stats: {reconciler.stats}")
+
+    executor.disconnect()
+    server.stop()
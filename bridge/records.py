@@ -0,0 +1,102 @@
+"""
+Records Module
+Typed, slotted records for orders, fills and net positions
+
+Every field is declared, so a misspelt or foreign key (avg_price on an
+order, pnl_pct for pnl_percent) fails at construction instead of
+silently creating a new dict key, and each record costs a fixed slot
+layout instead of a per-object dict.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bridge.journal import restore_times
+
+
+# Order statuses as kept locally (broker statuses are lower case)
+WORKING_STATUSES = ('PENDING', 'OPEN', 'PLACED')
+DONE_STATUSES = ('COMPLETE', 'CANCELLED', 'REJECTED')
+
+
+class _Record:
+    """to_dict / from_dict over the slots of a slotted dataclass"""
+
+    __slots__ = ()
+
+    def to_dict(self) -> Dict:
+        """Plain dict (journal / JSON)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        """
+        Rebuild from to_dict() output
+
+        Raises:
+            TypeError: on keys that are not fields of the record
+        """
+        return cls(**restore_times(dict(data)))
+
+
+@dataclass(slots=True)
+class OrderRecord(_Record):
+    """One order as placed by the executor"""
+    symbol: str
+    exchange: str
+    transaction_type: str                   # 'BUY' / 'SELL'
+    quantity: int
+    order_type: str = 'MARKET'
+    price: float = 0.0
+    trigger_price: float = 0.0
+    stop_loss: Optional[float] = None
+    target: Optional[float] = None
+    strategy: Optional[str] = None
+    client_order_id: Optional[str] = None
+    order_id: Optional[str] = None
+    status: str = 'PENDING'                 # PENDING, OPEN, PLACED, COMPLETE, CANCELLED, REJECTED
+    executed_qty: int = 0
+    executed_price: float = 0.0
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in DONE_STATUSES
+
+
+@dataclass(slots=True)
+class FillRecord(_Record):
+    """One (incremental) execution of an order"""
+    order_id: str
+    symbol: str
+    transaction_type: str
+    quantity: int
+    price: float
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    @property
+    def signed_qty(self) -> int:
+        return self.quantity if self.transaction_type == 'BUY' else -self.quantity
+
+
+@dataclass(slots=True)
+class NetPosition(_Record):
+    """Net quantity per symbol (positive long, negative short)"""
+    symbol: str
+    quantity: int = 0
+    avg_price: float = 0.0
+    orders: List[str] = field(default_factory=list)
+
+    def apply(self, fill: FillRecord):
+        """
+        Book a fill: buys average the price in, sells reduce the quantity
+        """
+        if fill.transaction_type == 'BUY':
+            total_qty = self.quantity + fill.quantity
+            total_value = self.quantity * self.avg_price + fill.quantity * fill.price
+            self.avg_price = total_value / total_qty if total_qty > 0 else 0
+            self.quantity = total_qty
+        else:
+            self.quantity -= fill.quantity
+        self.orders.append(fill.order_id)
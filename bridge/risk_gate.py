@@ -0,0 +1,552 @@
+"""
+Risk Gate Module
+One pre-trade risk check for every order path, backed by incrementally
+maintained exposure, daily P&L and position counts
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Rejection codes (also the keys of stats['rejected'])
+KILL_SWITCH = 'KILL_SWITCH'
+OUTSIDE_HOURS = 'OUTSIDE_HOURS'
+DAILY_LOSS = 'DAILY_LOSS'
+DRAWDOWN = 'DRAWDOWN'
+ORDER_SIZE = 'ORDER_SIZE'
+MAX_POSITIONS = 'MAX_POSITIONS'
+MAX_EXPOSURE = 'MAX_EXPOSURE'
+STRATEGY_DISABLED = 'STRATEGY_DISABLED'
+STRATEGY_POSITIONS = 'STRATEGY_POSITIONS'
+STRATEGY_EXPOSURE = 'STRATEGY_EXPOSURE'
+STRATEGY_LOSS = 'STRATEGY_LOSS'
+NO_PRICE = 'NO_PRICE'
+
+INF = float('inf')
+
+
+class _Book:
+    """Net positions, exposure and realized P&L for one scope (account or strategy)"""
+
+    __slots__ = ('net', 'exposure', 'positions', 'realized_pnl',
+                 'max_positions', 'max_exposure', 'max_loss', 'enabled')
+
+    def __init__(self, max_positions: float = INF, max_exposure: float = INF, max_loss: float = INF):
+        self.net: Dict[str, list] = {}      # symbol -> [signed qty, avg price]
+        self.exposure = 0.0
+        self.positions = 0
+        self.realized_pnl = 0.0
+        self.max_positions = max_positions
+        self.max_exposure = max_exposure
+        self.max_loss = max_loss
+        self.enabled = True
+
+    def apply(self, symbol: str, signed_qty: int, price: float) -> float:
+        """Apply a fill; returns the P&L it realized"""
+        qty, old_avg = self.net.get(symbol, (0, 0.0))
+        avg = old_avg
+        new_qty = qty + signed_qty
+        realized = 0.0
+
+        if qty == 0 or (qty > 0) == (signed_qty > 0):
+            # Opening or adding
+            avg = (abs(qty) * avg + abs(signed_qty) * price) / abs(new_qty)
+        else:
+            # Reducing, closing or flipping
+            closed = min(abs(qty), abs(signed_qty))
+            realized = (price - avg) * closed * (1 if qty > 0 else -1)
+            if new_qty and (new_qty > 0) != (qty > 0):
+                avg = price
+
+        self.exposure += abs(new_qty) * avg - abs(qty) * old_avg
+        self.realized_pnl += realized
+
+        if new_qty == 0:
+            self.net.pop(symbol, None)
+            self.positions -= 1
+        else:
+            if qty == 0:
+                self.positions += 1
+            self.net[symbol] = [new_qty, avg]
+
+        return realized
+
+
+class RiskGate:
+    """
+    Constant-time pre-trade risk gate
+
+    State is updated from fills (on_fill / apply_fill), realized P&L
+    (record_pnl) and prices (update_prices) as it happens, so check()
+    never recomputes anything: it compares a handful of counters against
+    the limits. The daily loss and drawdown limits apply to realized plus
+    unrealized P&L, marked at the last price of each open position.
+    Orders that only reduce an existing position are always allowed, so
+    exits and the kill switch flatten can get through a tripped gate.
+
+    Order value limits need a price: an order without one (MARKET at
+    price 0, basket legs) is valued at the symbol's last price, and
+    rejected (NO_PRICE) if the gate has none.
+
+    Usage:
+        gate = RiskGate.from_env()
+        allowed, reason = gate.check('NIFTY24DEC24000CE', 'BUY', 75, 120.5, strategy='Breakout')
+    """
+
+    def __init__(self, max_daily_loss: float = INF, max_positions: float = INF,
+                 max_exposure: float = INF, max_order_value: float = INF,
+                 initial_capital: float = 0.0, max_drawdown_percent: float = INF,
+                 trading_hours: Optional[Tuple[dt_time, dt_time]] = None,
+                 halt_on_breach: bool = False):
+        """
+        Initialize risk gate
+
+        Args:
+            max_daily_loss: Block new risk once the day's loss (realized + unrealized) reaches this (₹)
+            max_positions: Max symbols with an open position
+            max_exposure: Max gross open notional (₹)
+            max_order_value: Max notional of a single order (₹)
+            initial_capital: Capital for the drawdown check (0 = off)
+            max_drawdown_percent: Max daily drawdown as % of initial capital
+            trading_hours: (start, end) times orders may open risk
+            halt_on_breach: Halt (and fire on_halt callbacks, e.g. the kill
+                            switch flatten) once the daily loss or drawdown
+                            limit is hit
+        """
+        self.max_daily_loss = max_daily_loss
+        self.max_order_value = max_order_value
+        self.initial_capital = initial_capital
+        self.max_drawdown_percent = max_drawdown_percent
+        self.trading_hours = trading_hours
+        self.halt_on_breach = halt_on_breach
+
+        self.account = _Book(max_positions, max_exposure)
+        self.strategies: Dict[str, _Book] = {}
+        self.order_tags: Dict[str, str] = {}
+
+        # Mark to market: last price per symbol, unrealized P&L of open positions
+        self.last_prices: Dict[str, float] = {}
+        self.unrealized_pnl = 0.0
+        self._unrealized: Dict[str, float] = {}
+
+        self.halted = False
+        self.halt_reason = ''
+        self._halt_callbacks = []
+        self._date = date.today()
+        self._lock = threading.Lock()
+
+        self.stats = {'checks': 0, 'allowed': 0, 'rejected': defaultdict(int),
+                      'check_ns': 0, 'max_check_ns': 0}
+
+    @classmethod
+    def from_env(cls, **overrides) -> 'RiskGate':
+        """Limits from MAX_DAILY_LOSS, MAX_POSITIONS, MAX_EXPOSURE, MAX_POSITION_SIZE, ..."""
+        def env(name, default=INF):
+            value = os.getenv(name)
+            return float(value) if value else default
+
+        params = {
+            'max_daily_loss': env('MAX_DAILY_LOSS'),
+            'max_positions': env('MAX_POSITIONS'),
+            'max_exposure': env('MAX_EXPOSURE'),
+            'max_order_value': env('MAX_POSITION_SIZE'),
+            'initial_capital': env('INITIAL_CAPITAL', 0.0),
+            'max_drawdown_percent': env('MAX_DRAWDOWN_PERCENT'),
+            'halt_on_breach': os.getenv('HALT_ON_BREACH', 'false').lower() == 'true'
+        }
+        params.update(overrides)
+        return cls(**params)
+
+    @classmethod
+    def from_risk_manager(cls, risk_manager, **overrides) -> 'RiskGate':
+        """Limits and today's realized P&L from a RiskManager"""
+        params = {
+            'max_daily_loss': risk_manager.max_daily_loss,
+            'max_order_value': risk_manager.max_position_size,
+            'initial_capital': risk_manager.initial_capital,
+            'max_drawdown_percent': risk_manager.max_drawdown_percent
+        }
+        params.update(overrides)
+        gate = cls(**params)
+        gate.account.realized_pnl = risk_manager.get_daily_summary()['pnl']
+        return gate
+
+    # ------------------------------------------------------------------
+    # Limits
+
+    def set_strategy_limits(self, strategy: str, max_positions: float = INF,
+                            max_exposure: float = INF, max_loss: float = INF):
+        """Per-strategy position count, exposure (₹) and daily loss (₹) limits"""
+        with self._lock:
+            book = self.strategies.get(strategy)
+            if book is None:
+                self.strategies[strategy] = _Book(max_positions, max_exposure, max_loss)
+            else:
+                book.max_positions, book.max_exposure, book.max_loss = max_positions, max_exposure, max_loss
+
+    def enable_strategy(self, strategy: str, enabled: bool = True):
+        with self._lock:
+            self.strategies.setdefault(strategy, _Book()).enabled = enabled
+
+    def on_halt(self, callback):
+        """Register callback(reason) to run when the gate halts"""
+        self._halt_callbacks.append(callback)
+
+    def halt(self, reason: str = 'Manual halt'):
+        """Block every order that adds risk (kill switch)"""
+        if self.halted:
+            return
+        self.halted = True
+        self.halt_reason = reason
+        logger.warning(f"🛑 Risk gate halted: {reason}")
+
+        for callback in self._halt_callbacks:
+            try:
+                callback(reason)
+            except Exception as e:
+                logger.error(f"❌ Halt callback error: {e}")
+
+    def resume(self):
+        self.halted = False
+        self.halt_reason = ''
+        logger.info("✅ Risk gate resumed")
+
+    # ------------------------------------------------------------------
+    # Checks
+
+    def check(self, symbol: str, transaction_type: str, quantity: int, price: float,
+              strategy: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Pre-trade check for one order
+
+        Args:
+            symbol: Trading symbol
+            transaction_type: 'BUY' or 'SELL'
+            quantity: Order quantity
+            price: Expected fill price (₹)
+            strategy: Strategy placing the order
+
+        Returns:
+            (allowed, reason) - reason starts with the rejection code
+        """
+        start = time.perf_counter_ns()
+        code, reason = self._evaluate(symbol, transaction_type, quantity, price, strategy)
+        return self._count(start, code, reason)
+
+    def check_basket(self, legs: List[Dict]) -> Tuple[bool, str]:
+        """
+        Pre-trade check for a basket, as one order
+
+        Each leg gets the single-order checks, then the legs' new positions
+        and notional are added up and checked against the account and
+        strategy limits together - legs that each fit alone can still
+        overrun them as a basket.
+
+        Args:
+            legs: Dicts with 'symbol', 'transaction_type', 'quantity' and
+                  optional 'price' and 'strategy'
+
+        Returns:
+            (allowed, reason) - reason starts with the rejection code
+        """
+        start = time.perf_counter_ns()
+        code, reason = self._evaluate_basket(legs)
+        return self._count(start, code, reason)
+
+    def check_limits(self, strategy: Optional[str] = None) -> Tuple[bool, str]:
+        """Account (and strategy) level check, without a specific order"""
+        start = time.perf_counter_ns()
+        code, reason = self._account_limits()
+        account = self.account
+        if code is None and account.positions >= account.max_positions:
+            code, reason = MAX_POSITIONS, f"{account.positions} open positions (limit {account.max_positions:g})"
+        if code is None and strategy is not None:
+            code, reason = self._strategy_limits(strategy, opens=True, notional=0.0)
+        return self._count(start, code, reason)
+
+    def _count(self, start: int, code: Optional[str], reason: str) -> Tuple[bool, str]:
+        elapsed = time.perf_counter_ns() - start
+        stats = self.stats
+        stats['checks'] += 1
+        stats['check_ns'] += elapsed
+        if elapsed > stats['max_check_ns']:
+            stats['max_check_ns'] = elapsed
+
+        if code is None:
+            stats['allowed'] += 1
+            return True, 'Risk checks passed'
+
+        stats['rejected'][code] += 1
+        return False, f"{code}: {reason}"
+
+    def _evaluate(self, symbol, transaction_type, quantity, price, strategy):
+        signed = quantity if transaction_type == 'BUY' else -quantity
+        net = self.account.net.get(symbol)
+
+        # Reduce-only orders never add risk
+        if net and (net[0] > 0) != (signed > 0) and quantity <= abs(net[0]):
+            return None, ''
+
+        code, reason = self._account_limits()
+        if code:
+            return code, reason
+
+        price = price or self.last_prices.get(symbol, 0.0)
+        if price <= 0 and self._values_limited(strategy):
+            return NO_PRICE, f"no price for {symbol} to value the order"
+
+        notional = quantity * price
+        if notional > self.max_order_value:
+            return ORDER_SIZE, f"order value ₹{notional:,.0f} > ₹{self.max_order_value:,.0f}"
+
+        account = self.account
+        opens = net is None
+        if opens and account.positions >= account.max_positions:
+            return MAX_POSITIONS, f"{account.positions} open positions (limit {account.max_positions:g})"
+        if account.exposure + notional > account.max_exposure:
+            return MAX_EXPOSURE, f"exposure ₹{account.exposure + notional:,.0f} > ₹{account.max_exposure:,.0f}"
+
+        if strategy is not None:
+            book = self.strategies.get(strategy)
+            opens = book is None or symbol not in book.net
+            return self._strategy_limits(strategy, opens, notional)
+
+        return None, ''
+
+    def _evaluate_basket(self, legs):
+        account = self.account
+        opens = set()
+        notional = 0.0
+        strategy_opens = defaultdict(set)
+        strategy_notional = defaultdict(float)
+
+        for i, leg in enumerate(legs):
+            symbol, quantity, strategy = leg['symbol'], int(leg['quantity']), leg.get('strategy')
+            price = leg.get('price') or 0.0
+            code, reason = self._evaluate(symbol, leg['transaction_type'], quantity, price, strategy)
+            if code:
+                return code, f"leg {i}: {reason}"
+
+            signed = quantity if leg['transaction_type'] == 'BUY' else -quantity
+            net = account.net.get(symbol)
+            if net and (net[0] > 0) != (signed > 0) and quantity <= abs(net[0]):
+                continue   # reduce-only
+
+            value = quantity * (price or self.last_prices.get(symbol, 0.0))
+            notional += value
+            if net is None:
+                opens.add(symbol)
+            if strategy is not None:
+                book = self.strategies.get(strategy)
+                strategy_notional[strategy] += value
+                if book is None or symbol not in book.net:
+                    strategy_opens[strategy].add(symbol)
+
+        if account.positions + len(opens) > account.max_positions:
+            return MAX_POSITIONS, (f"basket opens {len(opens)} with {account.positions} open "
+                                   f"(limit {account.max_positions:g})")
+        if account.exposure + notional > account.max_exposure:
+            return MAX_EXPOSURE, f"exposure ₹{account.exposure + notional:,.0f} > ₹{account.max_exposure:,.0f}"
+
+        for strategy, value in strategy_notional.items():
+            book = self.strategies.get(strategy)
+            if book is None:
+                continue
+            if book.positions + len(strategy_opens[strategy]) > book.max_positions:
+                return STRATEGY_POSITIONS, (f"{strategy} basket opens {len(strategy_opens[strategy])} "
+                                            f"with {book.positions} open (limit {book.max_positions:g})")
+            if book.exposure + value > book.max_exposure:
+                return STRATEGY_EXPOSURE, (f"{strategy} exposure ₹{book.exposure + value:,.0f} "
+                                           f"> ₹{book.max_exposure:,.0f}")
+
+        return None, ''
+
+    def _values_limited(self, strategy) -> bool:
+        """True if any order value / exposure limit applies"""
+        if self.max_order_value < INF or self.account.max_exposure < INF:
+            return True
+        book = self.strategies.get(strategy) if strategy is not None else None
+        return book is not None and book.max_exposure < INF
+
+    @property
+    def daily_pnl(self) -> float:
+        """Realized plus unrealized P&L for the day"""
+        return self.account.realized_pnl + self.unrealized_pnl
+
+    def _account_limits(self):
+        if self.halted:
+            return KILL_SWITCH, self.halt_reason
+
+        if self.trading_hours:
+            now = datetime.now().time()
+            if not self.trading_hours[0] <= now <= self.trading_hours[1]:
+                return OUTSIDE_HOURS, f"{now:%H:%M} outside {self.trading_hours[0]:%H:%M}-{self.trading_hours[1]:%H:%M}"
+
+        self._roll_day()
+        pnl = self.daily_pnl
+        if pnl <= -self.max_daily_loss:
+            return DAILY_LOSS, f"daily P&L ₹{pnl:,.2f} (limit ₹{self.max_daily_loss:,.0f})"
+        if self.initial_capital and -pnl / self.initial_capital * 100 >= self.max_drawdown_percent:
+            return DRAWDOWN, f"drawdown {-pnl / self.initial_capital * 100:.2f}% (limit {self.max_drawdown_percent:g}%)"
+
+        return None, ''
+
+    def _strategy_limits(self, strategy, opens, notional):
+        book = self.strategies.get(strategy)
+        if book is None:
+            return None, ''
+        if not book.enabled:
+            return STRATEGY_DISABLED, strategy
+        if book.realized_pnl <= -book.max_loss:
+            return STRATEGY_LOSS, f"{strategy} P&L ₹{book.realized_pnl:,.2f} (limit ₹{book.max_loss:,.0f})"
+        if opens and book.positions >= book.max_positions:
+            return STRATEGY_POSITIONS, f"{strategy} has {book.positions} positions (limit {book.max_positions:g})"
+        if book.exposure + notional > book.max_exposure:
+            return STRATEGY_EXPOSURE, f"{strategy} exposure ₹{book.exposure + notional:,.0f} > ₹{book.max_exposure:,.0f}"
+        return None, ''
+
+    def _roll_day(self):
+        """New trading day: realized P&L starts from zero"""
+        today = date.today()
+        if today != self._date:
+            self._date = today
+            self.account.realized_pnl = 0.0
+            for book in self.strategies.values():
+                book.realized_pnl = 0.0
+
+    # ------------------------------------------------------------------
+    # State updates
+
+    def tag_order(self, order_id: str, strategy: Optional[str]):
+        """Attribute an order's fills to a strategy"""
+        if strategy:
+            self.order_tags[order_id] = strategy
+
+    def apply_fill(self, symbol: str, transaction_type: str, quantity: int, price: float,
+                   strategy: Optional[str] = None) -> float:
+        """
+        Update exposure, position counts and realized P&L for a fill
+
+        Returns:
+            Realized P&L of the fill
+        """
+        signed = quantity if transaction_type == 'BUY' else -quantity
+        with self._lock:
+            self._roll_day()
+            realized = self.account.apply(symbol, signed, price)
+            if strategy is not None:
+                self.strategies.setdefault(strategy, _Book()).apply(symbol, signed, price)
+            self.last_prices[symbol] = price
+            self._mark(symbol)
+        if realized < 0:
+            self._check_breach()
+        return realized
+
+    def update_price(self, symbol: str, price: float):
+        """Mark one symbol to market"""
+        self.update_prices({symbol: price})
+
+    def update_prices(self, prices: Dict[str, float]):
+        """
+        Mark symbols to market (last price for order values, unrealized P&L)
+
+        Args:
+            prices: {symbol: last price}
+        """
+        before = self.unrealized_pnl
+        with self._lock:
+            for symbol, price in prices.items():
+                if price and price > 0:
+                    self.last_prices[symbol] = price
+                    self._mark(symbol)
+        if self.unrealized_pnl < before:
+            self._check_breach()
+
+    def _mark(self, symbol: str):
+        """Recompute one symbol's unrealized P&L (caller holds the lock)"""
+        net = self.account.net.get(symbol)
+        price = self.last_prices.get(symbol)
+        value = net[0] * (price - net[1]) if net and price else 0.0
+        old = self._unrealized.pop(symbol, 0.0)
+        if value:
+            self._unrealized[symbol] = value
+        self.unrealized_pnl += value - old
+
+    def on_fill(self, order, fill_qty: int, fill_price: float):
+        """OrderStateMachine fill callback"""
+        strategy = getattr(order, 'tag', '') or self.order_tags.get(order.order_id)
+        self.apply_fill(order.symbol, order.transaction_type, fill_qty, fill_price, strategy)
+
+    def record_pnl(self, pnl: float, strategy: Optional[str] = None):
+        """Add realized P&L booked outside the gate's fills"""
+        with self._lock:
+            self._roll_day()
+            self.account.realized_pnl += pnl
+            if strategy is not None:
+                self.strategies.setdefault(strategy, _Book()).realized_pnl += pnl
+        if pnl < 0:
+            self._check_breach()
+
+    def _check_breach(self):
+        """Halt once a loss limit is hit (halt_on_breach)"""
+        if not self.halt_on_breach or self.halted:
+            return
+        pnl = self.daily_pnl
+        if pnl <= -self.max_daily_loss:
+            self.halt(f"{DAILY_LOSS}: daily P&L ₹{pnl:,.2f} (limit ₹{self.max_daily_loss:,.0f})")
+        elif self.initial_capital and -pnl / self.initial_capital * 100 >= self.max_drawdown_percent:
+            self.halt(f"{DRAWDOWN}: drawdown {-pnl / self.initial_capital * 100:.2f}% "
+                      f"(limit {self.max_drawdown_percent:g}%)")
+
+    # ------------------------------------------------------------------
+    # Reporting
+
+    def get_stats(self) -> Dict:
+        """Check counters, rejection reasons and timing"""
+        stats = self.stats
+        checks = stats['checks']
+        return {
+            'checks': checks,
+            'allowed': stats['allowed'],
+            'rejected': dict(stats['rejected']),
+            'avg_check_us': stats['check_ns'] / checks / 1000 if checks else 0.0,
+            'max_check_us': stats['max_check_ns'] / 1000,
+            'daily_pnl': self.daily_pnl,
+            'realized_pnl': self.account.realized_pnl,
+            'unrealized_pnl': self.unrealized_pnl,
+            'exposure': self.account.exposure,
+            'open_positions': self.account.positions,
+            'halted': self.halted
+        }
+
+
+# ==============================================================================
+# TEST FUNCTION
+# ==============================================================================
+
+if __name__ == "__main__":
+    print("\n" + "="*60)
+    print("🧪 RISK GATE TEST")
+    print("="*60 + "\n")
+
+    gate = RiskGate(max_daily_loss=5000, max_positions=2, max_exposure=50000, max_order_value=30000)
+    gate.set_strategy_limits('Breakout', max_positions=1)
+
+    print(gate.check('NIFTY24DEC24000CE', 'BUY', 75, 120.0, 'Breakout'))
+    gate.apply_fill('NIFTY24DEC24000CE', 'BUY', 75, 120.0, 'Breakout')
+    print(gate.check('NIFTY24DEC24100CE', 'BUY', 75, 100.0, 'Breakout'))
+    print(gate.check('BANKNIFTY24DEC52000PE', 'BUY', 300, 150.0))
+    gate.apply_fill('NIFTY24DEC24000CE', 'SELL', 75, 50.0, 'Breakout')
+    gate.record_pnl(-200)
+    print(gate.check('NIFTY24DEC24000CE', 'BUY', 75, 120.0))
+
+    for _ in range(10000):
+        gate.check('NIFTY24DEC24000CE', 'BUY', 75, 120.0, 'Breakout')
+    print(f"\n📊 {gate.get_stats()}")
@@ -5,15 +5,23 @@ Handles position sizing, stop loss, daily limits, and drawdown protection
 
 import os
 import json
-from datetime import datetime, timedelta
+import threading
+from datetime import date, datetime, timedelta
 from typing import Dict, Optional, Tuple
 from pathlib import Path
 
+from bridge.journal import Journal
+
 
 class RiskManager:
     """Advanced risk management for trading"""
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, journal: Optional[Journal] = None):
+        """
+        Args:
+            config_path: Path to the .env settings file
+            journal: Risk event log (default: data/journal/risk.log)
+        """
         self.config_path = config_path or os.path.join(os.path.dirname(__file__), '..', '.env')
         self.settings = self._load_settings()
         
@@ -23,9 +31,16 @@ class RiskManager:
         self.default_stop_loss_percent = float(self.settings.get('DEFAULT_STOP_LOSS_PERCENT', 1))
         self.max_drawdown_percent = float(self.settings.get('MAX_DRAWDOWN_PERCENT', 10))
         
-        # Track daily P&L
-        self.daily_pnl_file = Path(__file__).parent.parent / 'data' / 'daily_pnl.json'
-        self._init_daily_pnl()
+        self.initial_capital = float(self.settings.get('INITIAL_CAPITAL', 100000))
+        
+        # Daily P&L lives in memory; trades go to an append-only log that a
+        # background writer flushes, so checks never touch the disk
+        data_dir = Path(__file__).parent.parent / 'data'
+        self.daily_pnl_file = data_dir / 'daily_pnl.json'   # pre-journal format, migrated once
+        self.journal = journal or Journal('risk', str(data_dir / 'journal'), snapshot_every=1000)
+        self._lock = threading.Lock()
+        self._state = self._new_day()
+        self._recover()
     
     def _load_settings(self) -> Dict:
         """Load settings from .env file"""
@@ -39,44 +54,68 @@ class RiskManager:
                         settings[key] = value
         return settings
     
-    def _init_daily_pnl(self):
-        """Initialize daily P&L tracking"""
-        if not self.daily_pnl_file.exists():
-            self.daily_pnl_file.parent.mkdir(parents=True, exist_ok=True)
-            self._save_daily_pnl({'date': datetime.now().strftime('%Y-%m-%d'), 'pnl': 0, 'trades': []})
+    @staticmethod
+    def _new_day(day: Optional[str] = None) -> Dict:
+        return {'date': day or date.today().isoformat(), 'pnl': 0,
+                'total_trades': 0, 'winning_trades': 0, 'losing_trades': 0}
+    
+    def _roll_day(self):
+        """Reset the counters when the date changes"""
+        today = date.today().isoformat()
+        if self._state['date'] != today:
+            self._state = self._new_day(today)
+    
+    def _apply_trade(self, pnl: float):
+        state = self._state
+        state['pnl'] += pnl
+        state['total_trades'] += 1
+        if pnl > 0:
+            state['winning_trades'] += 1
+        elif pnl < 0:
+            state['losing_trades'] += 1
+    
+    def _recover(self):
+        """Rebuild today's state from the last snapshot and the trade log"""
+        snapshot, events = self.journal.recover()
+        today = self._state['date']
+        
+        if snapshot and snapshot.get('date') == today:
+            self._state.update(snapshot)
+        elif snapshot is None and not events:
+            self._migrate_daily_pnl_file()
+        
+        for event_type, trade in events:
+            if event_type == 'trade' and trade.get('date') == today:
+                self._apply_trade(trade.get('pnl', 0))
     
-    def _load_daily_pnl(self) -> Dict:
-        """Load today's P&L"""
+    def _migrate_daily_pnl_file(self):
+        """Carry today's P&L over from the old daily_pnl.json"""
         try:
             with open(self.daily_pnl_file) as f:
                 data = json.load(f)
-            today = datetime.now().strftime('%Y-%m-%d')
-            if data.get('date') != today:
-                # New day, reset
-                return {'date': today, 'pnl': 0, 'trades': []}
-            return data
-        except:
-            return {'date': datetime.now().strftime('%Y-%m-%d'), 'pnl': 0, 'trades': []}
-    
-    def _save_daily_pnl(self, data: Dict):
-        """Save daily P&L"""
-        with open(self.daily_pnl_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        except (OSError, ValueError):
+            return
+        
+        if data.get('date') == self._state['date']:
+            for trade in data.get('trades', []):
+                self._apply_trade(trade.get('pnl', 0))
+            self._state['pnl'] = data.get('pnl', self._state['pnl'])
+            self.journal.snapshot(dict(self._state))
     
     def check_risk_limits(self) -> Tuple[bool, str]:
         """
         Check if trading is allowed based on risk limits
         Returns: (can_trade: bool, reason: str)
         """
-        daily_data = self._load_daily_pnl()
-        current_pnl = daily_data.get('pnl', 0)
+        self._roll_day()
+        current_pnl = self._state['pnl']
         
         # Check daily loss limit
         if current_pnl <= -self.max_daily_loss:
             return False, f"Daily loss limit reached: {current_pnl}/{self.max_daily_loss}"
         
         # Check drawdown
-        initial_capital = float(self.settings.get('INITIAL_CAPITAL', 100000))
+        initial_capital = self.initial_capital
         current_capital = initial_capital + current_pnl
         drawdown = (initial_capital - current_capital) / initial_capital * 100
         
@@ -139,8 +178,6 @@ class RiskManager:
     def record_trade(self, symbol: str, action: str, quantity: int, 
                     entry_price: float, exit_price: float = None):
         """Record a trade for P&L tracking"""
-        daily_data = self._load_daily_pnl()
-        
         pnl = 0
         if exit_price:
             if action.upper() == 'BUY':
@@ -148,29 +185,42 @@ class RiskManager:
             else:
                 pnl = (entry_price - exit_price) * quantity
         
-        daily_data['pnl'] = daily_data.get('pnl', 0) + pnl
-        daily_data['trades'].append({
-            'symbol': symbol,
-            'action': action,
-            'quantity': quantity,
-            'entry': entry_price,
-            'exit': exit_price,
-            'pnl': pnl,
-            'time': datetime.now().isoformat()
-        })
-        
-        self._save_daily_pnl(daily_data)
+        with self._lock:
+            self._roll_day()
+            self._apply_trade(pnl)
+            
+            self.journal.append('trade', {
+                'date': self._state['date'],
+                'symbol': symbol,
+                'action': action,
+                'quantity': quantity,
+                'entry': entry_price,
+                'exit': exit_price,
+                'pnl': pnl,
+                'time': datetime.now().isoformat()
+            })
+            if self.journal.needs_snapshot():
+                self.journal.snapshot(dict(self._state))
+    
+    def flush(self):
+        """Wait until recorded trades are on disk"""
+        self.journal.flush()
+    
+    def close(self):
+        """Flush and stop the background writer"""
+        self.journal.close()
     
     def get_daily_summary(self) -> Dict:
         """Get today's trading summary"""
-        daily_data = self._load_daily_pnl()
+        self._roll_day()
+        state = self._state
         return {
-            'date': daily_data.get('date'),
-            'pnl': daily_data.get('pnl', 0),
-            'total_trades': len(daily_data.get('trades', [])),
-            'winning_trades': len([t for t in daily_data.get('trades', []) if t.get('pnl', 0) > 0]),
-            'losing_trades': len([t for t in daily_data.get('trades', []) if t.get('pnl', 0) < 0]),
-            'remaining_loss_limit': self.max_daily_loss + daily_data.get('pnl', 0)
+            'date': state['date'],
+            'pnl': state['pnl'],
+            'total_trades': state['total_trades'],
+            'winning_trades': state['winning_trades'],
+            'losing_trades': state['losing_trades'],
+            'remaining_loss_limit': self.max_daily_loss + state['pnl']
         }
 
 
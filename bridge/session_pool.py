@@ -0,0 +1,233 @@
+"""
+Session Pool Module
+Disk-backed pool of Angel One sessions (JWT / refresh / feed tokens) shared
+by every component and process, renewed with the refresh token before expiry
+"""
+
+import base64
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Used when a JWT carries no readable exp claim
+DEFAULT_SESSION_TTL = 6 * 3600
+
+# Renew this many seconds before the JWT expires
+RENEW_MARGIN = 600
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """
+    Read the exp claim of a JWT (no signature check)
+
+    Args:
+        token: JWT, with or without the 'Bearer ' prefix
+
+    Returns:
+        Expiry as a Unix timestamp, or None if unreadable
+    """
+    try:
+        if token.startswith('Bearer '):
+            token = token[len('Bearer '):]
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
+
+def make_session(auth_token: str, refresh_token: str, feed_token: str) -> Dict:
+    """
+    Build a pooled session record
+
+    Args:
+        auth_token: JWT as returned by generateSession ('Bearer ...')
+        refresh_token: Refresh token
+        feed_token: Feed token
+
+    Returns:
+        Session dict with an 'expires_at' timestamp
+    """
+    now = time.time()
+    return {
+        'auth_token': auth_token,
+        'refresh_token': refresh_token,
+        'feed_token': feed_token,
+        'expires_at': jwt_expiry(auth_token) or now + DEFAULT_SESSION_TTL,
+        'created': datetime.now().isoformat()
+    }
+
+
+class SessionPool:
+    """
+    Broker sessions keyed by '<client_id>:<api_type>'
+
+    Sessions live in memory and in a 0600 JSON file, so other components in
+    this process and later restarts reuse them instead of logging in again.
+    Logins and renewals are serialized by a thread lock plus an flock on a
+    side file, so concurrent starters never log in twice.
+    """
+
+    def __init__(self, path: Path, renew_margin: float = RENEW_MARGIN):
+        """
+        Initialize the pool
+
+        Args:
+            path: Session cache file
+            renew_margin: Seconds before expiry at which sessions are renewed
+        """
+        self.path = Path(path)
+        self.lock_file = self.path.with_suffix(self.path.suffix + '.lock')
+        self.renew_margin = renew_margin
+
+        self.sessions: Dict[str, Dict] = {}
+        self.connections: Dict[str, tuple] = {}  # key -> (auth_token, connection)
+        self._lock = threading.RLock()
+
+    def _is_fresh(self, session: Optional[Dict]) -> bool:
+        """Session usable without renewal"""
+        return bool(session) and session.get('expires_at', 0) - self.renew_margin > time.time()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive cross-process lock around logins and cache writes"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self) -> Dict[str, Dict]:
+        """Sessions on disk"""
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('sessions', {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Failed to read session cache: {e}")
+            return {}
+
+    def _write(self):
+        """Write the sessions to disk (owner read/write only)"""
+        tmp_file = self.path.with_suffix(self.path.suffix + '.tmp')
+        try:
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                os.fchmod(f.fileno(), 0o600)
+                json.dump({'sessions': self.sessions}, f)
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            logger.error(f"❌ Failed to write session cache: {e}")
+
+    def acquire(self, key: str, login: Callable[[], Optional[Dict]],
+                renew: Optional[Callable[[Dict], Optional[Dict]]] = None,
+                force: bool = False) -> Optional[Dict]:
+        """
+        Fresh session for a key, renewing or logging in only when needed
+
+        Args:
+            key: Pool key ('<client_id>:<api_type>')
+            login: Full login - returns a session dict or None
+            renew: Refresh-token renewal - takes the old session, returns a
+                   new one or None
+            force: Skip the cached session and log in again
+
+        Returns:
+            Session dict or None if login failed
+        """
+        with self._lock:
+            if not force:
+                session = self.sessions.get(key)
+                if self._is_fresh(session):
+                    return session
+
+            with self._file_lock():
+                # Another process may have logged in while we waited
+                self.sessions.update(self._read())
+                session = self.sessions.get(key)
+
+                if not force and self._is_fresh(session):
+                    logger.info(f"♻️  Reusing pooled session for {key}")
+                    return session
+
+                fresh = None
+                if not force and session and renew and session.get('refresh_token'):
+                    logger.info(f"🔄 Renewing session for {key}")
+                    fresh = renew(session)
+
+                if not fresh:
+                    fresh = login()
+
+                if not fresh:
+                    return None
+
+                self.sessions[key] = fresh
+                self._write()
+                return fresh
+
+    def remove(self, key: str):
+        """Drop a session (after terminating it at the broker)"""
+        with self._lock, self._file_lock():
+            self.sessions.update(self._read())
+            self.sessions.pop(key, None)
+            self.connections.pop(key, None)
+            self._write()
+
+    def get_connection(self, key: str, session: Dict,
+                       factory: Callable[[Dict], object]):
+        """
+        Connection object for a session, shared inside this process
+
+        Args:
+            key: Pool key
+            session: Session the connection must belong to
+            factory: Builds a connection from a session
+
+        Returns:
+            Cached connection, rebuilt whenever the session token changes
+        """
+        with self._lock:
+            cached = self.connections.get(key)
+            if cached and cached[0] == session['auth_token']:
+                return cached[1]
+
+            connection = factory(session)
+            self.connections[key] = (session['auth_token'], connection)
+            return connection
+
+    def set_connection(self, key: str, session: Dict, connection):
+        """Register a connection created during login / renewal"""
+        with self._lock:
+            self.connections[key] = (session['auth_token'], connection)
+
+
+_pools: Dict[str, SessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(path: Path) -> SessionPool:
+    """
+    Process-wide pool for a cache file
+
+    Every AngelAuthManager pointing at the same file shares one pool, so
+    OrderExecutor, PositionManager and MarketFeedListener reuse a session.
+    """
+    key = str(Path(path).resolve())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SessionPool(path)
+        return _pools[key]
@@ -0,0 +1,329 @@
+"""
+Shared Token Map Module
+Single-copy, read-only token index in an mmap'd file shared by every process
+on the host, with atomic swap on refresh
+"""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from bridge.option_chain import OptionChainIndex, ChainSlice, parse_expiry
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b'DVLTOKM1'
+ALIGN = 64
+
+# Record fields published from tokens_data['tokens'] (strings are sized to fit)
+STRING_FIELDS = ('token', 'symbol', 'name', 'exchange', 'instrument', 'expiry', 'underlying', 'option_type')
+NUMERIC_FIELDS = (('strike', '<f8'), ('lotsize', '<i4'), ('tick_size', '<f8'))
+
+
+def _encode(value) -> bytes:
+    return str(value if value is not None else '').encode('utf-8')
+
+
+def _decode(value: bytes) -> str:
+    return value.decode('utf-8')
+
+
+def _string_dtype(values: List[bytes]) -> str:
+    return f"S{max([len(v) for v in values] + [1])}"
+
+
+def _dtype_from_descr(descr: List) -> np.dtype:
+    """Rebuild a dtype from its JSON round-tripped descr"""
+    if len(descr) == 1 and not descr[0][0]:
+        return np.dtype(descr[0][1])
+    return np.dtype([tuple(field) for field in descr])
+
+
+def _build_arrays(tokens_data: Dict):
+    """
+    Lay the token index out as flat arrays
+
+    Option contracts come first, grouped by (underlying, expiry, option type)
+    and sorted by strike, so every chain slice is a contiguous row range.
+
+    Returns:
+        (arrays, chains) - arrays by name, chains as [underlying, expiry, type, lo, hi]
+    """
+    infos = list(tokens_data.get('tokens', {}).values())
+
+    def chain_order(info):
+        if 'underlying' not in info:
+            return (1, '', 0, '', 0.0)
+        expiry_date = parse_expiry(info.get('expiry', ''))
+        return (
+            0, info['underlying'],
+            expiry_date.toordinal() if expiry_date else 0,
+            info['option_type'], float(info.get('strike', 0) or 0)
+        )
+
+    infos.sort(key=chain_order)
+
+    encoded = {name: [_encode(info.get(name)) for info in infos] for name in STRING_FIELDS}
+    dtype = [(name, _string_dtype(encoded[name])) for name in STRING_FIELDS]
+    dtype += list(NUMERIC_FIELDS)
+
+    records = np.zeros(len(infos), dtype=dtype)
+    for name in STRING_FIELDS:
+        records[name] = encoded[name]
+    for name, _ in NUMERIC_FIELDS:
+        records[name] = [info.get(name) or 0 for info in infos]
+
+    # Contiguous chain slices (only strikes > 0 are part of a chain)
+    chains = []
+    lo = current = None
+    for row, info in enumerate(infos + [{}]):
+        key = (info.get('underlying'), info.get('expiry'), info.get('option_type')) \
+            if info.get('underlying') and (info.get('strike') or 0) > 0 else None
+        if lo is not None and key != current:
+            chains.append([current[0], current[1], current[2], lo, row])
+            lo = None
+        if key is not None and lo is None:
+            lo, current = row, key
+
+    symbols = tokens_data.get('symbols', {})
+    row_of_token = {_encode(info.get('token')): row for row, info in enumerate(infos)}
+
+    sym_pairs = sorted(
+        (_encode(symbol), row_of_token[_encode(token)])
+        for symbol, token in symbols.items()
+        if _encode(token) in row_of_token
+    )
+    sym_keys = np.array([p[0] for p in sym_pairs], dtype=_string_dtype([p[0] for p in sym_pairs]))
+    sym_rows = np.array([p[1] for p in sym_pairs], dtype='<i4')
+
+    tok_order = np.argsort(records['token'], kind='stable').astype('<i4')
+
+    arrays = {
+        'records': records,
+        # Contiguous copy of the strike column so chain bisects need no gather
+        'strikes': np.ascontiguousarray(records['strike']),
+        'sym_keys': sym_keys,
+        'sym_rows': sym_rows,
+        'tok_keys': records['token'][tok_order],
+        'tok_rows': tok_order
+    }
+
+    return arrays, chains
+
+
+def publish_token_map(tokens_data: Dict, path: Path) -> int:
+    """
+    Write the token index to a shared map file
+
+    The file is written next to the target and renamed into place, so
+    attached readers keep their old mapping until they re-attach.
+
+    Args:
+        tokens_data: TokenMapper.tokens_data
+        path: Shared map file path
+
+    Returns:
+        Generation number of the published map
+    """
+    path = Path(path)
+    arrays, chains = _build_arrays(tokens_data)
+    generation = time.time_ns()
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {
+            'dtype': array.dtype.descr,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({
+        'generation': generation,
+        'created': datetime.now().isoformat(),
+        'last_updated': tokens_data.get('last_updated'),
+        'arrays': layout,
+        'chains': chains,
+        'expiries': tokens_data.get('expiries', {})
+    }).encode('utf-8')
+
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    lock_file = path.with_suffix(path.suffix + '.lock')
+    tmp_file = path.with_suffix(path.suffix + '.tmp')
+
+    with open(lock_file, 'w') as lock:
+        # Serialize publishers; readers never take the lock
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(MAGIC)
+                f.write(struct.pack('<Q', len(header)))
+                f.write(header)
+                for name, array in arrays.items():
+                    f.seek(data_start + layout[name]['offset'])
+                    f.write(np.ascontiguousarray(array).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_file, 0o644)
+            os.replace(tmp_file, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    logger.info(f"📤 Published shared token map ({len(arrays['records'])} contracts) to {path}")
+
+    return generation
+
+
+class SharedTokenMap:
+    """
+    Read-only view of a published token map
+
+    Every array is an np.memmap over the same file, so the pages are shared
+    by all attached processes. A refresh replaces the file; readers notice
+    the new inode and re-attach on their next lookup.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        """
+        Attach to a shared map file
+
+        Args:
+            path: Shared map file path
+            check_interval: Seconds between checks for a newer map
+        """
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self._attach()
+
+    def _attach(self):
+        """Map the current file"""
+        # Map every array through the same open file, so a concurrent swap
+        # can never mix two generations
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a shared token map")
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len))
+
+            data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+
+            arrays = {}
+            for name, spec in header['arrays'].items():
+                dtype = _dtype_from_descr(spec['dtype'])
+                shape = tuple(spec['shape'])
+                if shape[0] == 0:
+                    arrays[name] = np.zeros(shape, dtype=dtype)
+                    continue
+                arrays[name] = np.memmap(
+                    f, dtype=dtype, mode='r',
+                    offset=data_start + spec['offset'], shape=shape
+                )
+
+        self.header = header
+        self.generation = header['generation']
+        self.records = arrays['records']
+        self.strikes = arrays['strikes']
+        self.sym_keys = arrays['sym_keys']
+        self.sym_rows = arrays['sym_rows']
+        self.tok_keys = arrays['tok_keys']
+        self.tok_rows = arrays['tok_rows']
+        self._identity = (stat.st_ino, stat.st_mtime_ns)
+
+        logger.info(f"📎 Attached shared token map generation {self.generation} ({len(self.records)} contracts)")
+
+    def refresh_if_stale(self, force: bool = False) -> bool:
+        """
+        Re-attach if a newer map was published
+
+        Args:
+            force: Skip the check interval
+
+        Returns:
+            bool: True if the map was swapped
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+
+        if (stat.st_ino, stat.st_mtime_ns) == self._identity:
+            return False
+
+        self._attach()
+        return True
+
+    def __len__(self):
+        return len(self.records)
+
+    @staticmethod
+    def _find(keys: np.ndarray, rows: np.ndarray, key: str) -> Optional[int]:
+        """Row for a key in a sorted key array"""
+        needle = _encode(key)
+        idx = int(np.searchsorted(keys, needle))
+        if idx < len(keys) and keys[idx] == needle:
+            return int(rows[idx])
+        return None
+
+    def row_of_token(self, token: str) -> Optional[int]:
+        return self._find(self.tok_keys, self.tok_rows, str(token))
+
+    def row_of_symbol(self, symbol: str) -> Optional[int]:
+        return self._find(self.sym_keys, self.sym_rows, symbol)
+
+    def get_token(self, symbol: str) -> Optional[str]:
+        row = self.row_of_symbol(symbol)
+        return _decode(self.records['token'][row]) if row is not None else None
+
+    def get_symbol_info(self, token: str) -> Optional[Dict]:
+        row = self.row_of_token(token)
+        if row is None:
+            return None
+
+        record = self.records[row]
+        info = {name: _decode(record[name]) for name in STRING_FIELDS}
+        for name, _ in NUMERIC_FIELDS:
+            if name in record.dtype.names:
+                info[name] = record[name].item()
+        return info
+
+    def symbols(self) -> Iterator[str]:
+        """All trading symbols"""
+        return (_decode(key) for key in self.sym_keys)
+
+    def chain_index(self) -> OptionChainIndex:
+        """Option chain index whose slices are views into the shared map"""
+        index = OptionChainIndex()
+
+        strikes = self.strikes
+        tokens = self.records['token']
+        symbols = self.records['symbol']
+
+        for underlying, expiry, option_type, lo, hi in self.header['chains']:
+            index.slices[(underlying, expiry, option_type)] = ChainSlice(
+                strikes=strikes[lo:hi],
+                tokens=tokens[lo:hi],
+                symbols=symbols[lo:hi]
+            )
+
+        for underlying, expiries in self.header['expiries'].items():
+            index.set_expiries(underlying, expiries)
+
+        return index
@@ -0,0 +1,236 @@
+"""
+Symbol Search Index Module
+Prefix, substring and fuzzy symbol search over the master contract list
+"""
+
+import bisect
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Rank classes - lower sorts first
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+RANK_FUZZY = 3
+
+
+class SymbolSearchIndex:
+    """
+    Prebuilt search index over trading symbols
+
+    The prefix "trie" is a sorted key array searched with bisect (same
+    lookups as a trie, one string per symbol instead of one dict per
+    character); substring and fuzzy matches go through an n-gram
+    inverted index of sorted NumPy id arrays.
+    """
+
+    def __init__(self, symbols: Iterable[str], ngram: int = 3):
+        """
+        Build the index
+
+        Args:
+            symbols: Trading symbols to index
+            ngram: N-gram length for the inverted index
+        """
+        self.ngram = ngram
+
+        pairs = sorted((s.upper(), s) for s in set(symbols) if s)
+        self.keys: List[str] = [p[0] for p in pairs]
+        self.symbols: List[str] = [p[1] for p in pairs]
+        self.lengths = np.fromiter((len(k) for k in self.keys), dtype=np.int32, count=len(self.keys))
+
+        # Position of each id in (length, alphabetical) order - "shortest first"
+        self.length_rank = np.empty(len(self.keys), dtype=np.int32)
+        self.length_rank[np.argsort(self.lengths, kind='stable')] = np.arange(len(self.keys), dtype=np.int32)
+
+        postings = defaultdict(list)
+        for sid, key in enumerate(self.keys):
+            for gram in self._grams(key):
+                postings[gram].append(sid)
+
+        # Ids are appended in increasing order, so every posting list is sorted
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+        logger.info(f"🔎 Symbol search index built: {len(self.keys)} symbols, {len(self.postings)} n-grams")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _grams(self, text: str) -> set:
+        """Distinct n-grams of a string"""
+        n = self.ngram
+        if len(text) < n:
+            return set()
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def _shortest(self, ids: np.ndarray, limit: int) -> np.ndarray:
+        """Up to limit ids, shortest symbol first (alphabetical within a length)"""
+        if len(ids) > limit:
+            ids = ids[np.argpartition(self.length_rank[ids], limit - 1)[:limit]]
+        return ids[np.argsort(self.length_rank[ids])]
+
+    def prefix(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Ids of symbols starting with query, shortest first
+
+        Args:
+            query: Upper-cased prefix
+            limit: Maximum results
+        """
+        lo = bisect.bisect_left(self.keys, query)
+        hi = bisect.bisect_left(self.keys, query + '\uffff')
+        if lo >= hi:
+            return []
+
+        return self._shortest(np.arange(lo, hi, dtype=np.int32), limit).tolist()
+
+    def substring(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Ids of symbols containing query, shortest first
+
+        Args:
+            query: Upper-cased search text
+            limit: Maximum results
+        """
+        grams = self._grams(query)
+
+        if not grams:
+            # Too short for the n-gram index - prefix hits, then an early-exit scan
+            found = self.prefix(query, limit)
+            seen = set(found)
+            for sid, key in enumerate(self.keys):
+                if len(found) >= limit:
+                    break
+                if sid not in seen and query in key:
+                    found.append(sid)
+            return found
+
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return []
+            lists.append(ids)
+
+        # Intersect smallest posting lists first
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+
+        # N-gram hits are necessary but not sufficient - verify adjacency,
+        # widening the shortest-first window only if too many are rejected
+        window = limit * 4
+        while True:
+            ordered = self._shortest(candidates, window)
+            matches = [sid for sid in ordered.tolist() if query in self.keys[sid]]
+            if len(matches) >= limit or len(ordered) == len(candidates):
+                return matches[:limit]
+            window *= 4
+
+    def fuzzy(self, query: str, limit: int = 10,
+              min_score: float = 0.3) -> List[Tuple[int, float]]:
+        """
+        Ids of symbols sharing the most n-grams with query
+
+        Args:
+            query: Upper-cased search text
+            limit: Maximum results
+            min_score: Minimum share of query n-grams matched
+
+        Returns:
+            List of (id, score) sorted by score descending
+        """
+        grams = [g for g in self._grams(query) if g in self.postings]
+        if not grams:
+            return []
+
+        shared = np.bincount(
+            np.concatenate([self.postings[g] for g in grams]),
+            minlength=len(self.keys)
+        )
+        candidates = np.nonzero(shared)[0]
+
+        # Share of the query's n-grams found in the symbol
+        scores = shared[candidates] / len(self._grams(query))
+
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) == 0:
+            return []
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+
+        order = np.lexsort((self.length_rank[candidates], -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def search(self, query: str, limit: int = 10, mode: str = 'auto') -> List[Tuple[str, int, float]]:
+        """
+        Ranked symbol search
+
+        Args:
+            query: Search text (case-insensitive)
+            limit: Maximum results
+            mode: 'prefix', 'substring', 'fuzzy' or 'auto' (exact, prefix
+                  and substring hits topped up with fuzzy matches)
+
+        Returns:
+            List of (symbol, rank_class, score) - best match first
+        """
+        query = query.strip().upper()
+        if not query or limit <= 0:
+            return []
+
+        if mode == 'prefix':
+            return [(self.symbols[i], self._rank(i, query), 1.0) for i in self.prefix(query, limit)]
+
+        if mode == 'fuzzy':
+            return [(self.symbols[i], RANK_FUZZY, score) for i, score in self.fuzzy(query, limit)]
+
+        results = []
+        seen = set()
+
+        # Prefix hits rank ahead of every other substring hit, so a full page
+        # of them makes the n-gram lookup unnecessary
+        hits = self.prefix(query, limit)
+        if len(hits) < limit:
+            hits += self.substring(query, limit)
+
+        for sid in hits:
+            if sid not in seen:
+                seen.add(sid)
+                results.append((self.symbols[sid], self._rank(sid, query), 1.0))
+
+        results.sort(key=lambda r: (r[1], len(r[0]), r[0]))
+        results = results[:limit]
+
+        if mode == 'auto' and len(results) < limit:
+            for sid, score in self.fuzzy(query, limit):
+                if sid not in seen:
+                    seen.add(sid)
+                    results.append((self.symbols[sid], RANK_FUZZY, score))
+                    if len(results) >= limit:
+                        break
+
+        return results
+
+    def _rank(self, sid: int, query: str) -> int:
+        """Rank class of a symbol that contains query"""
+        key = self.keys[sid]
+        if key == query:
+            return RANK_EXACT
+        if key.startswith(query):
+            return RANK_PREFIX
+        return RANK_SUBSTRING
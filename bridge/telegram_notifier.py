@@ -6,8 +6,9 @@ Production-ready version with clean error handling
 
 import os
 import logging
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 from dotenv import load_dotenv
 import asyncio
 import warnings
@@ -310,6 +311,82 @@ Status: <b>{status.upper()}</b>
         
         return self.send_message(message)
     
+    def start_command_listener(self, handlers: Dict[str, Callable[[str, str], str]]) -> bool:
+        """
+        Listen for bot commands (e.g. /kill) from the configured chat
+        
+        Runs a long-polling thread; each handler gets (command, arguments)
+        and returns the reply text. Messages from other chats and commands
+        sent before the listener started are ignored.
+        
+        Args:
+            handlers: {'/command': handler}
+            
+        Returns:
+            bool: True if the listener started
+        """
+        if not self.enabled or not self.bot:
+            return False
+        if getattr(self, '_listener', None) is not None:
+            return True
+        
+        self._stop_listener = threading.Event()
+        self._listener = threading.Thread(target=self._run_command_listener, args=(handlers,),
+                                          name='telegram-commands', daemon=True)
+        self._listener.start()
+        logger.info(f"✅ Telegram commands: {', '.join(handlers)}")
+        return True
+    
+    def stop_command_listener(self):
+        """Stop the command listener (after its current poll)"""
+        if getattr(self, '_listener', None) is not None:
+            self._stop_listener.set()
+            self._listener = None
+    
+    def _run_command_listener(self, handlers):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        bot = Bot(token=self.bot_token)   # own client, bound to this thread's loop
+        started = datetime.now().timestamp()
+        offset = None
+        
+        try:
+            while not self._stop_listener.is_set():
+                try:
+                    updates = loop.run_until_complete(
+                        bot.get_updates(offset=offset, timeout=20, allowed_updates=['message'])
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Telegram command poll error: {e}")
+                    self._stop_listener.wait(5)
+                    continue
+                
+                for update in updates:
+                    offset = update.update_id + 1
+                    message = update.message
+                    if not message or not message.text or str(message.chat_id) != str(self.chat_id):
+                        continue
+                    if message.date.timestamp() < started:
+                        continue
+                    
+                    command, _, args = message.text.strip().partition(' ')
+                    handler = handlers.get(command.split('@')[0].lower())
+                    if handler is None:
+                        continue
+                    
+                    logger.warning(f"📱 Telegram command: {message.text}")
+                    try:
+                        reply = handler(command, args.strip())
+                    except Exception as e:
+                        reply = f"❌ {command} failed: {e}"
+                    if reply:
+                        try:
+                            loop.run_until_complete(bot.send_message(chat_id=self.chat_id, text=reply))
+                        except Exception as e:
+                            logger.error(f"❌ Telegram reply error: {e}")
+        finally:
+            loop.close()
+    
     def test_connection(self) -> bool:
         """Test Telegram connection"""
         message = """
@@ -7,11 +7,18 @@ import os
 import json
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from collections import defaultdict
+from datetime import datetime, timedelta, date
+from typing import Optional, Dict, List, Tuple
 import logging
 from pathlib import Path
 
+from bridge.contract_specs import ContractSpecs, load_freeze_limits
+from bridge.master_diff import diff_master, append_changelog, contract_fields, MasterDiff
+from bridge.option_chain import OptionChainIndex, parse_expiry
+from bridge.shared_token_map import SharedTokenMap, publish_token_map
+from bridge.symbol_search import SymbolSearchIndex
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,44 +39,181 @@ class TokenMapper:
         'NSE': 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
     }
     
-    def __init__(self, data_dir: str = 'data'):
+    # Bump when the layout of tokens.json changes (forces a full rebuild)
+    SCHEMA_VERSION = 3
+    
+    def __init__(self, data_dir: str = 'data', shared: Optional[bool] = None):
         """
         Initialize Token Mapper
         
         Args:
             data_dir: Directory to store token data
+            shared: Attach to the host-wide shared token map instead of
+                    holding a private copy (default: TOKEN_MAP_SHARED env)
         """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
         self.token_file = self.data_dir / 'tokens.json'
         self.contracts_file = self.data_dir / 'master_contracts.csv'
+        self.changelog_file = self.data_dir / 'master_changelog.jsonl'
+        self.shared_file = self.data_dir / 'token_map.shm'
+        self.freeze_limits_file = self.data_dir / 'freeze_limits.json'
+        
+        if shared is None:
+            shared = os.getenv('TOKEN_MAP_SHARED', 'false').lower() == 'true'
+        self.shared = shared
         
         self.tokens_data = {}
         self.contracts_df = None
+        self._chain_index = OptionChainIndex()
+        self._search_index = None
+        self._contract_specs = None
+        self._master_source = {}
+        self._shared = None
         
         # Load or download data
         self._initialize_data()
         
-        logger.info("✅ Token Mapper initialized")
+        logger.info(f"✅ Token Mapper initialized{' (shared)' if self._shared else ''}")
+    
+    @property
+    def chain_index(self) -> OptionChainIndex:
+        """Option chain index (follows the shared map across refreshes)"""
+        self._sync_shared()
+        return self._chain_index
+    
+    @chain_index.setter
+    def chain_index(self, index: OptionChainIndex):
+        self._chain_index = index
     
     def _initialize_data(self):
         """Initialize token data - load from file or download fresh"""
         
-        # Check if data exists and is recent (less than 1 day old)
+        # Another process already published today's map
+        if self.shared and self._attach_shared():
+            return
+        
         if self.token_file.exists():
+            logger.info("📂 Loading tokens from cache...")
+            self._load_tokens()
+            
             file_age = datetime.now() - datetime.fromtimestamp(
                 self.token_file.stat().st_mtime
             )
+            if self.tokens_data and self.tokens_data.get('schema') != self.SCHEMA_VERSION:
+                # Written by an older version (no lot / tick sizes) - rebuild now, whatever its age
+                logger.info("📥 Token cache has an old schema - running full download")
+                self.download_master_contracts()
+            elif file_age >= timedelta(days=1):
+                # Cache older than 1 day - patch it with today's master
+                self.refresh_master_contracts()
+        else:
+            # Download fresh data
+            logger.info("📥 Downloading fresh master contracts...")
+            self.download_master_contracts()
+        
+        if self.shared:
+            self._publish_shared()
+    
+    def _invalidate_indexes(self):
+        """Drop the lazily built indexes after the token map changes"""
+        self._search_index = None
+        self._contract_specs = None
+    
+    def _attach_shared(self) -> bool:
+        """
+        Attach to the shared token map if it is less than 1 day old
+        
+        Returns:
+            bool: True if attached
+        """
+        try:
+            if not self.shared_file.exists():
+                return False
+            
+            file_age = datetime.now() - datetime.fromtimestamp(
+                self.shared_file.stat().st_mtime
+            )
+            if file_age >= timedelta(days=1):
+                return False
             
-            if file_age < timedelta(days=1):
-                logger.info("📂 Loading tokens from cache...")
-                self._load_tokens()
-                return
+            self._shared = SharedTokenMap(self.shared_file)
+            self._chain_index = self._shared.chain_index()
+            self._invalidate_indexes()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to attach shared token map: {e}")
+            self._shared = None
+            return False
+    
+    def _publish_shared(self):
+        """Publish the private token index as the shared map and attach to it"""
+        if not self.tokens_data.get('tokens'):
+            return
+        
+        try:
+            publish_token_map(self.tokens_data, self.shared_file)
+            
+            if self._shared is None:
+                self._shared = SharedTokenMap(self.shared_file)
+            else:
+                self._shared.refresh_if_stale(force=True)
+            self._chain_index = self._shared.chain_index()
+            self._invalidate_indexes()
+            
+            # The shared map is now the single copy - drop the private one
+            self.tokens_data = {}
+            self.contracts_df = None
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to publish shared token map: {e}")
+    
+    def _sync_shared(self):
+        """Re-attach if another process published a newer shared map"""
+        if self._shared is not None and self._shared.refresh_if_stale():
+            self._chain_index = self._shared.chain_index()
+            self._invalidate_indexes()
+    
+    def _fetch_master(self, conditional: bool = False) -> Tuple[Optional[List[Dict]], bool]:
+        """
+        Fetch the scrip master JSON
+        
+        Args:
+            conditional: Send the stored ETag / Last-Modified validators
+            
+        Returns:
+            (contracts, modified) - contracts is None when unmodified or on error
+        """
+        headers = {}
+        source = self.tokens_data.get('source', {})
+        if conditional:
+            if source.get('etag'):
+                headers['If-None-Match'] = source['etag']
+            if source.get('last_modified'):
+                headers['If-Modified-Since'] = source['last_modified']
+        
+        logger.info("🌐 Fetching master contracts from Angel One...")
+        
+        response = requests.get(
+            self.MASTER_CONTRACT_URLS['NFO'],
+            headers=headers,
+            timeout=30
+        )
+        
+        if response.status_code == 304:
+            logger.info("📂 Master contracts unchanged since last refresh")
+            return None, False
+        
+        response.raise_for_status()
+        
+        self._master_source = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
         
-        # Download fresh data
-        logger.info("📥 Downloading fresh master contracts...")
-        self.download_master_contracts()
+        return response.json(), True
     
     def download_master_contracts(self) -> bool:
         """
@@ -79,16 +223,7 @@ class TokenMapper:
             bool: True if successful
         """
         try:
-            logger.info("🌐 Fetching master contracts from Angel One...")
-            
-            response = requests.get(
-                self.MASTER_CONTRACT_URLS['NFO'],
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            # Parse JSON data
-            contracts = response.json()
+            contracts, _ = self._fetch_master()
             
             # Convert to DataFrame
             df = pd.DataFrame(contracts)
@@ -109,6 +244,225 @@ class TokenMapper:
             logger.error(f"❌ Error processing contracts: {e}")
             return False
     
+    def refresh_master_contracts(self) -> bool:
+        """
+        Incrementally refresh the token index from today's master
+        
+        Diffs the fresh master against the stored index, patches only the
+        added / expired / changed contracts and appends the diff to the
+        changelog. Falls back to a full download when there is no usable
+        index yet.
+        
+        Returns:
+            bool: True if successful
+        """
+        if not self.tokens_data.get('tokens') or \
+                self.tokens_data.get('schema') != self.SCHEMA_VERSION:
+            logger.info("📥 No compatible token index - running full download")
+            return self.download_master_contracts()
+        
+        try:
+            contracts, modified = self._fetch_master(conditional=True)
+            
+            if modified:
+                diff = diff_master(self.tokens_data['tokens'], contracts)
+            else:
+                diff = MasterDiff()
+            
+            if diff.is_empty:
+                logger.info("✅ Token index already up to date")
+                if modified:
+                    self.tokens_data['source'] = self._master_source
+                    self._save_tokens()
+                else:
+                    # Only reset the cache age
+                    self.token_file.touch()
+                return True
+            
+            logger.info(f"🔄 Master diff: {diff.summary()}")
+            append_changelog(self.changelog_file, diff, self.tokens_data['tokens'])
+            
+            self._apply_master_diff(diff)
+            self.tokens_data['source'] = self._master_source
+            self._save_tokens()
+            
+            return True
+            
+        except requests.RequestException as e:
+            logger.error(f"❌ Failed to download contracts: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error refreshing contracts: {e}")
+            return False
+    
+    @staticmethod
+    def _underlying(symbol: str, name: str) -> str:
+        """Extract base symbol (NIFTY, BANKNIFTY, etc.)"""
+        if 'NIFTY' in symbol and 'BANK' not in symbol:
+            return 'NIFTY'
+        elif 'BANKNIFTY' in symbol:
+            return 'BANKNIFTY'
+        elif 'FINNIFTY' in symbol:
+            return 'FINNIFTY'
+        elif 'MIDCPNIFTY' in symbol:
+            return 'MIDCPNIFTY'
+        return name.split()[0] if name else symbol
+    
+    def _index_contract(self, row: Dict) -> Optional[str]:
+        """
+        Add one master row to the token mappings
+        
+        Args:
+            row: Raw contract dict
+            
+        Returns:
+            Strike key touched (options only) or None
+        """
+        try:
+            token = str(row.get('token', ''))
+            info = contract_fields(row)
+            symbol = info['symbol']
+            
+            # Skip if essential data missing
+            if not token or not symbol:
+                return None
+            
+            info['token'] = token
+            
+            # Store symbol -> token mapping
+            self.tokens_data['symbols'][symbol] = token
+            
+            # Store token -> detailed info
+            self.tokens_data['tokens'][token] = info
+            
+            # For options, index strike and expiry
+            if info['instrument'] not in ['OPTIDX', 'OPTSTK']:
+                return None
+            
+            base = self._underlying(symbol, info['name'])
+            option_type = symbol[-2:]  # CE or PE
+            info['underlying'] = base
+            info['option_type'] = option_type
+            
+            strike_key = f"{base}_{info['expiry']}_{option_type}"
+            strikes = self.tokens_data['strikes'].setdefault(strike_key, [])
+            
+            if info['strike'] > 0:
+                strikes.append({
+                    'strike': info['strike'],
+                    'token': token,
+                    'symbol': symbol
+                })
+            
+            return strike_key
+            
+        except Exception as e:
+            logger.debug(f"Skipping row: {e}")
+            return None
+    
+    def _unindex_token(self, token: str) -> Optional[str]:
+        """
+        Remove one token from the token mappings
+        
+        Args:
+            token: Token string
+            
+        Returns:
+            Strike key touched (options only) or None
+        """
+        info = self.tokens_data['tokens'].pop(token, None)
+        if not info:
+            return None
+        
+        if self.tokens_data['symbols'].get(info['symbol']) == token:
+            del self.tokens_data['symbols'][info['symbol']]
+        
+        if 'underlying' not in info:
+            return None
+        
+        strike_key = f"{info['underlying']}_{info['expiry']}_{info['option_type']}"
+        remaining = [
+            s for s in self.tokens_data['strikes'].get(strike_key, [])
+            if s['token'] != token
+        ]
+        if remaining:
+            self.tokens_data['strikes'][strike_key] = remaining
+        else:
+            self.tokens_data['strikes'].pop(strike_key, None)
+        
+        return strike_key
+    
+    def _rebuild_expiries(self, bases: Optional[set] = None):
+        """
+        Rebuild the expiry lists (sorted by date) from the strike keys
+        
+        Args:
+            bases: Underlyings to rebuild (all if None)
+        """
+        expiries = defaultdict(set)
+        for strike_key in self.tokens_data['strikes']:
+            base, expiry, _ = strike_key.rsplit('_', 2)
+            if expiry and (bases is None or base in bases):
+                expiries[base].add(expiry)
+        
+        if bases is None:
+            self.tokens_data['expiries'] = {}
+            bases = set(expiries)
+        
+        for base in bases:
+            if expiries.get(base):
+                self.tokens_data['expiries'][base] = sorted(
+                    expiries[base],
+                    key=lambda e: (parse_expiry(e) or date.min, e)
+                )
+            else:
+                self.tokens_data['expiries'].pop(base, None)
+    
+    def _apply_master_diff(self, diff: MasterDiff):
+        """
+        Patch the token mappings and indexes with a master diff
+        
+        Args:
+            diff: Diff from diff_master()
+        """
+        touched = set()
+        
+        for token in diff.removed:
+            touched.add(self._unindex_token(token))
+        
+        for row, _ in diff.changed:
+            touched.add(self._unindex_token(str(row.get('token'))))
+            touched.add(self._index_contract(row))
+        
+        for row in diff.added:
+            touched.add(self._index_contract(row))
+        
+        touched.discard(None)
+        
+        for strike_key in touched:
+            if strike_key in self.tokens_data['strikes']:
+                self.tokens_data['strikes'][strike_key].sort(key=lambda x: x['strike'])
+        
+        bases = {key.rsplit('_', 2)[0] for key in touched}
+        self._rebuild_expiries(bases)
+        
+        # Patch only the affected chain slices
+        for strike_key in touched:
+            base, expiry, option_type = strike_key.rsplit('_', 2)
+            self.chain_index.set_slice(
+                base, expiry, option_type,
+                self.tokens_data['strikes'].get(strike_key, [])
+            )
+        for base in bases:
+            self.chain_index.set_expiries(base, self.tokens_data['expiries'].get(base, []))
+        
+        if diff.added or diff.removed or diff.changed:
+            self._invalidate_indexes()
+        
+        self.tokens_data['last_updated'] = datetime.now().isoformat()
+        
+        logger.info(f"✅ Patched token index: {diff.summary()}")
+    
     def _process_contracts(self, df: pd.DataFrame):
         """
         Process contracts and build token mappings
@@ -122,78 +476,15 @@ class TokenMapper:
             'tokens': {},       # token -> symbol info
             'expiries': {},     # symbol -> list of expiries
             'strikes': {},      # symbol -> list of strikes
-            'last_updated': datetime.now().isoformat()
+            'last_updated': datetime.now().isoformat(),
+            'schema': self.SCHEMA_VERSION,
+            'source': self._master_source
         }
         
-        for _, row in df.iterrows():
-            try:
-                token = str(row.get('token', ''))
-                symbol = str(row.get('symbol', ''))
-                name = str(row.get('name', ''))
-                exchange = str(row.get('exch_seg', ''))
-                instrument = str(row.get('instrumenttype', ''))
-                
-                # Skip if essential data missing
-                if not token or not symbol:
-                    continue
-                
-                # Store symbol -> token mapping
-                self.tokens_data['symbols'][symbol] = token
-                
-                # Store token -> detailed info
-                self.tokens_data['tokens'][token] = {
-                    'symbol': symbol,
-                    'name': name,
-                    'exchange': exchange,
-                    'instrument': instrument,
-                    'token': token
-                }
-                
-                # For options, extract strike and expiry
-                if instrument in ['OPTIDX', 'OPTSTK']:
-                    strike = row.get('strike', 0)
-                    expiry = row.get('expiry', '')
-                    option_type = row.get('symbol', '')[-2:]  # CE or PE
-                    
-                    # Extract base symbol (NIFTY, BANKNIFTY, etc.)
-                    if 'NIFTY' in symbol and 'BANK' not in symbol:
-                        base = 'NIFTY'
-                    elif 'BANKNIFTY' in symbol:
-                        base = 'BANKNIFTY'
-                    elif 'FINNIFTY' in symbol:
-                        base = 'FINNIFTY'
-                    elif 'MIDCPNIFTY' in symbol:
-                        base = 'MIDCPNIFTY'
-                    else:
-                        base = name.split()[0] if name else symbol
-                    
-                    # Store expiries
-                    if base not in self.tokens_data['expiries']:
-                        self.tokens_data['expiries'][base] = set()
-                    if expiry:
-                        self.tokens_data['expiries'][base].add(expiry)
-                    
-                    # Store strikes
-                    strike_key = f"{base}_{expiry}_{option_type}"
-                    if strike_key not in self.tokens_data['strikes']:
-                        self.tokens_data['strikes'][strike_key] = []
-                    
-                    if strike and strike > 0:
-                        self.tokens_data['strikes'][strike_key].append({
-                            'strike': float(strike) / 100,  # Angel gives in paisa
-                            'token': token,
-                            'symbol': symbol
-                        })
-                
-            except Exception as e:
-                logger.debug(f"Skipping row: {e}")
-                continue
-        
-        # Convert sets to sorted lists for JSON serialization
-        for symbol in self.tokens_data['expiries']:
-            self.tokens_data['expiries'][symbol] = sorted(
-                list(self.tokens_data['expiries'][symbol])
-            )
+        for row in df.to_dict('records'):
+            self._index_contract(row)
+        
+        self._rebuild_expiries()
         
         # Sort strikes
         for key in self.tokens_data['strikes']:
@@ -202,6 +493,10 @@ class TokenMapper:
                 key=lambda x: x['strike']
             )
         
+        # Build sorted strike / expiry index
+        self.chain_index = OptionChainIndex.from_tokens_data(self.tokens_data)
+        self._invalidate_indexes()
+        
         # Save to JSON
         self._save_tokens()
         
@@ -210,8 +505,11 @@ class TokenMapper:
     def _save_tokens(self):
         """Save tokens data to JSON file"""
         try:
-            with open(self.token_file, 'w') as f:
-                json.dump(self.tokens_data, f, indent=2)
+            # Write compact JSON to a temp file and swap it in atomically
+            tmp_file = self.token_file.with_suffix('.json.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(self.tokens_data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.token_file)
             logger.info(f"💾 Saved token mappings to {self.token_file}")
         except Exception as e:
             logger.error(f"❌ Failed to save tokens: {e}")
@@ -221,6 +519,8 @@ class TokenMapper:
         try:
             with open(self.token_file, 'r') as f:
                 self.tokens_data = json.load(f)
+            self.chain_index = OptionChainIndex.from_tokens_data(self.tokens_data)
+            self._invalidate_indexes()
             logger.info(f"📂 Loaded {len(self.tokens_data.get('symbols', {}))} symbols from cache")
         except Exception as e:
             logger.error(f"❌ Failed to load tokens: {e}")
@@ -237,6 +537,9 @@ class TokenMapper:
         Returns:
             Token string or None
         """
+        if self._shared is not None:
+            self._sync_shared()
+            return self._shared.get_token(symbol)
         return self.tokens_data.get('symbols', {}).get(symbol)
     
     def get_symbol(self, token: str) -> Optional[str]:
@@ -249,7 +552,7 @@ class TokenMapper:
         Returns:
             Symbol or None
         """
-        token_info = self.tokens_data.get('tokens', {}).get(str(token))
+        token_info = self.get_symbol_info(token)
         return token_info.get('symbol') if token_info else None
     
     def get_symbol_info(self, token: str) -> Optional[Dict]:
@@ -262,39 +565,22 @@ class TokenMapper:
         Returns:
             Dictionary with symbol info
         """
+        if self._shared is not None:
+            self._sync_shared()
+            return self._shared.get_symbol_info(str(token))
         return self.tokens_data.get('tokens', {}).get(str(token))
     
     def get_current_expiry(self, symbol: str = 'NIFTY') -> Optional[str]:
         """
-        Get current month expiry for a symbol
+        Get current expiry for a symbol
         
         Args:
             symbol: Base symbol (NIFTY, BANKNIFTY, etc.)
             
         Returns:
-            Expiry date string (DDMMMYY format)
+            Expiry date string as stored in the master (e.g., 27FEB2025)
         """
-        expiries = self.tokens_data.get('expiries', {}).get(symbol, [])
-        
-        if not expiries:
-            return None
-        
-        # Get current date
-        today = datetime.now()
-        
-        # Find nearest expiry that's in the future
-        for expiry_str in expiries:
-            try:
-                # Parse expiry (format: DDMMMYY like 25JAN24)
-                expiry_date = datetime.strptime(expiry_str, '%d%b%y')
-                
-                if expiry_date >= today:
-                    return expiry_str
-            except:
-                continue
-        
-        # If no future expiry found, return first one
-        return expiries[0] if expiries else None
+        return self.chain_index.current_expiry(symbol)
     
     def get_atm_strike(self, symbol: str, spot_price: float, 
                        round_to: int = 50) -> float:
@@ -313,6 +599,28 @@ class TokenMapper:
         atm = round(spot_price / round_to) * round_to
         return atm
     
+    def _get_atm_option(self, symbol: str, spot_price: Optional[float],
+                        option_type: str) -> Optional[str]:
+        """Resolve the ATM CE/PE token through the chain index"""
+        expiry = self.get_current_expiry(symbol)
+        if not expiry:
+            logger.error(f"No expiry found for {symbol}")
+            return None
+        
+        if spot_price is None:
+            # Return middle strike if no spot price given
+            match = self.chain_index.middle(symbol, expiry, option_type)
+        else:
+            round_to = 100 if 'BANK' in symbol else 50
+            atm_strike = self.get_atm_strike(symbol, spot_price, round_to)
+            match = self.chain_index.nearest(symbol, expiry, option_type, atm_strike)
+        
+        if not match:
+            logger.error(f"No {option_type} strikes found for {symbol} {expiry}")
+            return None
+        
+        return match[1]
+    
     def get_atm_ce(self, symbol: str = 'NIFTY', 
                    spot_price: Optional[float] = None) -> Optional[str]:
         """
@@ -325,30 +633,7 @@ class TokenMapper:
         Returns:
             Token for ATM CE option
         """
-        expiry = self.get_current_expiry(symbol)
-        if not expiry:
-            logger.error(f"No expiry found for {symbol}")
-            return None
-        
-        strike_key = f"{symbol}_{expiry}_CE"
-        strikes = self.tokens_data.get('strikes', {}).get(strike_key, [])
-        
-        if not strikes:
-            logger.error(f"No CE strikes found for {symbol} {expiry}")
-            return None
-        
-        if spot_price is None:
-            # Return middle strike if no spot price given
-            mid_idx = len(strikes) // 2
-            return strikes[mid_idx]['token']
-        
-        # Find ATM strike
-        round_to = 100 if 'BANK' in symbol else 50
-        atm_strike = self.get_atm_strike(symbol, spot_price, round_to)
-        
-        # Find closest strike
-        closest = min(strikes, key=lambda x: abs(x['strike'] - atm_strike))
-        return closest['token']
+        return self._get_atm_option(symbol, spot_price, 'CE')
     
     def get_atm_pe(self, symbol: str = 'NIFTY', 
                    spot_price: Optional[float] = None) -> Optional[str]:
@@ -362,30 +647,7 @@ class TokenMapper:
         Returns:
             Token for ATM PE option
         """
-        expiry = self.get_current_expiry(symbol)
-        if not expiry:
-            logger.error(f"No expiry found for {symbol}")
-            return None
-        
-        strike_key = f"{symbol}_{expiry}_PE"
-        strikes = self.tokens_data.get('strikes', {}).get(strike_key, [])
-        
-        if not strikes:
-            logger.error(f"No PE strikes found for {symbol} {expiry}")
-            return None
-        
-        if spot_price is None:
-            # Return middle strike if no spot price given
-            mid_idx = len(strikes) // 2
-            return strikes[mid_idx]['token']
-        
-        # Find ATM strike
-        round_to = 100 if 'BANK' in symbol else 50
-        atm_strike = self.get_atm_strike(symbol, spot_price, round_to)
-        
-        # Find closest strike
-        closest = min(strikes, key=lambda x: abs(x['strike'] - atm_strike))
-        return closest['token']
+        return self._get_atm_option(symbol, spot_price, 'PE')
     
     def get_strike_token(self, symbol: str, strike: float, 
                         option_type: str, expiry: Optional[str] = None) -> Optional[str]:
@@ -396,7 +658,7 @@ class TokenMapper:
             symbol: Base symbol (NIFTY, BANKNIFTY, etc.)
             strike: Strike price
             option_type: 'CE' or 'PE'
-            expiry: Expiry date (if None, uses current month)
+            expiry: Expiry date (if None, uses current expiry)
             
         Returns:
             Token string
@@ -407,50 +669,150 @@ class TokenMapper:
         if not expiry:
             return None
         
-        strike_key = f"{symbol}_{expiry}_{option_type}"
-        strikes = self.tokens_data.get('strikes', {}).get(strike_key, [])
+        match = self.chain_index.nearest(symbol, expiry, option_type, strike)
+        if not match:
+            return None
+        
+        # If exact not found, the closest strike is used
+        if match[0] != strike:
+            logger.warning(f"Exact strike {strike} not found, using {match[0]}")
+        
+        return match[1]
+    
+    def get_strikes_around_atm(self, symbol: str, spot_price: float,
+                               option_type: str, n: int = 5,
+                               expiry: Optional[str] = None) -> List[Dict]:
+        """
+        Get N strikes on either side of ATM
+        
+        Args:
+            symbol: Base symbol (NIFTY, BANKNIFTY, etc.)
+            spot_price: Current spot price
+            option_type: 'CE' or 'PE'
+            n: Strikes on each side of ATM
+            expiry: Expiry date (if None, uses current expiry)
+            
+        Returns:
+            List of {'strike', 'token', 'symbol'} sorted by strike
+        """
+        expiry = expiry or self.get_current_expiry(symbol)
+        if not expiry:
+            return []
+        
+        round_to = 100 if 'BANK' in symbol else 50
+        atm_strike = self.get_atm_strike(symbol, spot_price, round_to)
+        
+        return [
+            {'strike': strike, 'token': token, 'symbol': trading_symbol}
+            for strike, token, trading_symbol in self.chain_index.strikes_around(
+                symbol, expiry, option_type, atm_strike, n
+            )
+        ]
+    
+    def get_option_chain(self, symbol: str, spot_price: float, n: int = 10,
+                         expiry: Optional[str] = None) -> Dict:
+        """
+        Get the CE/PE chain around ATM as aligned arrays
         
-        # Find exact strike
-        for s in strikes:
-            if s['strike'] == strike:
-                return s['token']
+        Args:
+            symbol: Base symbol (NIFTY, BANKNIFTY, etc.)
+            spot_price: Current spot price
+            n: Strikes on each side of ATM
+            expiry: Expiry date (if None, uses current expiry)
+            
+        Returns:
+            Dict with 'expiry', 'strikes', 'ce_tokens', 'pe_tokens'
+        """
+        expiry = expiry or self.get_current_expiry(symbol)
+        if not expiry:
+            return {}
         
-        # If exact not found, find closest
-        if strikes:
-            closest = min(strikes, key=lambda x: abs(x['strike'] - strike))
-            logger.warning(f"Exact strike {strike} not found, using {closest['strike']}")
-            return closest['token']
+        round_to = 100 if 'BANK' in symbol else 50
+        atm_strike = self.get_atm_strike(symbol, spot_price, round_to)
         
-        return None
+        chain = self.chain_index.chain_window(symbol, expiry, atm_strike, n)
+        chain['expiry'] = expiry
+        return chain
     
-    def search_symbol(self, keyword: str, limit: int = 10) -> List[Dict]:
+    @property
+    def search_index(self) -> SymbolSearchIndex:
+        """Symbol search index (built on first use after each token map rebuild)"""
+        self._sync_shared()
+        if self._search_index is None:
+            if self._shared is not None:
+                symbols = self._shared.symbols()
+            else:
+                symbols = self.tokens_data.get('symbols', {}).keys()
+            self._search_index = SymbolSearchIndex(symbols)
+        return self._search_index
+    
+    def search_symbol(self, keyword: str, limit: int = 10,
+                      mode: str = 'auto') -> List[Dict]:
         """
         Search symbols by keyword
         
         Args:
             keyword: Search keyword
             limit: Maximum results
+            mode: 'prefix', 'substring', 'fuzzy' or 'auto'
             
         Returns:
-            List of matching symbols
+            List of matching symbols, best match first
         """
         results = []
-        keyword = keyword.upper()
         
-        for symbol, token in self.tokens_data.get('symbols', {}).items():
-            if keyword in symbol:
-                info = self.tokens_data['tokens'].get(token, {})
+        for symbol, _, _ in self.search_index.search(keyword, limit, mode):
+            token = self.get_token(symbol)
+            info = self.get_symbol_info(token) if token else None
+            if info:
                 results.append(info)
-                
-                if len(results) >= limit:
-                    break
         
         return results
     
+    @property
+    def contract_specs(self) -> ContractSpecs:
+        """Lot / tick / freeze table (built on first use after each token map rebuild)"""
+        self._sync_shared()
+        if self._contract_specs is None:
+            freeze_limits = load_freeze_limits(self.freeze_limits_file)
+            if self._shared is not None:
+                self._contract_specs = ContractSpecs.from_records(self._shared.records, freeze_limits)
+            else:
+                self._contract_specs = ContractSpecs.from_token_infos(
+                    self.tokens_data.get('tokens', {}).values(), freeze_limits
+                )
+        return self._contract_specs
+    
+    def get_contract_spec(self, token: str) -> Dict:
+        """
+        Get lot size, tick size and freeze quantity for a token
+        
+        Args:
+            token: Token string
+            
+        Returns:
+            Dict with 'lot_size', 'tick_size', 'freeze_qty' (lot 1, tick 0
+            and no freeze limit for unknown tokens)
+        """
+        spec = self.contract_specs.lookup([token])
+        return {
+            'lot_size': int(spec['lot_size'][0]),
+            'tick_size': float(spec['tick_size'][0]),
+            'freeze_qty': int(spec['freeze_qty'][0])
+        }
+    
     def update_data(self):
-        """Force update token data"""
+        """Force update token data (incremental when an index exists)"""
         logger.info("🔄 Forcing token data update...")
-        self.download_master_contracts()
+        
+        if self.shared:
+            # Patch the private index, then swap the shared map for everyone
+            if not self.tokens_data:
+                self._load_tokens()
+            self.refresh_master_contracts()
+            self._publish_shared()
+        else:
+            self.refresh_master_contracts()
 
 
 def test_token_mapper():
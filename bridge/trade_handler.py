@@ -9,41 +9,48 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from bridge.telegram_notifier import TelegramNotifier
 from analytics.trade_database import TradeDatabase
 from datetime import datetime
+from typing import Dict
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class TradeHandler:
+    """Routes trade events to Telegram and the trade database"""
+    
+    def __init__(self):
+        self.telegram = TelegramNotifier()
+        self.db = TradeDatabase()
+    
     def get_mtf_signals(self, symbol: str) -> Dict:
-    """
-    Get multi-timeframe analysis before placing trade
-    """
-    try:
-        from analytics.mtf_analyzer import MultiTimeframeAnalyzer
+        """
+        Get multi-timeframe analysis before placing trade
+        """
+        try:
+            from analytics.mtf_analyzer import MultiTimeframeAnalyzer
         
-        analyzer = MultiTimeframeAnalyzer(symbol)
-        analyzer.analyze_all_timeframes()
-        analyzer.find_confluence_zones()
+            analyzer = MultiTimeframeAnalyzer(symbol)
+            analyzer.analyze_all_timeframes()
+            analyzer.find_confluence_zones()
         
-        bias = analyzer.get_trading_bias()
+            bias = analyzer.get_trading_bias()
         
-        return {
-            'bias': bias['bias'],
-            'confidence': bias['confidence'],
-            'signals': analyzer.signals,
-            'confluence_zones': analyzer.confluence_zones
-        }
-    except Exception as e:
-        logger.error(f"Error getting MTF signals: {e}")
-        return {'bias': 'neutral', 'confidence': 0}
+            return {
+                'bias': bias['bias'],
+                'confidence': bias['confidence'],
+                'signals': analyzer.signals,
+                'confluence_zones': analyzer.confluence_zones
+            }
+        except Exception as e:
+            logger.error(f"Error getting MTF signals: {e}")
+            return {'bias': 'neutral', 'confidence': 0}
     
     def on_trade_entry(self, trade_data: dict):
         self.telegram.send_trade_entry(trade_data)
         logger.info(f"📱 Entry notification sent for {trade_data['symbol']}")
     
     def on_trade_exit(self, trade_data: dict):
-        self.telegram.send_trade_exit(trade_data)
+        # Queued for the database writer - no disk wait before the notification
         db_data = {
             'symbol': trade_data.get('symbol'),
             'strategy': trade_data.get('strategy', 'Default'),
@@ -58,28 +65,32 @@ class TradeHandler:
             'exit_reason': trade_data.get('exit_reason', 'Manual')
         }
         self.db.log_trade(db_data)
+        self.telegram.send_trade_exit(trade_data)
         logger.info(f"📱 Exit notification sent for {trade_data['symbol']}")
     
     def send_daily_summary(self):
-        today = datetime.now().strftime('%Y-%m-%d')
-        trades = self.db.get_trades(start_date=today, end_date=today)
-        if trades.empty:
+        summary = self.db.get_daily_summary()
+        if not summary['trades']:
             self.telegram.send_message("📊 No trades today!")
             return
-        from analytics.performance_tracker import PerformanceTracker
-        tracker = PerformanceTracker(trades)
-        metrics = tracker.calculate_all()
         self.telegram.send_daily_summary({
-            'total_trades': metrics.get('total_trades', 0),
-            'winning_trades': metrics.get('winning_trades', 0),
-            'losing_trades': metrics.get('losing_trades', 0),
-            'total_pnl': metrics.get('total_pnl', 0),
-            'best_trade': metrics.get('best_trade', 0),
-            'worst_trade': metrics.get('worst_trade', 0)
+            'total_trades': summary['trades'],
+            'winning_trades': summary['wins'],
+            'losing_trades': summary['losses'],
+            'total_pnl': summary['gross_pnl'],
+            'best_trade': summary['best_pnl'],
+            'worst_trade': summary['worst_pnl']
         })
     
     def send_system_status(self, status: str, details: str = ""):
         self.telegram.send_system_status(status, details)
+    
+    def send_risk_warning(self, warning_type: str, message: str):
+        self.telegram.send_risk_warning({'type': warning_type, 'message': message})
+    
+    def close(self):
+        """Commit queued trades before shutdown"""
+        self.db.close()
 
 if __name__ == "__main__":
     print("\n🧪 TESTING TRADE HANDLER\n")
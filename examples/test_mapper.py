@@ -90,6 +90,12 @@ if results:
 else:
     print("No results found")
 
+# Example 7: Strikes around ATM
+print("\nExample 7: Strikes Around ATM")
+print("-" * 40)
+for s in mapper.get_strikes_around_atm('NIFTY', spot_price, 'CE', n=2):
+    print(f"{s['strike']:.0f} CE - {s['symbol']} ({s['token']})")
+
 print("\n" + "="*60)
 print("✅ ALL EXAMPLES COMPLETED")
 print("="*60 + "\n")
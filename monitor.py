@@ -27,26 +27,20 @@ def show_dashboard():
         print("="*70)
         
         # Today's trades
-        today = datetime.now().strftime('%Y-%m-%d')
-        trades_today = db.get_trades(start_date=today, end_date=today)
+        summary = db.get_daily_summary()
         
         print(f"\n📅 TODAY'S PERFORMANCE:")
         print("-"*70)
         
-        if not trades_today.empty:
-            total_pnl = trades_today['pnl'].sum()
-            winning = len(trades_today[trades_today['pnl'] > 0])
-            losing = len(trades_today[trades_today['pnl'] < 0])
+        if summary['trades']:
+            print(f"   Total Trades: {summary['trades']}")
+            print(f"   Winning: {summary['wins']} | Losing: {summary['losses']}")
+            print(f"   Total P&L: ₹{summary['gross_pnl']:+,.2f}")
             
-            print(f"   Total Trades: {len(trades_today)}")
-            print(f"   Winning: {winning} | Losing: {losing}")
-            print(f"   Total P&L: ₹{total_pnl:+,.2f}")
-            
-            if len(trades_today) > 0:
-                print(f"\n📈 Recent Trades:")
-                for _, trade in trades_today.tail(3).iterrows():
-                    status_icon = "✅" if trade['pnl'] > 0 else "❌"
-                    print(f"   {status_icon} {trade['symbol']}: ₹{trade['pnl']:+.2f}")
+            print(f"\n📈 Recent Trades:")
+            for _, trade in db.get_recent_trades(3).iterrows():
+                status_icon = "✅" if trade['pnl'] > 0 else "❌"
+                print(f"   {status_icon} {trade['symbol']}: ₹{trade['pnl']:+.2f}")
         else:
             print("   No trades today")
         
@@ -4,10 +4,12 @@ Portfolio Management Package
 
 from .portfolio_manager import PortfolioManager, StrategyAllocation, PortfolioPosition
 from .capital_allocator import CapitalAllocator
+from .trigger_book import TriggerBook
 
 __all__ = [
     'PortfolioManager',
     'StrategyAllocation',
     'PortfolioPosition',
-    'CapitalAllocator'
+    'CapitalAllocator',
+    'TriggerBook'
 ]
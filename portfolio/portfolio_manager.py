@@ -5,15 +5,17 @@ Manage multiple strategies, capital allocation, risk management
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 from dataclasses import dataclass
 import logging
 
+from .trigger_book import TriggerBook
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class StrategyAllocation:
     """Strategy allocation details"""
     strategy_name: str
@@ -27,7 +29,7 @@ class StrategyAllocation:
     is_active: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class PortfolioPosition:
     """Portfolio position"""
     position_id: str
@@ -48,11 +50,14 @@ class PortfolioManager:
     Manage entire trading portfolio with multiple strategies
     """
     
-    def __init__(self, total_capital: float, max_risk_per_strategy: float = 0.02):
+    def __init__(self, total_capital: float, max_risk_per_strategy: float = 0.02, risk_gate=None):
         """
         total_capital: Total portfolio capital
         max_risk_per_strategy: Max risk per strategy (2% default)
+        risk_gate: Optional RiskGate - strategy limits are registered with it
+                   and every open / close goes through it
         """
+        self.risk_gate = risk_gate
         self.total_capital = total_capital
         self.available_capital = total_capital
         self.max_risk_per_strategy = max_risk_per_strategy
@@ -61,6 +66,14 @@ class PortfolioManager:
         self.active_positions: Dict[str, PortfolioPosition] = {}
         self.closed_positions: List[PortfolioPosition] = []
         
+        # Exit indexes: symbol -> trigger book / position ids, last price seen
+        self.trigger_books: Dict[str, TriggerBook] = {}
+        self.symbol_positions: Dict[str, Set[str]] = {}
+        self.last_prices: Dict[str, float] = {}
+        self._dirty_symbols: Set[str] = set()
+        self._crossed: Dict[str, List[tuple]] = {}
+        self._position_counter = 0
+        
         self.portfolio_history = []
         self.equity_curve = []
         
@@ -91,6 +104,9 @@ class PortfolioManager:
         )
         
         self.strategy_allocations[strategy_name] = allocation
+        if self.risk_gate is not None:
+            self.risk_gate.set_strategy_limits(strategy_name, max_positions=max_positions,
+                                               max_exposure=allocated_capital)
         logger.info(f"Added strategy {strategy_name}: ₹{allocated_capital:,.2f} ({allocation_pct}%)")
         
     def can_open_position(self, strategy_name: str) -> bool:
@@ -156,8 +172,15 @@ class PortfolioManager:
             logger.warning(f"Cannot open position for {strategy_name}")
             return None
         
+        if self.risk_gate is not None:
+            allowed, reason = self.risk_gate.check(symbol, 'BUY', quantity, entry_price, strategy_name)
+            if not allowed:
+                logger.warning(f"Risk gate rejected {strategy_name} {symbol}: {reason}")
+                return None
+        
         # Generate position ID
-        position_id = f"{strategy_name}_{symbol}_{int(datetime.now().timestamp())}"
+        self._position_counter += 1
+        position_id = f"{strategy_name}_{symbol}_{int(datetime.now().timestamp())}_{self._position_counter}"
         
         position = PortfolioPosition(
             position_id=position_id,
@@ -174,6 +197,12 @@ class PortfolioManager:
         )
         
         self.active_positions[position_id] = position
+        self.trigger_books.setdefault(symbol, TriggerBook()).add(position_id, stop_loss, target)
+        self.symbol_positions.setdefault(symbol, set()).add(position_id)
+        if len(self.symbol_positions[symbol]) == 1:
+            # First open position in the symbol: any earlier price is stale
+            self.last_prices[symbol] = entry_price
+        self._dirty_symbols.add(symbol)
         
         # Update strategy allocation
         self.strategy_allocations[strategy_name].current_positions += 1
@@ -182,6 +211,9 @@ class PortfolioManager:
         # Update available capital
         self.available_capital -= entry_price * quantity
         
+        if self.risk_gate is not None:
+            self.risk_gate.apply_fill(symbol, 'BUY', quantity, entry_price, strategy_name)
+        
         logger.info(f"Opened position: {position_id} - {quantity} x {symbol} @ ₹{entry_price}")
         
         return position_id
@@ -221,46 +253,88 @@ class PortfolioManager:
         # Move to closed positions
         self.closed_positions.append(position)
         del self.active_positions[position_id]
+        self.trigger_books[position.symbol].remove(position_id)
+        self.symbol_positions[position.symbol].discard(position_id)
+        if not self.symbol_positions[position.symbol]:
+            self.last_prices.pop(position.symbol, None)
         
         # Update available capital
         self.available_capital += exit_price * position.quantity
         
+        if self.risk_gate is not None:
+            self.risk_gate.apply_fill(position.symbol, 'SELL', position.quantity, exit_price,
+                                      position.strategy_name)
+        
         logger.info(f"Closed position: {position_id} - P&L: ₹{pnl:,.2f} ({pnl_pct:.2f}%)")
         
         return pnl
     
     def update_positions(self, price_data: Dict[str, float]):
         """
-        Update all active positions with current prices
+        Update active positions with current prices
+        
+        Only positions in the ticked symbols are touched; their symbols are
+        queued for the next check_stop_loss_targets().
         
         price_data: {'SYMBOL': current_price}
         """
-        for position in self.active_positions.values():
-            if position.symbol in price_data:
-                current_price = price_data[position.symbol]
+        if self.risk_gate is not None:
+            self.risk_gate.update_prices(price_data)
+        
+        for symbol, current_price in price_data.items():
+            position_ids = self.symbol_positions.get(symbol)
+            if not position_ids:
+                continue
+            
+            self.last_prices[symbol] = current_price
+            self._dirty_symbols.add(symbol)
+            
+            for position_id in position_ids:
+                position = self.active_positions[position_id]
                 position.current_price = current_price
                 position.pnl = (current_price - position.entry_price) * position.quantity
                 position.pnl_pct = (current_price - position.entry_price) / position.entry_price * 100
     
-    def check_stop_loss_targets(self) -> List[str]:
+    def check_stop_loss_targets(self, price_data: Optional[Dict[str, float]] = None) -> List[tuple]:
         """
-        Check all positions for stop loss or target hits
-        Returns list of position_ids to close
+        Check positions for stop loss or target hits
+        
+        Only symbols whose price changed since the last check are looked up
+        in their trigger books, O(k log n) for k crossed positions.
+        
+        price_data: Optional {'SYMBOL': current_price} to apply first
+        Returns list of (position_id, price, reason) to close
         """
-        to_close = []
+        if price_data:
+            self.update_positions(price_data)
         
-        for position_id, position in self.active_positions.items():
-            # Stop loss hit
-            if position.current_price <= position.stop_loss:
-                logger.warning(f"Stop loss hit for {position_id}")
-                to_close.append((position_id, position.current_price, "Stop Loss"))
+        for symbol in self._dirty_symbols:
+            book = self.trigger_books.get(symbol)
+            if not book:
+                self._crossed.pop(symbol, None)
+                continue
+            
+            price = self.last_prices[symbol]
+            stops, targets = book.crossed(price)
+            crossed = [(pid, price, "Stop Loss") for pid in stops] + \
+                      [(pid, price, "Target") for pid in targets]
             
-            # Target hit
-            elif position.current_price >= position.target:
-                logger.info(f"Target hit for {position_id}")
-                to_close.append((position_id, position.current_price, "Target"))
+            for position_id, _, reason in crossed:
+                if reason == "Stop Loss":
+                    logger.warning(f"Stop loss hit for {position_id}")
+                else:
+                    logger.info(f"Target hit for {position_id}")
+            
+            if crossed:
+                self._crossed[symbol] = crossed
+            else:
+                self._crossed.pop(symbol, None)
+        
+        self._dirty_symbols.clear()
         
-        return to_close
+        # Crossed earlier but not closed yet
+        return [hit for hits in self._crossed.values() for hit in hits
+                if hit[0] in self.active_positions]
     
     def get_portfolio_summary(self) -> Dict:
         """
@@ -377,6 +451,9 @@ class PortfolioManager:
             
             self.strategy_allocations[name].allocated_capital = new_allocated_capital
             self.strategy_allocations[name].max_risk_per_trade = new_allocated_capital * 0.01
+            if self.risk_gate is not None:
+                self.risk_gate.set_strategy_limits(name, max_positions=self.strategy_allocations[name].max_positions,
+                                                   max_exposure=new_allocated_capital)
             
             logger.info(
                 f"Rebalanced {name}: ₹{old_capital:,.0f} → ₹{new_allocated_capital:,.0f} "
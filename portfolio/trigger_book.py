@@ -0,0 +1,72 @@
+"""
+Trigger Book
+Sorted stop-loss / target levels for one symbol
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Tuple
+
+
+class TriggerBook:
+    """
+    Exit levels of every position in one symbol, kept sorted
+
+    Stops fire when price <= level and targets when price >= level, so the
+    positions crossed by a price are a suffix of the stop levels and a
+    prefix of the target levels - found with one bisect each, O(log n + k).
+    """
+
+    def __init__(self):
+        self._stops: List[Tuple[float, str]] = []      # (level, position_id) ascending
+        self._targets: List[Tuple[float, str]] = []
+        self._levels: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __contains__(self, position_id):
+        return position_id in self._levels
+
+    def add(self, position_id: str, stop_loss: float, target: float):
+        """Add (or move) a position's stop and target"""
+        if position_id in self._levels:
+            self.remove(position_id)
+
+        self._levels[position_id] = (stop_loss, target)
+        if stop_loss is not None:
+            insort(self._stops, (stop_loss, position_id))
+        if target is not None:
+            insort(self._targets, (target, position_id))
+
+    def remove(self, position_id: str) -> bool:
+        levels = self._levels.pop(position_id, None)
+        if levels is None:
+            return False
+
+        stop_loss, target = levels
+        if stop_loss is not None:
+            del self._stops[bisect_left(self._stops, (stop_loss, position_id))]
+        if target is not None:
+            del self._targets[bisect_left(self._targets, (target, position_id))]
+        return True
+
+    def crossed(self, price: float) -> Tuple[List[str], List[str]]:
+        """
+        Positions whose exits are crossed at price
+
+        Returns:
+            (stop-loss position ids, target position ids); a position
+            crossing both is reported once, as a stop
+        """
+        start = bisect_left(self._stops, (price, ''))
+        stops = [position_id for _, position_id in self._stops[start:]]
+
+        # Targets at exactly price count as hit; '\uffff' sorts after any id
+        end = bisect_right(self._targets, (price, '\uffff'))
+        targets = [position_id for _, position_id in self._targets[:end]]
+
+        if stops and targets:
+            stopped = set(stops)
+            targets = [position_id for position_id in targets if position_id not in stopped]
+
+        return stops, targets
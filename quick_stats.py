@@ -7,7 +7,6 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from analytics.trade_database import TradeDatabase
-from analytics.performance_tracker import PerformanceTracker
 from datetime import datetime
 
 print("\n" + "="*60)
@@ -18,18 +17,15 @@ db = TradeDatabase()
 
 # Today's trades
 today = datetime.now().strftime('%Y-%m-%d')
-trades_today = db.get_trades(start_date=today, end_date=today)
-
 print(f"📅 Today: {today}")
-print(f"📈 Today's Trades: {len(trades_today)}")
+print(f"📈 Today's Trades: {db.get_daily_summary(today)['trades']}")
 
 # All time trades
-all_trades = db.get_trades()
-print(f"📊 Total Trades: {len(all_trades)}")
+total = db.get_summary()['trades']
+print(f"📊 Total Trades: {total}")
 
-if not all_trades.empty:
-    tracker = PerformanceTracker(all_trades)
-    metrics = tracker.calculate_all()
+if total:
+    metrics = db.get_metrics()
     
     print(f"\n🎯 Overall Performance:")
     print("-" * 40)
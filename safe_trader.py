@@ -3,6 +3,7 @@ Safe Auto Trader with Risk Controls
 """
 
 from master_system import DevilTradingMasterSystem
+from bridge.risk_gate import RiskGate
 import schedule
 import time
 from datetime import datetime, time as dt_time
@@ -13,38 +14,32 @@ MAX_POSITIONS = 3       # Max concurrent positions
 TRADING_START = dt_time(9, 20)
 TRADING_END = dt_time(15, 20)
 
+# One risk gate for every order path (hours, daily loss, positions, strategy limits)
+gate = RiskGate(
+    max_daily_loss=MAX_DAILY_LOSS,
+    max_positions=MAX_POSITIONS,
+    trading_hours=(TRADING_START, TRADING_END)
+)
+
 system = DevilTradingMasterSystem(500000)
+system.portfolio.risk_gate = gate
 system.portfolio.add_strategy("EMA Crossover", 30)
 
-daily_pnl = 0
-daily_trades = 0
-
-
-def is_trading_hours():
-    """Check if within trading hours"""
-    now = datetime.now().time()
-    return TRADING_START <= now <= TRADING_END
-
 
 def can_trade():
     """Check if we can trade (risk controls)"""
-    
-    # Check trading hours
-    if not is_trading_hours():
-        print("⏰ Outside trading hours")
+    allowed, reason = gate.check_limits()
+    if not allowed:
+        print(f"🛑 {reason}")
         return False
     
-    # Check daily loss limit
+    # The gate only sees open P&L for prices it was given; keep the
+    # portfolio's own (realized + unrealized) daily loss stop as well
     summary = system.portfolio.get_portfolio_summary()
     if summary['total_pnl'] < -MAX_DAILY_LOSS:
         print(f"🛑 Daily loss limit hit: ₹{summary['total_pnl']:.2f}")
         return False
     
-    # Check max positions
-    if summary['active_positions'] >= MAX_POSITIONS:
-        print(f"🛑 Max positions reached: {summary['active_positions']}")
-        return False
-    
     return True
 
 